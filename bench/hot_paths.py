@@ -0,0 +1,178 @@
+# bench/hot_paths.py — caminhos quentes do app sobre históricos sintéticos (1k a 10M leituras), sem rede
+#   python bench/hot_paths.py [--sizes 1k,10k,100k,1M] [--formats csv,xlsx,numbers] [--repeat 3]
+#                             [--data DIR] [--save base.json] [--baseline base.json --tolerance 0.25 --min-ms 2]
+# Gera (uma vez, com seed fixo) logs de controlador a cada 5 min em CSV/XLSX/Numbers e mede:
+#   leitura do upload (load_history_any, sem o cache por conteúdo), CSV em blocos, importação no store,
+#   resample diário (pandas e rollup do store), consumo observado, projeção + Monte Carlo,
+#   tabelas de faixas (HTML) e classificação do histórico por faixa, catálogo de produtos e exportação (CSV/Parquet).
+# XLSX vai até 1M linhas (limite do Excel) e Numbers até 100k (gravar é lento); leitura inteira em memória
+# até 1M — acima disso só a leitura em blocos. Formato sem a biblioteca instalada é pulado com aviso.
+# Com --baseline, sai com código 1 se alguma mediana piorar mais que a tolerância.
+import argparse, io, json, statistics, sys, tempfile, time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+ROOT=Path(__file__).resolve().parents[1]
+sys.path.insert(0,str(ROOT))
+from doser import catalog, export, history, projection, ranges
+from doser.store import HistoryStore, DEFAULT_TANK
+
+LIMITS={"xlsx":1_000_000,"numbers":100_000,"full_read":1_000_000}
+CHUNK=1_000_000
+
+def parse_size(s:str)->int:
+    s=s.strip().lower(); mult={"k":1_000,"m":1_000_000}.get(s[-1],1)
+    return int(float(s[:-1] if s[-1] in "km" else s)*mult)
+
+def label(n:int)->str:
+    return f"{n//1_000_000}M" if n>=1_000_000 and n%1_000_000==0 else f"{n//1_000}k" if n>=1_000 and n%1_000==0 else str(n)
+
+def synthetic_chunks(n:int, seed:int=0, freq:str="5min"):
+    """Log sintético em blocos de até CHUNK linhas (memória limitada mesmo com 10M): passeio aleatório
+    de KH/Ca/Mg, ~1% de leituras faltando e uma observação de vez em quando, como num controlador."""
+    r=np.random.default_rng(seed); last=np.array([8.5,420.0,1300.0]); t0=pd.Timestamp("2020-01-01")
+    step=pd.Timedelta(freq)
+    for lo in range(0,n,CHUNK):
+        m=min(CHUNK,n-lo)
+        walk=last+np.cumsum(r.normal(0,[.01,.2,.3],size=(m,3)),axis=0); last=walk[-1]
+        vals=walk.round(2); vals[r.random((m,3))<0.01]=np.nan
+        obs=np.where(r.random(m)<0.001,"TPA","")
+        yield pd.DataFrame({"timestamp":pd.date_range(t0+step*lo,periods=m,freq=freq).strftime("%Y-%m-%d %H:%M:%S"),
+                            "volume_L":300.0,"KH_atual":vals[:,0],"Ca_atual":vals[:,1],"Mg_atual":vals[:,2],
+                            "KH_ideal":9.0,"Ca_ideal":430.0,"Mg_ideal":1300.0,"obs":obs})
+
+def write_csv(path:Path, n:int):
+    with open(path,"w",encoding="utf-8",newline="") as f:
+        for i,df in enumerate(synthetic_chunks(n)): df.to_csv(f,index=False,header=i==0)
+
+def write_xlsx(path:Path, n:int):
+    from openpyxl import Workbook
+    wb=Workbook(write_only=True); ws=wb.create_sheet("Histórico")
+    for i,df in enumerate(synthetic_chunks(n)):
+        if i==0: ws.append(list(df.columns))
+        for row in df.astype(object).where(df.notna(),None).itertuples(index=False): ws.append(list(row))
+    wb.save(path)
+
+def write_numbers(path:Path, n:int):
+    from numbers_parser import Document
+    df=next(synthetic_chunks(n)); cols=list(df.columns)
+    doc=Document(num_rows=n+1,num_cols=len(cols)); t=doc.sheets[0].tables[0]
+    for j,c in enumerate(cols): t.write(0,j,c)
+    for i,row in enumerate(df.itertuples(index=False),start=1):
+        for j,v in enumerate(row):
+            if isinstance(v,str) or v==v: t.write(i,j,v)
+    doc.add_sheet("Notas","Resumo",num_rows=50,num_cols=4)  # outra tabela no arquivo, como numa planilha real
+    doc.save(path)
+
+WRITERS={"csv":write_csv,"xlsx":write_xlsx,"numbers":write_numbers}
+NEEDS={"xlsx":"openpyxl","numbers":"numbers_parser"}
+
+def dataset(data_dir:Path, n:int, fmt:str)->Path|None:
+    """Arquivo sintético (gerado só na primeira vez); None se o formato não se aplica ao tamanho."""
+    if n>LIMITS.get(fmt,n): return None
+    path=data_dir/f"reef_{label(n)}.{fmt}"
+    if not path.exists():
+        t=time.perf_counter(); tmp=path.with_suffix(".tmp"); WRITERS[fmt](tmp,n); tmp.rename(path)
+        print(f"  gerado {path.name} ({path.stat().st_size/1e6:.1f} MB, {time.perf_counter()-t:.1f} s)",file=sys.stderr)
+    return path
+
+def timeit(fn, repeat:int)->float:
+    ts=[]
+    for i in range(repeat):
+        t=time.perf_counter(); fn(i); ts.append(time.perf_counter()-t)
+    return statistics.median(ts)*1000
+
+def measure(sizes:list[int], formats:list[str], repeat:int, data_dir:Path)->dict:
+    res={}
+    def put(name:str, ms:float):
+        res[name]=ms; print(f"  {name:<44} {ms:10.1f} ms",flush=True)
+    data_dir.mkdir(parents=True,exist_ok=True)
+    for fmt in [f for f in formats if f in NEEDS]:
+        try: __import__(NEEDS[fmt])
+        except ImportError: print(f"  {fmt}: {NEEDS[fmt]} não instalado — pulado",file=sys.stderr); formats=[f for f in formats if f!=fmt]
+
+    for n in sizes:
+        tag=label(n); big=n>LIMITS["full_read"]
+        for fmt in formats:
+            path=dataset(data_dir,n,fmt)
+            if path is None or (big and fmt=="csv"): continue
+            data=path.read_bytes()
+            put(f"load_history_any ({fmt}) @ {tag}",timeit(lambda i: history.read_history(data,path.name),repeat))
+        csv=dataset(data_dir,n,"csv")
+        put(f"CSV em blocos → 1 ponto/dia @ {tag}",timeit(lambda i: history.read_csv_chunked(str(csv),"D"),repeat))
+        if not big:
+            df=history.read_history(csv.read_bytes(),csv.name)
+            put(f"resample diário (pandas) @ {tag}",
+                timeit(lambda i: df.set_index("timestamp")[["KH_atual","Ca_atual","Mg_atual"]].resample("D").last(),repeat))
+            put(f"faixas: classificar o histórico (numpy) @ {tag}",timeit(lambda i: ranges.RULES.flag_frame(df),repeat))
+
+        # store num SQLite novo: importação uma vez (é o custo do upload), o resto repetido
+        with tempfile.TemporaryDirectory() as tmp:
+            db=Path(tmp)/"bench.sqlite"; store=HistoryStore(db); t=time.perf_counter()
+            for chunk in pd.read_csv(csv,chunksize=CHUNK): store.import_frame(history.normalize_history(chunk))
+            put(f"store: importar (com rollups e consumo) @ {tag}",(time.perf_counter()-t)*1000)
+            put(f"resample diário (rollup do store) @ {tag}",timeit(lambda i: store.rollup(DEFAULT_TANK,"D"),repeat))
+            put(f"gráfico: série ≤1000 pts (90 dias) @ {tag}",
+                timeit(lambda i: store.read_series(DEFAULT_TANK,points=1000,start=store.bounds()[1]-pd.Timedelta(days=90)),repeat))
+            store.close()
+            def cold_consumption(method):
+                s=HistoryStore(db)  # estado do estimador salvo junto do histórico: reabrir não recalcula
+                try: return s.consumption(DEFAULT_TANK,30,method)
+                finally: s.close()
+            store=HistoryStore(db)
+            put(f"faixas: contagem no histórico (SQL, 1ª vez) @ {tag}",
+                timeit(lambda i: HistoryStore(db).range_counts(DEFAULT_TANK,ranges.RULES.bounds()),repeat))
+            put(f"consumo observado (mediana 30d) @ {tag}",timeit(lambda i: cold_consumption("median"),repeat))
+            put(f"consumo observado (Theil–Sen 30d) @ {tag}",timeit(lambda i: cold_consumption("theil-sen"),repeat))
+            for fmt in ("CSV","Parquet"):
+                if fmt=="Parquet" and not _has("pyarrow"): continue
+                put(f"exportação {fmt} (em blocos) @ {tag}",
+                    timeit(lambda i: export.write_history(store.iter_read(DEFAULT_TANK),fmt,io.BytesIO()),repeat))
+            store.close()
+
+    # independentes do tamanho do histórico
+    args=(8.0,420.0,1300.0,0.35,4.0,0.2,2.0,1.0,9.0,430.0,1.0)
+    r=np.random.default_rng(0); noise={k:tuple(r.normal(0,s,90)) for k,s in (("KH",.05),("Ca",.8),("Mg",1.0))}
+    put("projeção 1825 dias",timeit(lambda i: projection.project(*args,1825),max(repeat,5)))
+    put("Monte Carlo 1000×1825 dias + percentis",
+        timeit(lambda i: projection.bands(projection.monte_carlo(*args,1825,noise=noise,n=1000)),repeat))
+    put("faixas camarões (HTML)",timeit(lambda i: ranges.species_html({"pH":6.8+i*0.01,"GH":6.0,"KH":2.0}),max(repeat,5)))
+    put("faixas Reef (HTML)",timeit(lambda i: ranges.current_html({"KH":8.0+i*0.01,"Ca":420.0,"Mg":1300.0}),max(repeat,5)))
+    cat=catalog.load(builtin_only=True)
+    put("catálogo: busca aproximada",timeit(lambda i: cat.search("reflowers kh"),max(repeat,5)))
+    put("catálogo: doses (todos os produtos × 1000 volumes)",timeit(lambda i: cat.dose_table(np.linspace(10,1000,1000)),max(repeat,5)))
+    return res
+
+def _has(mod:str)->bool:
+    try: __import__(mod); return True
+    except ImportError: return False
+
+def main(argv=None):
+    ap=argparse.ArgumentParser(description="benchmarks dos caminhos quentes do doser")
+    ap.add_argument("--sizes",default="1k,10k,100k,1M",help="tamanhos do histórico (ex.: 1k,10k,100k,1M,10M)")
+    ap.add_argument("--formats",default="csv,xlsx,numbers")
+    ap.add_argument("--repeat",type=int,default=3)
+    ap.add_argument("--data",default=str(Path(tempfile.gettempdir())/"doser-bench"),help="onde guardar os arquivos gerados")
+    ap.add_argument("--save",help="grava as medianas em JSON (baseline)")
+    ap.add_argument("--baseline",help="compara com um JSON salvo por --save")
+    ap.add_argument("--tolerance",type=float,default=0.25,help="piora relativa tolerada (padrão 25%%)")
+    ap.add_argument("--min-ms",type=float,default=2.0,help="diferença absoluta mínima para contar regressão (ruído)")
+    a=ap.parse_args(argv)
+    sizes=[parse_size(s) for s in a.sizes.split(",")]; formats=[f.strip().lower() for f in a.formats.split(",")]
+    print(f"caminhos quentes • mediana de {a.repeat} execuções")
+    res=measure(sizes,formats,a.repeat,Path(a.data))
+    if a.save: Path(a.save).write_text(json.dumps(res,indent=2,ensure_ascii=False))
+    if not a.baseline: return
+    base=json.loads(Path(a.baseline).read_text())
+    print(f"comparação com {a.baseline}")
+    worse=[]
+    for k,v in res.items():
+        if k not in base: continue
+        print(f"  {k:<44} {v:10.1f} ms   (base {base[k]:.1f} ms, {v/base[k]-1:+.0%})")
+        if v>base[k]*(1+a.tolerance) and v-base[k]>a.min_ms: worse.append(k)
+    if worse:
+        print(f"regressão acima de {a.tolerance:.0%}: {', '.join(worse)}"); sys.exit(1)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,48 @@
+# bench/ingest_live.py — vazão e atraso da ingestão ao vivo (doser.ingest) com o controlador simulado
+#   python bench/ingest_live.py [--rates 500,2000,10000] [--seconds 5] [--via socket,http,dir]
+# Para cada taxa/via: sobe o serviço num SQLite temporário, envia leituras pelo fake_device e mede
+# leituras gravadas por segundo, o atraso entre o último envio e o último lote gravado, lotes e
+# repetidas descartadas. Taxa acima do que o SQLite aguenta aparece como envio mais lento (back-pressure).
+import argparse, asyncio, sys, tempfile, time
+from pathlib import Path
+
+ROOT=Path(__file__).resolve().parents[1]
+sys.path.insert(0,str(ROOT))
+from doser import ingest
+from doser.store import HistoryStore
+
+def run(rate:float, seconds:float, via:str)->dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        store=HistoryStore(Path(tmp)/"live.sqlite"); drop=Path(tmp)/"entrada"
+        svc=ingest.IngestService(store, drop_dir=drop if via=="dir" else None, port=None if via=="dir" else 0,
+                                 poll_s=0.2 if via=="dir" else 1.0)
+        svc.start()
+        try:
+            t0=time.perf_counter()
+            sent=asyncio.run(ingest.fake_device(port=svc.port, drop_dir=drop, rate=rate, seconds=seconds, via=via))
+            t_sent=time.perf_counter()
+            while True:  # espera a fila esvaziar: tudo gravado ou descartado como repetido
+                s=svc.stats()
+                if s["gravadas"]+s["repetidas"]+s["rejeitadas"]>=sent or time.perf_counter()-t_sent>120: break
+                time.sleep(0.01)
+            t_done=time.perf_counter()
+        finally:
+            svc.stop(); store.close()
+    return {"enviadas":sent,"gravadas":s["gravadas"],"repetidas":s["repetidas"],"lotes":s["lotes"],
+            "envio (s)":t_sent-t0,"gravadas/s":s["gravadas"]/(t_done-t0),"atraso (ms)":(t_done-t_sent)*1000}
+
+def main(argv=None):
+    ap=argparse.ArgumentParser(description="vazão e atraso da ingestão ao vivo")
+    ap.add_argument("--rates",default="500,2000,10000",help="leituras/s pedidas ao controlador simulado")
+    ap.add_argument("--seconds",type=float,default=5)
+    ap.add_argument("--via",default="socket,http,dir")
+    a=ap.parse_args(argv)
+    print(f"{'via':<7}{'taxa':>8}{'enviadas':>10}{'gravadas':>10}{'repetidas':>10}{'lotes':>7}{'envio s':>9}{'grav./s':>9}{'atraso ms':>11}")
+    for via in a.via.split(","):
+        for rate in (float(r) for r in a.rates.split(",")):
+            r=run(rate,a.seconds,via.strip())
+            print(f"{via:<7}{rate:>8.0f}{r['enviadas']:>10}{r['gravadas']:>10}{r['repetidas']:>10}{r['lotes']:>7}"
+                  f"{r['envio (s)']:>9.2f}{r['gravadas/s']:>9.0f}{r['atraso (ms)']:>11.0f}",flush=True)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench/startup.py — partida a frio do app: tempo de import e do primeiro render (Streamlit AppTest)
+#   python bench/startup.py [--repeat 5] [--save base.json] [--baseline base.json --tolerance 0.25]
+# Cada medida roda num processo novo (nada em cache). "imports" executa só os imports de topo do
+# doser_app.py; "render" é o primeiro at.run() de cada modo, e "rerun" o segundo (já aquecido).
+# Com --baseline, sai com código 1 se alguma mediana piorar mais que a tolerância.
+import argparse, ast, json, os, statistics, subprocess, sys, tempfile
+from pathlib import Path
+
+ROOT=Path(__file__).resolve().parents[1]
+APP=ROOT/"doser_app.py"
+HEAVY=("pandas","altair","pyarrow","openpyxl","xlrd","numbers_parser")
+
+_IMPORTS='''
+import json, sys, time
+sys.path.insert(0, {root!r})
+src={src!r}
+t=time.perf_counter(); exec(compile(src, "doser_app_imports", "exec"), {{}}); ms=(time.perf_counter()-t)*1000
+print(json.dumps({{"ms":ms,"loaded":[m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+_RENDER='''
+import json, sys, time
+sys.path.insert(0, {root!r})
+from streamlit.testing.v1 import AppTest
+at=AppTest.from_file({app!r}, default_timeout=120)
+at.session_state["mode"]={mode!r}
+t=time.perf_counter(); at.run(); first=(time.perf_counter()-t)*1000
+t=time.perf_counter(); at.run(); second=(time.perf_counter()-t)*1000
+assert not at.exception, at.exception
+print(json.dumps({{"render_ms":first,"rerun_ms":second,"loaded":[m for m in {heavy!r} if m in sys.modules]}}))
+'''
+
+def top_level_imports(path:Path)->str:
+    """Só os `import`/`from … import` de topo do app (o que todo worker paga antes de renderizar)."""
+    tree=ast.parse(path.read_text(encoding="utf-8"))
+    return "\n".join(ast.get_source_segment(path.read_text(encoding="utf-8"),n) for n in tree.body
+                     if isinstance(n,(ast.Import,ast.ImportFrom)))
+
+def run_py(code:str, env:dict)->dict:
+    out=subprocess.run([sys.executable,"-c",code],capture_output=True,text=True,env=env,cwd=ROOT)
+    if out.returncode: raise SystemExit(out.stderr[-2000:])
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def measure(repeat:int)->dict:
+    env={**os.environ,"DOSER_DB":tempfile.mktemp(suffix=".sqlite")}  # histórico vazio: só o custo de partida
+    res={}
+    imp=[run_py(_IMPORTS.format(root=str(ROOT),src=top_level_imports(APP),heavy=HEAVY),env) for _ in range(repeat)]
+    res["imports_ms"]=statistics.median(r["ms"] for r in imp); res["imports_loaded"]=imp[-1]["loaded"]
+    for key,mode in (("fw","Doce + Camarões"),("reef","Marinho (Reef)")):
+        rs=[run_py(_RENDER.format(root=str(ROOT),app=str(APP),mode=mode,heavy=HEAVY),env) for _ in range(repeat)]
+        res[f"{key}_render_ms"]=statistics.median(r["render_ms"] for r in rs)
+        res[f"{key}_rerun_ms"]=statistics.median(r["rerun_ms"] for r in rs)
+        res[f"{key}_loaded"]=rs[-1]["loaded"]
+    return res
+
+def main(argv=None):
+    ap=argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--repeat",type=int,default=5)
+    ap.add_argument("--save",help="grava as medianas em JSON (baseline)")
+    ap.add_argument("--baseline",help="compara com um JSON salvo por --save")
+    ap.add_argument("--tolerance",type=float,default=0.25,help="piora relativa tolerada (padrão 25%%)")
+    a=ap.parse_args(argv)
+    res=measure(a.repeat)
+    base=json.loads(Path(a.baseline).read_text()) if a.baseline else {}
+    print(f"partida a frio • mediana de {a.repeat} processos")
+    worse=[]
+    for k,v in res.items():
+        if not k.endswith("_ms"):
+            print(f"  {k:<18} {', '.join(v) or '—'}"); continue
+        line=f"  {k:<18} {v:8.1f} ms"
+        if k in base:
+            line+=f"   (base {base[k]:.1f} ms, {v/base[k]-1:+.0%})"
+            if v>base[k]*(1+a.tolerance): worse.append(k)
+        print(line)
+    if a.save: Path(a.save).write_text(json.dumps(res,indent=2))
+    if worse:
+        print(f"regressão acima de {a.tolerance:.0%}: {', '.join(worse)}"); sys.exit(1)
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,72 @@
+# bench/ui_latency.py — latência mediana das interações do app (Streamlit AppTest, sem navegador)
+#   python bench/ui_latency.py [--rows 20000] [--repeat 15]
+# Cria um histórico sintético num SQLite temporário (DOSER_DB), abre o modo Reef e mede:
+#   • edição na sidebar (rerun completo do script)
+#   • widgets dos cartões (Período, Resolução, Dias do plano); quando o cartão é um st.fragment,
+#     a interação é repetida como rerun só do fragmento, como o navegador faria.
+# Compare antes/depois rodando o mesmo script em dois checkouts.
+import argparse, os, statistics, sys, tempfile, time
+from pathlib import Path
+
+ROOT=Path(__file__).resolve().parents[1]
+sys.path.insert(0,str(ROOT))
+
+def synthetic_history(n:int, seed:int=0):
+    import numpy as np, pandas as pd
+    r=np.random.default_rng(seed); ts=pd.date_range("2023-01-01",periods=n,freq="30min")
+    return pd.DataFrame({"timestamp":ts,"volume_L":300.0,
+        "KH_atual":(8.5+np.cumsum(r.normal(0,.01,n))).round(2),"Ca_atual":(420+np.cumsum(r.normal(0,.2,n))).round(2),
+        "Mg_atual":(1300+np.cumsum(r.normal(0,.3,n))).round(2),"KH_ideal":9.0,"Ca_ideal":430.0,"Mg_ideal":1300.0,"obs":""})
+
+def fragment_id(at, name:str)->str|None:
+    """Id do st.fragment registrado pela função `name` no último run (None se o cartão não for fragmento)."""
+    for fid,f in at._fragment_storage._fragments.items():
+        if any(getattr(c.cell_contents,"__name__",None)==name for c in f.__closure__ or ()): return fid
+    return None
+
+def fragment_run(at, fid:str):
+    """at.run() limitado a um fragmento — é o rerun que o navegador pede quando o widget está dentro dele."""
+    from streamlit.testing.v1 import local_script_runner as lsr
+    # a árvore de um rerun de fragmento só tem o fragmento; a do app inteiro é mantida para os próximos runs
+    orig,tree=lsr.RerunData,at._tree
+    lsr.RerunData=lambda **kw: orig(**kw, fragment_id_queue=[fid])
+    try: at.run(); return at
+    finally: lsr.RerunData=orig; at._tree=tree
+
+def timed(fn, repeat:int)->float:
+    ts=[]
+    for i in range(repeat):
+        t=time.perf_counter(); fn(i); ts.append(time.perf_counter()-t)
+    return statistics.median(ts)*1000
+
+def main(argv=None):
+    ap=argparse.ArgumentParser(); ap.add_argument("--rows",type=int,default=20000); ap.add_argument("--repeat",type=int,default=15)
+    a=ap.parse_args(argv)
+    os.environ["DOSER_DB"]=tempfile.mktemp(suffix=".sqlite")
+    from doser import history
+    from doser.store import HistoryStore
+    s=HistoryStore(); s.import_frame(history.normalize_history(synthetic_history(a.rows))); s.close()
+
+    from streamlit.testing.v1 import AppTest
+    at=AppTest.from_file(str(ROOT/"doser_app.py"), default_timeout=120); at.run()
+    at.radio(key="mode").set_value("Marinho (Reef)").run()
+    assert not at.exception, at.exception
+    by=lambda kind,label: [w for w in getattr(at,kind) if w.label==label][0]
+
+    cases={
+        "sidebar: KH atual":("number_input","KH atual (°dKH)",lambda i: 8.0+0.01*(i%2+1),None),
+        "cartão: Período":("radio","Período",lambda i: ["30 dias","1 ano"][i%2],"reef_visual_card"),
+        "cartão: Resolução":("radio","Resolução",lambda i: ["Semana","Dia"][i%2],"reef_visual_card"),
+        "cartão: Dias do plano":("slider","Dias do plano",lambda i: 14+i%2+1,"reef_plan_card"),
+    }
+    print(f"{a.rows} leituras no histórico • mediana de {a.repeat} interações")
+    print(f"{'interação':<24}{'rerun completo':>16}{'fragmento':>12}")
+    for name,(kind,label,val,frag_fn) in cases.items():
+        full=timed(lambda i: by(kind,label).set_value(val(i)).run(), a.repeat)
+        fid=frag_fn and fragment_id(at, frag_fn); frag="—"
+        if fid: frag=f"{timed(lambda i: (by(kind,label).set_value(val(i)), fragment_run(at, fid)), a.repeat):.1f} ms"
+        print(f"{name:<24}{full:>13.1f} ms{frag:>12}")
+    assert not at.exception, at.exception
+
+if __name__=="__main__":
+    main()
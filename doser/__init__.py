@@ -0,0 +1,3 @@
+# doser — núcleo de cálculo do Doser (sem Streamlit).
+# Mantido leve de propósito: cada submódulo é importado só quando usado.
+__version__ = "2.12"
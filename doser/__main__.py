@@ -0,0 +1,3 @@
+from doser.cli import main
+
+main()
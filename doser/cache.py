@@ -0,0 +1,54 @@
+# doser/cache.py — cache LRU por processo (compartilhado entre sessões do Streamlit)
+# Chaveado pelo hash do conteúdo; limite por orçamento de memória (bytes), não por nº de itens.
+import os, threading
+from collections import OrderedDict
+
+def _default_budget()->int:
+    return int(float(os.environ.get("DOSER_HISTORY_CACHE_MB","256"))*1024*1024)
+
+class LRUCache:
+    """LRU thread-safe com orçamento em bytes e contadores de acerto/falta."""
+    def __init__(self, max_bytes:int|None=None, sizeof=None, copy=None):
+        self.max_bytes=_default_budget() if max_bytes is None else int(max_bytes)
+        self._sizeof=sizeof or (lambda v: 0)
+        self._copy=copy or (lambda v: v)
+        self._data=OrderedDict(); self._sizes={}; self._lock=threading.Lock()
+        self.bytes=0; self.hits=0; self.misses=0; self.evictions=0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                self.misses+=1; return default
+            self._data.move_to_end(key); self.hits+=1
+            value=self._data[key]
+        return self._copy(value)
+
+    def put(self, key, value):
+        size=int(self._sizeof(value))
+        with self._lock:
+            if key in self._data: self._drop(key)
+            if size>self.max_bytes: return  # maior que o orçamento inteiro: não guarda
+            self._data[key]=value; self._sizes[key]=size; self.bytes+=size
+            while self.bytes>self.max_bytes:
+                self._drop(next(iter(self._data))); self.evictions+=1
+
+    def get_or_load(self, key, loader):
+        value=self.get(key)
+        if value is None:
+            value=loader(); self.put(key,value); value=self._copy(value)
+        return value
+
+    def _drop(self, key):
+        self._data.pop(key); self.bytes-=self._sizes.pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear(); self._sizes.clear(); self.bytes=0
+
+    def __len__(self): return len(self._data)
+
+    def stats(self)->dict:
+        with self._lock:
+            total=self.hits+self.misses
+            return {"hits":self.hits,"misses":self.misses,"hit_rate":(self.hits/total) if total else 0.0,
+                    "entries":len(self._data),"bytes":self.bytes,"max_bytes":self.max_bytes,"evictions":self.evictions}
@@ -0,0 +1,155 @@
+# doser/catalog.py — catálogo local de produtos (fertilizantes e suplementos), carregado uma vez por processo
+# Cada produto guarda os números do rótulo nos mesmos campos da sidebar (pctN/pctP/density, ppm por dose, g por
+# +1°dH, ...). Na carga eles viram coeficientes "efeito × L por mL (ou g)": a dose em qualquer volume é
+# volume × Δ / coeficiente — uma busca no índice e uma multiplicação, para todos os produtos de uma vez.
+# Produtos próprios: $DOSER_CATALOG ou ~/.doser/catalog.json, no mesmo formato (mesma marca+produto substitui).
+import functools, hashlib, json, os, re, unicodedata
+from pathlib import Path
+import numpy as np
+from doser.engine import conversions, dkh_from_meq
+
+BUILTIN_PATH=Path(__file__).with_name("catalog.json")
+UNITS=("mL","g")
+PARAM_LABELS={"NO3":"NO₃ (ppm)","PO4":"PO₄ (ppm)","GH":"GH (°dH)","KH":"KH (°dKH)","Ca":"Ca (ppm)"}
+
+# tipo de produto → (modo do app, campos do rótulo, coeficientes {parâmetro: efeito × L por mL/g}, palavras de busca)
+SLOTS={
+    "macro":("fw",("pctN","pctP","density"),
+             lambda pctN,pctP,density: dict(zip(("NO3","PO4"),conversions(density,pctN,pctP))),"npk nitrato fosfato no3 po4"),
+    "nitrogen":("fw",("adds_ppm_per_100L","dose_mL_per_100L"),
+                lambda adds_ppm_per_100L,dose_mL_per_100L: {"NO3":adds_ppm_per_100L/dose_mL_per_100L*100.0},"nitrato no3"),
+    "gh":("fw",("g_per_dGH_100L",),lambda g_per_dGH_100L: {"GH":100.0/g_per_dGH_100L},"gh remineralizador"),
+    "kh":("fw",("ml_khplus_per_dKH_100L",),lambda ml_khplus_per_dKH_100L: {"KH":100.0/ml_khplus_per_dKH_100L},"kh alcalinidade"),
+    "ca":("reef",("ca_ppm_per_ml_per_25L",),lambda ca_ppm_per_ml_per_25L: {"Ca":ca_ppm_per_ml_per_25L*25.0},"ca calcio"),
+    "alk":("reef",("alk_meq_per_ml_per_25L",),
+           lambda alk_meq_per_ml_per_25L: {"KH":dkh_from_meq(alk_meq_per_ml_per_25L)*25.0},"kh alk alcalinidade"),
+}
+MODE_SLOTS={m:tuple(s for s,v in SLOTS.items() if v[0]==m) for m in ("fw","reef")}
+FIELD_TEXT={"pctN":"{:.2f}% N","pctP":"{:.2f}% P","density":"{:.2f} g/mL",
+            "adds_ppm_per_100L":"+{:.2f} ppm NO₃","dose_mL_per_100L":"por {:.2f} mL/100 L",
+            "g_per_dGH_100L":"{:.2f} g por +1°dH/100 L","ml_khplus_per_dKH_100L":"{:.2f} mL por +1°dKH/100 L",
+            "ca_ppm_per_ml_per_25L":"+{:.2f} ppm Ca por mL/25 L","alk_meq_per_ml_per_25L":"+{:.3f} meq/L por mL/25 L"}
+FUZZY_MIN=0.4  # similaridade mínima (trigramas) para um termo com erro de digitação ainda casar
+
+class CatalogError(ValueError):
+    """Catálogo inválido (JSON, campos ou valores)."""
+
+def _words(text:str)->list[str]:
+    # minúsculas, sem acentos, só letras e dígitos
+    t=unicodedata.normalize("NFKD",text).encode("ascii","ignore").decode().lower()
+    return re.findall(r"[a-z0-9]+",t)
+
+def _grams(word:str)->frozenset:
+    w=f" {word} "; return frozenset(w[i:i+3] for i in range(len(w)-2))
+
+class Catalog:
+    """Produtos indexados por (marca, produto) e por tipo; uma linha de efeito por (produto, parâmetro), com os
+    coeficientes num array alinhado."""
+    def __init__(self, products:list[dict]):
+        self.products=[]; self.index={}
+        for p in products:
+            p=self._check(p); key=(p["brand"],p["product"])
+            if key in self.index: self.products[self.index[key]]=p  # o catálogo do usuário substitui o embutido
+            else: self.index[key]=len(self.products); self.products.append(p)
+        self.by_slot={s:[i for i,p in enumerate(self.products) if p["slot"]==s] for s in SLOTS}
+        rows=[(i,param,k) for i,p in enumerate(self.products) for param,k in p["coef"].items() if k>0]
+        self.row_product=np.array([r[0] for r in rows],dtype=np.intp); self.row_param=[r[1] for r in rows]
+        self.coef=np.array([r[2] for r in rows],dtype="float64")
+        # busca: palavras e trigramas de cada produto, prontos para a consulta
+        self._search=[[(w,_grams(w)) for w in dict.fromkeys(_words(f"{p['brand']} {p['product']} {SLOTS[p['slot']][3]}"))]
+                      for p in self.products]
+        self.version=hashlib.sha1(json.dumps(self.products,sort_keys=True,default=str).encode()).hexdigest()[:12]
+
+    @staticmethod
+    def _check(p:dict)->dict:
+        name=f"{p.get('brand','?')} – {p.get('product','?')}"
+        if not isinstance(p.get("brand"),str) or not isinstance(p.get("product"),str):
+            raise CatalogError(f"{name}: 'brand' e 'product' são obrigatórios.")
+        if p.get("slot") not in SLOTS: raise CatalogError(f"{name}: tipo '{p.get('slot')}' desconhecido (use {', '.join(SLOTS)}).")
+        if p.get("unit","mL") not in UNITS: raise CatalogError(f"{name}: unidade deve ser mL ou g.")
+        _,fields,coef,_=SLOTS[p["slot"]]; label=p.get("label") or {}
+        try: vals={f:float(label[f]) for f in fields}
+        except KeyError as e: raise CatalogError(f"{name}: falta o campo {e.args[0]} no rótulo.") from None
+        except (TypeError,ValueError): raise CatalogError(f"{name}: campos do rótulo devem ser números.") from None
+        if any(not np.isfinite(v) or v<0 for v in vals.values()) or any(vals[f]==0 for f in fields if f not in ("pctN","pctP")):
+            raise CatalogError(f"{name}: valores do rótulo devem ser positivos.")
+        return {"brand":p["brand"],"product":p["product"],"slot":p["slot"],"unit":p.get("unit","mL"),
+                "label":vals,"coef":{k:float(v) for k,v in coef(**vals).items()}}
+
+    def __len__(self): return len(self.products)
+
+    def get(self, brand:str, product:str)->dict:
+        try: return self.products[self.index[(brand,product)]]
+        except KeyError: raise KeyError(f"produto não está no catálogo: {brand} – {product}") from None
+
+    def fields(self, brand:str, product:str)->dict:
+        """Campos do rótulo com os nomes das entradas do motor (engine.FW_DEFAULTS/REEF_DEFAULTS)."""
+        return dict(self.get(brand,product)["label"])
+
+    def describe(self, brand:str, product:str)->str:
+        return " • ".join(FIELD_TEXT[f].format(v) for f,v in self.get(brand,product)["label"].items())
+
+    def choices(self, slot:str)->list[tuple[str,str]]:
+        return [(self.products[i]["brand"],self.products[i]["product"]) for i in self.by_slot[slot]]
+
+    def search(self, query:str, limit:int|None=None, slots=None)->list[tuple[str,str]]:
+        """(marca, produto) que casam com todos os termos da busca, melhores primeiro. Cada termo vale 1 se
+        começa uma palavra, 0.8 se está dentro de uma e a similaridade de trigramas (≥ FUZZY_MIN) se não."""
+        terms=[(t,_grams(t)) for t in _words(query)]; hits=[]
+        for i,(p,words) in enumerate(zip(self.products,self._search)):
+            if slots is not None and p["slot"] not in slots: continue
+            score=0.0
+            for t,tg in terms:
+                best=0.0
+                for w,wg in words:
+                    s=1.0 if w.startswith(t) else 0.8 if t in w else len(tg&wg)/len(tg|wg)
+                    if s>best: best=s
+                if best<FUZZY_MIN: break
+                score+=best
+            else: hits.append((-score,i))
+        return [(self.products[i]["brand"],self.products[i]["product"]) for _,i in sorted(hits)][:limit]
+
+    def doses(self, volumes)->np.ndarray:
+        """(volumes × linhas de efeito): quanto de cada produto (mL ou g) sobe 1 unidade do parâmetro."""
+        return np.asarray(volumes,dtype="float64").reshape(-1,1)/self.coef
+
+    def dose_table(self, volume_L, deltas:dict|None=None, products=None, slots=None)->dict:
+        """Tabela de doses de todos os produtos (ou só `products`/`slots`) para um ou mais volumes, num passo:
+        efeito de 1 mL/g, quanto sobe +1 e, com `deltas` {parâmetro: quanto falta}, a dose para chegar lá."""
+        rank=np.zeros(len(self.coef),dtype=np.intp)
+        if products is not None:  # na ordem pedida (ex.: resultado da busca)
+            order={self.index[tuple(k)]:j for j,k in enumerate(products)}
+            rank=np.array([order.get(i,-1) for i in self.row_product],dtype=np.intp)
+        sel=rank>=0
+        if slots is not None: sel&=np.array([self.products[i]["slot"] in slots for i in self.row_product],dtype=bool)
+        rows=np.flatnonzero(sel); rows=rows[np.argsort(rank[rows],kind="stable")]
+        vol=np.atleast_1d(np.asarray(volume_L,dtype="float64"))
+        per_unit=(vol[:,None]/self.coef[rows]).ravel(); n=len(vol)
+        prod=[self.products[i] for i in self.row_product[rows]]; params=[self.row_param[r] for r in rows]
+        out={"Volume (L)":np.repeat(vol,len(rows)),
+             "Marca":[p["brand"] for p in prod]*n,"Produto":[p["product"] for p in prod]*n,
+             "Parâmetro":[PARAM_LABELS[k] for k in params]*n,"Unid.":[p["unit"] for p in prod]*n,
+             "Efeito de 1 unid.":1.0/per_unit,"Para +1":per_unit}
+        if deltas is not None:
+            d=np.tile(np.array([max(float(deltas[k]),0.0) if k in deltas else np.nan for k in params]),n)
+            out["Falta"]=d; out["Dose p/ alvo"]=d*per_unit
+        return out
+
+def _read(path:Path)->list[dict]:
+    try: data=json.loads(path.read_text(encoding="utf-8"))
+    except (OSError,json.JSONDecodeError) as e: raise CatalogError(f"Não foi possível ler o catálogo {path}: {e}") from e
+    if not isinstance(data,dict) or not isinstance(data.get("products"),list):
+        raise CatalogError(f"{path}: esperado um objeto com a lista 'products'.")
+    return data["products"]
+
+def user_path()->Path:
+    return Path(os.environ.get("DOSER_CATALOG") or Path.home()/".doser"/"catalog.json")
+
+@functools.lru_cache(maxsize=None)
+def load(path:str|None=None, builtin_only:bool=False)->Catalog:
+    """Catálogo embutido + o do usuário (se existir). Fica em memória até o processo reiniciar."""
+    products=_read(BUILTIN_PATH)
+    if not builtin_only:
+        extra=Path(path) if path else user_path()
+        if path or extra.is_file(): products=products+_read(extra)
+    return Catalog(products)
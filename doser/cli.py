@@ -0,0 +1,183 @@
+# doser/cli.py — modo linha de comando / lote (sem Streamlit, Altair nem pandas no caminho rápido)
+#   python -m doser compute --mode reef tanques.csv -o doses.parquet
+#   python -m doser plan --days 30 tanques.csv -o plano.csv
+#   python -m doser project --days 365 tanques.csv -o projecao.json
+#   python -m doser consumption historico1.csv historico2.xlsx --window 30
+#   python -m doser export --tank principal -o historico.parquet   (histórico salvo, em blocos)
+#   python -m doser device --port 8765 --rate 1000 --seconds 30   (controlador simulado → ingestão ao vivo)
+#   python -m doser catalog --volume 50,100,200 --search kh   (doses de todos os produtos do catálogo por volume)
+# Entrada: CSV com um tanque por linha e colunas com os nomes de engine.FW_DEFAULTS/REEF_DEFAULTS
+# (colunas ausentes usam o padrão do app). Saída por extensão: .csv, .json, .parquet (pyarrow).
+import argparse, csv, json, math, os, sys
+from pathlib import Path
+import numpy as np
+
+def read_table(path:str)->dict:
+    """CSV → {coluna: array}; colunas numéricas viram float, as demais ficam texto."""
+    f=sys.stdin if path=="-" else open(path,newline="",encoding="utf-8-sig")
+    with f:
+        rows=list(csv.reader(f))
+    if not rows: return {}
+    header,body=rows[0],rows[1:]
+    cols={}
+    for j,name in enumerate(header):
+        vals=[r[j].strip() if j<len(r) else "" for r in body]
+        try: cols[name]=np.array([v.replace(",",".") if v else "nan" for v in vals],dtype=float)
+        except ValueError: cols[name]=np.array(vals,dtype=str)
+    return cols
+
+def write_table(cols:dict, path:str|None):
+    """{coluna: array} → CSV/JSON/Parquet (pela extensão) ou CSV na saída padrão."""
+    names=list(cols); n=len(next(iter(cols.values()))) if cols else 0
+    suffix=Path(path).suffix.lower() if path else ".csv"
+    if suffix==".parquet":
+        try:
+            import pyarrow as pa, pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Para .parquet, instale `pyarrow` (ou use .csv/.json).")
+        pq.write_table(pa.table({k:np.asarray(v) for k,v in cols.items()}),path); return
+    py={k:np.asarray(v).tolist() for k,v in cols.items()}
+    to_stdout=not path or path=="-"
+    out=sys.stdout if to_stdout else open(path,"w",newline="",encoding="utf-8")
+    try:
+        if suffix==".json":
+            clean=lambda x: None if isinstance(x,float) and not math.isfinite(x) else x
+            json.dump([{k:clean(py[k][i]) for k in names} for i in range(n)],out,ensure_ascii=False)
+        else:
+            w=csv.writer(out); w.writerow(names)
+            w.writerows(zip(*(py[k] for k in names)))
+    finally:
+        if not to_stdout: out.close()
+
+def _ids(tanks:dict)->np.ndarray:
+    n=len(next(iter(tanks.values()))) if tanks else 0
+    return tanks["tank_id"] if "tank_id" in tanks else np.arange(n)
+
+def _long(ids, days:int, series:dict)->dict:
+    # (n, days+1) por série → formato longo: tank_id, day, <série>…
+    n=len(ids)
+    out={"tank_id":np.repeat(ids,days+1),"day":np.tile(np.arange(days+1),n)}
+    for k,v in series.items(): out[k]=np.asarray(v).reshape(-1)
+    return out
+
+# -------- subcomandos --------
+def cmd_compute(a):
+    from doser import engine
+    tanks=read_table(a.tanks)
+    plan=(engine.reef_plan if a.mode=="reef" else engine.freshwater_plan)(tanks)
+    write_table({**tanks,**plan},a.output)
+
+def cmd_plan(a):
+    from doser import planner
+    tanks=read_table(a.tanks)
+    p=planner.plan_doses(tanks,days=a.days,mode=a.dosing)
+    pad=lambda d: np.concatenate([d,np.full((d.shape[0],1),np.nan)],axis=1)  # dose do dia t → linha do dia t
+    write_table(_long(_ids(tanks),a.days,{"dose_f1_mL":pad(p["dose_f1"]),"dose_f2_mL":pad(p["dose_f2"]),
+                                          "KH":p["KH"],"Ca":p["Ca"],"Mg":p["Mg"]}),a.output)
+
+def cmd_project(a):
+    from doser import engine, projection
+    tanks=read_table(a.tanks)
+    c=engine._columns(tanks,engine.REEF_DEFAULTS); r=engine.reef_plan(tanks)
+    traj=projection.project(c["kh_now"],c["ca_now"],c["mg_now"],r["kh_gain"],r["ca_gain"],
+                            c["kh_cons"],c["ca_cons"],c["mg_cons"],c["kh_target"],c["ca_target"],r["max_kh_raise"],a.days)
+    write_table(_long(_ids(tanks),a.days,traj),a.output)
+
+def cmd_consumption(a):
+    # histórico exige pandas (parse de datas/Excel/Numbers); só este subcomando paga o import
+    from doser import history
+    from doser.consumption import ConsumptionEstimator, CLAMPS
+    out={"tank_id":[],"param":[],"window_days":[],"median":[],"theil_sen":[]}
+    for path in a.histories:
+        p=Path(path)
+        try: df=history.read_history(p.read_bytes(),p.name)
+        except history.HistoryLoadError as e: raise SystemExit(f"{path}: {e}")
+        df=df.dropna(subset=["timestamp"]).sort_values("timestamp")
+        day=df["timestamp"].dt.floor("D")
+        for param in CLAMPS:
+            if param not in df.columns: continue
+            daily=df[[param]].assign(day=day).dropna().groupby("day")[param].last()
+            days=daily.index.values.astype("datetime64[D]").astype(int)
+            est=ConsumptionEstimator.from_points(days,daily.to_numpy("float64").round(2),a.window,CLAMPS[param])
+            for k,v in (("tank_id",p.stem),("param",param),("window_days",a.window),
+                        ("median",est.consumption()),("theil_sen",est.theil_sen())):
+                out[k].append(v)
+    write_table(out,a.output)
+
+def cmd_export(a):
+    from doser import export
+    from doser.store import HistoryStore
+    to_stdout=a.output in (None,"-")  # "-" = saída padrão, em CSV
+    fmt="CSV" if to_stdout else {v[0]:k for k,v in export.FORMATS.items()}.get(Path(a.output).suffix.lower().lstrip("."))
+    if fmt is None: raise SystemExit(f"Extensão não suportada: use {', '.join('.'+v[0] for v in export.FORMATS.values())}")
+    store=HistoryStore(a.db)
+    out=sys.stdout.buffer if to_stdout else open(a.output,"wb")
+    try: n=export.write_history(store.iter_read(a.tank,a.chunksize),fmt,out)
+    except export.ExportError as e: raise SystemExit(str(e))
+    finally:
+        if out is not sys.stdout.buffer: out.close()
+        store.close()
+    print(f"{n} leituras exportadas",file=sys.stderr)
+
+def cmd_device(a):
+    import asyncio
+    from doser import ingest
+    if a.via=="dir" and not a.dir: raise SystemExit("--via dir precisa de --dir")
+    if a.via!="dir" and not a.port: raise SystemExit(f"--via {a.via} precisa de --port")
+    try:
+        n=asyncio.run(ingest.fake_device(a.host,a.port,a.dir,a.rate,a.seconds,a.tank,a.via,step_s=a.step,dup=a.dup))
+    except ConnectionError as e: raise SystemExit(f"Sem conexão com {a.host}:{a.port} ({e}). A ingestão está ligada no app?")
+    print(f"{n} leituras enviadas",file=sys.stderr)
+
+def cmd_catalog(a):
+    from doser import catalog
+    try: cat=catalog.load(a.catalog)
+    except catalog.CatalogError as e: raise SystemExit(str(e))
+    try: vols=[float(v) for v in a.volume.split(",")]
+    except ValueError: raise SystemExit("--volume: litros separados por vírgula (ex.: 50,100)")
+    products=cat.search(a.search) if a.search else None
+    slots=catalog.MODE_SLOTS[a.mode] if a.mode else None
+    write_table(cat.dose_table(vols,products=products,slots=slots),a.output)
+
+def build_parser()->argparse.ArgumentParser:
+    ap=argparse.ArgumentParser(prog="doser",description="Doser em lote: doses, plano, projeção e consumo para muitos tanques.")
+    sub=ap.add_subparsers(dest="cmd",required=True)
+    def add(name, fn, help_):
+        sp=sub.add_parser(name,help=help_); sp.set_defaults(fn=fn)
+        sp.add_argument("-o","--output",help="arquivo de saída (.csv, .json, .parquet); omitido ou '-': CSV na saída padrão")
+        return sp
+    sp=add("compute",cmd_compute,"doses do dia, pós-dose, Redfield e flags (um tanque por linha)")
+    sp.add_argument("--mode",choices=["reef","fw"],default="reef"); sp.add_argument("tanks",help="CSV de tanques ('-' = stdin)")
+    sp=add("plan",cmd_plan,"plano multi-dia de Fusion 1 & 2")
+    sp.add_argument("--days",type=int,default=30); sp.add_argument("--dosing",choices=["paired","separate"],default="paired")
+    sp.add_argument("tanks")
+    sp=add("project",cmd_project,"projeção KH/Ca/Mg com a dose diária atual")
+    sp.add_argument("--days",type=int,default=30); sp.add_argument("tanks")
+    sp=add("consumption",cmd_consumption,"consumo observado a partir de arquivos de histórico (um por tanque)")
+    sp.add_argument("--window",type=int,default=30); sp.add_argument("histories",nargs="+")
+    sp=add("export",cmd_export,"exporta o histórico salvo (SQLite) em blocos: .csv, .parquet, .arrow, .json")
+    sp.add_argument("--db",help="banco do histórico (padrão: $DOSER_DB ou ~/.doser/history.sqlite)")
+    sp.add_argument("--tank",default="principal"); sp.add_argument("--chunksize",type=int,default=50_000)
+    sp=sub.add_parser("device",help="controlador simulado: envia leituras de KH/Ca/Mg para a ingestão ao vivo do app")
+    sp.set_defaults(fn=cmd_device)
+    sp.add_argument("--via",choices=["socket","http","dir"],default="socket")
+    sp.add_argument("--host",default="127.0.0.1"); sp.add_argument("--port",type=int); sp.add_argument("--dir",help="pasta de entrada (--via dir)")
+    sp.add_argument("--rate",type=float,default=1000,help="leituras por segundo"); sp.add_argument("--seconds",type=float,default=10)
+    sp.add_argument("--tank",default="principal"); sp.add_argument("--step",type=int,default=60,help="segundos entre leituras no log simulado")
+    sp.add_argument("--dup",type=float,default=0.01,help="fração reenviada (testa a deduplicação)")
+    sp=add("catalog",cmd_catalog,"tabela de doses de todos os produtos do catálogo para um ou mais volumes")
+    sp.add_argument("--volume",default="100",help="litros, separados por vírgula"); sp.add_argument("--search",help="busca aproximada (marca, produto, parâmetro)")
+    sp.add_argument("--mode",choices=["reef","fw"]); sp.add_argument("--catalog",help="catálogo extra (padrão: $DOSER_CATALOG ou ~/.doser/catalog.json)")
+    return ap
+
+def main(argv=None):
+    a=build_parser().parse_args(argv)
+    try: a.fn(a)
+    except BrokenPipeError:
+        # saída cortada (ex.: `| head`): o flush da saída padrão no encerramento falharia de novo, então ela
+        # passa a apontar para /dev/null; stderr continua aberto para erros reais (receita da doc do Python)
+        os.dup2(os.open(os.devnull,os.O_WRONLY),sys.stdout.fileno())
+        sys.exit(1)
+
+if __name__=="__main__":
+    main()
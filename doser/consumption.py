@@ -0,0 +1,129 @@
+# doser/consumption.py — consumo observado incremental (KH/Ca/Mg)
+# Mesma regra do card "consumo observado": mediana das variações diárias entre pontos
+# consecutivos (limitadas por `clamp`), com sinal trocado e piso em zero. Aqui em janela
+# móvel e atualizada em O(log n) por leitura nova; Theil–Sen como alternativa robusta.
+import heapq, json
+from collections import deque
+import numpy as np
+
+CONSUMPTION_WINDOWS=(7,30,90)
+CLAMPS={"KH_atual":3.0,"Ca_atual":50.0,"Mg_atual":20.0}
+
+class RollingMedian:
+    """Mediana com inserção/remoção O(log n): dois heaps + remoção preguiçosa."""
+    def __init__(self):
+        self._lo=[]; self._hi=[]          # _lo é max-heap (valores negados)
+        self._nlo=0; self._nhi=0; self._gone={}
+
+    def __len__(self): return self._nlo+self._nhi
+
+    def add(self, x:float):
+        if not self._lo or x<=-self._lo[0]: heapq.heappush(self._lo,-x); self._nlo+=1
+        else: heapq.heappush(self._hi,x); self._nhi+=1
+        self._balance()
+
+    def remove(self, x:float):
+        self._gone[x]=self._gone.get(x,0)+1
+        if self._lo and x<=-self._lo[0]:
+            self._nlo-=1
+            if x==-self._lo[0]: self._prune(self._lo,-1)
+        else:
+            self._nhi-=1
+            if self._hi and x==self._hi[0]: self._prune(self._hi,1)
+        self._balance()
+
+    def median(self)->float|None:
+        if not len(self): return None
+        if self._nlo>self._nhi: return -self._lo[0]
+        return (-self._lo[0]+self._hi[0])/2
+
+    def _prune(self, heap, sign):
+        while heap:
+            x=sign*heap[0]
+            if self._gone.get(x,0)==0: break
+            self._gone[x]-=1
+            if not self._gone[x]: del self._gone[x]
+            heapq.heappop(heap)
+
+    def _balance(self):
+        if self._nlo>self._nhi+1:
+            heapq.heappush(self._hi,-heapq.heappop(self._lo)); self._nlo-=1; self._nhi+=1; self._prune(self._lo,-1)
+        elif self._nlo<self._nhi:
+            heapq.heappush(self._lo,-heapq.heappop(self._hi)); self._nhi-=1; self._nlo+=1; self._prune(self._hi,1)
+        self._prune(self._lo,-1); self._prune(self._hi,1)
+
+class ConsumptionEstimator:
+    """Consumo de um parâmetro em janela móvel de `window_days`, alimentado com o último
+    valor de cada dia (`day` = dias desde a época). Reescrever o dia corrente é permitido;
+    dias anteriores ao último exigem reconstrução (`from_points`)."""
+    def __init__(self, window_days:int|None=30, clamp:float|None=None):
+        self.window_days=window_days; self.clamp=clamp
+        self.points=deque(); self.rates=deque(); self._med=RollingMedian()
+
+    @property
+    def last_day(self)->int|None:
+        return self.points[-1][0] if self.points else None
+
+    def update(self, day:int, value:float):
+        if self.points and day<self.points[-1][0]:
+            raise ValueError("leitura anterior ao último dia; reconstrua o estimador")
+        if self.points and day==self.points[-1][0]:
+            self.points.pop()
+            if self.rates and self.rates[-1][0]==day: self._med.remove(self.rates.pop()[1])
+        if self.points:
+            pday,pval=self.points[-1]; r=(value-pval)/(day-pday)
+            if self.clamp is not None: r=min(max(r,-self.clamp),self.clamp)
+            self.rates.append((day,r)); self._med.add(r)
+        self.points.append((day,value)); self._expire(day)
+
+    def _expire(self, today:int):
+        if self.window_days is None: return
+        cutoff=today-self.window_days
+        while self.rates and self.rates[0][0]<=cutoff: self._med.remove(self.rates.popleft()[1])
+        while len(self.points)>2 and self.points[0][0]<=cutoff: self.points.popleft()
+
+    def consumption(self)->float:
+        m=self._med.median()
+        return 0.0 if m is None else float(max(0.0,round(-m,2)))
+
+    def deviations(self)->np.ndarray:
+        """Desvios diários do consumo em torno da mediana da janela (base do Monte Carlo da projeção)."""
+        r=np.array([x for _,x in self.rates],float)
+        return -(r-np.median(r)) if r.size else r
+
+    def theil_sen(self)->float:
+        """Consumo pela inclinação de Theil–Sen (mediana das inclinações entre todos os pares da janela)."""
+        if not self.points: return 0.0  # parâmetro nunca registrado: mesmo piso de consumption()
+        cutoff=-np.inf if self.window_days is None else self.last_day-self.window_days
+        pts=np.array([p for p in self.points if p[0]>cutoff],float)
+        if len(pts)<2: return 0.0
+        i,j=np.triu_indices(len(pts),1)
+        slopes=(pts[j,1]-pts[i,1])/(pts[j,0]-pts[i,0])
+        return float(max(0.0,round(-float(np.median(slopes)),2)))
+
+    # -------- estado persistente --------
+    def to_state(self)->dict:
+        return {"window_days":self.window_days,"clamp":self.clamp,
+                "points":[list(p) for p in self.points],"rates":[list(r) for r in self.rates]}
+
+    @classmethod
+    def from_state(cls, state:dict)->"ConsumptionEstimator":
+        est=cls(state["window_days"],state["clamp"])
+        est.points=deque(tuple(p) for p in state["points"]); est.rates=deque(tuple(r) for r in state["rates"])
+        for _,r in est.rates: est._med.add(r)
+        return est
+
+    @classmethod
+    def from_points(cls, days, values, window_days:int|None=30, clamp:float|None=None)->"ConsumptionEstimator":
+        est=cls(window_days,clamp)
+        for d,v in zip(days,values): est.update(int(d),float(v))
+        return est
+
+def dumps(estimators:dict)->str:
+    return json.dumps({f"{p}|{w}":e.to_state() for (p,w),e in estimators.items()})
+
+def loads(text:str)->dict:
+    out={}
+    for k,state in json.loads(text).items():
+        p,w=k.split("|"); out[(p,None if w=="None" else int(w))]=ConsumptionEstimator.from_state(state)
+    return out
@@ -0,0 +1,46 @@
+# doser/downsample.py — redução de séries para gráficos (orçamento de pontos por série)
+# LTTB (Largest-Triangle-Three-Buckets) mantém a forma da curva; min/máx por balde de tempo mantém os picos.
+# As funções devolvem índices dos pontos escolhidos (em ordem), para recortar qualquer coluna junto.
+import numpy as np
+import pandas as pd
+
+def lttb(x, y, n:int)->np.ndarray:
+    """Índices de `n` pontos por LTTB. `x` crescente (números ou datetime64); NaN em `y` deve vir filtrado."""
+    x=np.asarray(x); y=np.asarray(y,dtype="float64"); size=len(y)
+    if n>=size: return np.arange(size)
+    if n<3: return np.array([0,size-1][:n],dtype=np.int64)
+    x=x.astype("int64").astype("float64") if x.dtype.kind=="M" else x.astype("float64")
+    # n-2 baldes entre o primeiro e o último ponto (fixos)
+    edges=np.linspace(1,size-1,n-1).astype(np.int64)
+    out=np.empty(n,dtype=np.int64); out[0]=0; out[-1]=size-1; a=0
+    for i in range(n-2):
+        lo,hi=edges[i],edges[i+1]
+        nlo,nhi=hi,(edges[i+2] if i+2<n-1 else size)
+        cx,cy=x[nlo:nhi].mean(),y[nlo:nhi].mean()  # média do balde seguinte
+        area=np.abs((x[a]-cx)*(y[lo:hi]-y[a])-(x[a]-x[lo:hi])*(cy-y[a]))
+        a=lo+int(area.argmax()); out[i+1]=a
+    return out
+
+def minmax(x, y, n:int)->np.ndarray:
+    """Índices do mínimo e do máximo em cada um de n/2 baldes de tempo iguais (mais o primeiro e o último ponto)."""
+    x=np.asarray(x); y=np.asarray(y,dtype="float64"); size=len(y)
+    if n>=size: return np.arange(size)
+    xf=x.astype("int64").astype("float64") if x.dtype.kind=="M" else x.astype("float64")
+    span=xf[-1]-xf[0] or 1.0
+    b=np.minimum(((xf-xf[0])/span*(n//2)).astype(np.int64),n//2-1)
+    order=np.lexsort((y,b))                                  # por balde, depois por valor
+    first=np.flatnonzero(np.r_[True,b[order][1:]!=b[order][:-1]])
+    last=np.r_[first[1:]-1,size-1]
+    return np.unique(np.r_[0,order[first],order[last],size-1])
+
+METHODS={"lttb":lttb,"minmax":minmax}
+
+def downsample_long(df:pd.DataFrame, x:str, points:int, method:str="lttb",
+                    by:str="Parametro", value:str="Valor")->pd.DataFrame:
+    """Aplica o método a cada série de um DataFrame longo (uma linha por data e parâmetro)."""
+    if df.empty or df.groupby(by,observed=True).size().max()<=points: return df
+    fn=METHODS[method]; parts=[]
+    for _,g in df.groupby(by,sort=False,observed=True):
+        g=g[g[value].notna()]
+        parts.append(g.iloc[fn(g[x].to_numpy(),g[value].to_numpy(),points)])
+    return pd.concat(parts,ignore_index=True)
@@ -0,0 +1,177 @@
+# doser/engine.py — motor de dosagem vetorizado (Plantado + Reef)
+# Recebe um DataFrame, dict de colunas ou array estruturado com um tanque por linha
+# e devolve todas as doses, valores pós-dose, Redfield e flags num único passo NumPy.
+# As fórmulas são nós de um grafo (doser.graph): o app reavalia só o que depende da entrada alterada.
+import math, sys
+import numpy as np
+from doser.graph import Graph, Memo
+from doser.ranges import RULES
+
+# Padrões = valores iniciais do sidebar; colunas ausentes na entrada usam estes valores.
+FW_DEFAULTS = {
+    "volume_L":50.0, "do_tpa":True, "tpa_L":20.0,
+    "pH_now":6.8, "no3_now":10.0, "po4_now":0.40, "gh_now":6.0, "kh_now":2.0,
+    "target":"PO4", "po4_target":0.90, "no3_target":12.0,
+    "no3_min":10.0, "no3_max":15.0, "po4_min":0.6, "po4_max":1.0,
+    "pctN":1.37, "pctP":0.34, "density":1.00,
+    "po4_daily":0.20, "no3_daily":1.50, "micro_per30":1.25,
+    "dose_mL_per_100L":6.0, "adds_ppm_per_100L":4.8,
+    "gh_target":7.0, "g_per_dGH_100L":2.0, "remin_mix_to":7.0,
+    "kh_target":3.0, "ml_khplus_per_dKH_100L":30.0,
+}
+REEF_DEFAULTS = {
+    "volume_L":50.0,
+    "kh_now":8.0, "ca_now":420.0, "mg_now":1300.0,
+    "kh_target":9.0, "ca_target":430.0, "mg_target":1300.0,
+    "kh_cons":0.20, "ca_cons":2.0, "mg_cons":1.0,
+    "ca_ppm_per_ml_per_25L":4.0, "alk_meq_per_ml_per_25L":0.176,
+    "max_ml_per_25L_day":4.0, "max_kh_raise_net":1.0,
+}
+REEF_RANGES = {p:RULES.limits("Reef",p) for p in ("KH","Ca","Mg")}  # faixas recomendadas (Reef), da tabela de regras
+_TEXT_COLS = {"target"}
+_BOOL_COLS = {"do_tpa"}
+
+# -------- Helpers Plantado --------
+def conversions(density_g_per_ml, pctN, pctP):
+    mgN = pctN/100.0 * density_g_per_ml * 1000.0
+    mgP = pctP/100.0 * density_g_per_ml * 1000.0
+    return mgN*(62/14), mgP*(95/31)  # mg NO3/mL, mg PO4/mL
+
+def schedule_days(start_day: str, freq: int):
+    days=["Dom","Seg","Ter","Qua","Qui","Sex","Sáb"]
+    idx=days.index(start_day); order=[days[(idx+i)%7] for i in range(7)]
+    micros=[order[2]] if freq==1 else ([order[2],order[5]] if freq==2 else [order[1],order[3],order[5]] if freq==3 else [])
+    return order, micros
+
+def ratio_redfield(no3, po4):
+    """Razão NO₃:PO₄ e classe (good/warn/bad). Escalares → (float, str); arrays → (array, array)."""
+    if np.ndim(no3)==0 and np.ndim(po4)==0:
+        if po4<=0: return math.inf,"bad"
+        r=no3/po4
+        return r, ("good" if 8<=r<=15 else "warn" if 6<=r<=18 else "bad")
+    no3,po4=np.broadcast_arrays(np.asarray(no3,float),np.asarray(po4,float))
+    with np.errstate(divide="ignore",invalid="ignore"):
+        r=np.where(po4>0, no3/np.where(po4>0,po4,1.0), np.inf)
+    s=np.select([(8<=r)&(r<=15),(6<=r)&(r<=18)],["good","warn"],"bad")
+    return r, s
+
+# -------- Helpers Reef --------
+def dkh_from_meq(meq): return meq*2.8
+
+# -------- Entrada / saída --------
+def _columns(tanks, defaults)->dict:
+    n=len(tanks) if hasattr(tanks,"__len__") and not isinstance(tanks,dict) else None
+    raw={}
+    for k,default in defaults.items():
+        v=tanks[k] if _has(tanks,k) else default
+        raw[k]=np.atleast_1d(np.asarray(v))
+    if n is None: n=max(len(v) for v in raw.values())
+    cols={}
+    for k,v in raw.items():
+        v=np.broadcast_to(v,(n,)) if v.shape!=(n,) else v
+        if k in _TEXT_COLS: cols[k]=v.astype(str)
+        elif k in _BOOL_COLS:
+            cols[k]=(np.isin(np.char.lower(v.astype(str)),["1","1.0","true","sim","s","yes","y"])
+                     if v.dtype.kind in "US" else v.astype(bool))
+        else: cols[k]=v.astype(float)
+    return cols
+
+def _has(tanks, k)->bool:
+    names=getattr(getattr(tanks,"dtype",None),"names",None)
+    if names is not None: return k in names
+    try: return k in tanks
+    except TypeError: return False
+
+def _wrap(tanks, out:dict):
+    pd=sys.modules.get("pandas")
+    if pd is not None and isinstance(tanks,pd.DataFrame):
+        return pd.DataFrame(out,index=tanks.index)
+    return out
+
+def in_reef_range(v, param:str):
+    """Valor (arredondado, como no KPI "Estado atual") dentro da faixa recomendada; NaN fica fora."""
+    return RULES.classify(v,"Reef",param,decimals=0)==0
+
+def row(plan, i:int=0)->dict:
+    """Uma linha do plano como dict de escalares Python (uso na UI, um tanque por vez)."""
+    if hasattr(plan,"iloc"): plan={k:plan[k].to_numpy() for k in plan.columns}
+    return {k:np.asarray(v)[i].item() for k,v in plan.items()}
+
+# -------- Plantado (macro, Redfield, N isolado, GH/KH) --------
+FRESHWATER=Graph("freshwater"); _fw=FRESHWATER.add
+_fw("po4_mode", lambda target: np.char.startswith(np.char.upper(np.char.replace(target,"₄","4")),"PO4"))
+_fw("tpa_eff", lambda do_tpa,tpa_L: np.where(do_tpa,tpa_L,0.0))
+_fw("f_dilution", lambda tpa_eff,volume_L: 1.0-(tpa_eff/volume_L))
+_fw("no3_base", lambda no3_now,f_dilution: no3_now*f_dilution)
+_fw("po4_base", lambda po4_now,f_dilution: po4_now*f_dilution)
+_fw(("mgNO3_per_mL","mgPO4_per_mL"), lambda density,pctN,pctP: conversions(density,pctN,pctP))
+_fw("dNO3", lambda mgNO3_per_mL,volume_L: mgNO3_per_mL/volume_L)
+_fw("dPO4", lambda mgPO4_per_mL,volume_L: mgPO4_per_mL/volume_L)
+_fw("mL_now", lambda po4_mode,po4_target,po4_base,dPO4,no3_target,no3_base,dNO3: np.where(po4_mode,
+    np.where(dPO4>0, np.maximum(0.0,(po4_target-po4_base)/dPO4), 0.0),
+    np.where(dNO3>0, np.maximum(0.0,(no3_target-no3_base)/dNO3), 0.0)))
+_fw("po4_after", lambda po4_base,mL_now,dPO4: po4_base+mL_now*dPO4)
+_fw("no3_after", lambda no3_base,mL_now,dNO3: no3_base+mL_now*dNO3)
+_fw("warn_no3", lambda po4_mode,no3_min,no3_max,no3_after: po4_mode & ~((no3_min<=no3_after)&(no3_after<=no3_max)))
+_fw("warn_po4", lambda po4_mode,po4_min,po4_max,po4_after: ~po4_mode & ~((po4_min<=po4_after)&(po4_after<=po4_max)))
+_fw("mL_day_macro", lambda po4_daily,dPO4: np.where(dPO4>0, po4_daily/dPO4, 0.0))
+_fw("no3_from_daily", lambda mL_day_macro,dNO3: mL_day_macro*dNO3)
+_fw("no3_drift", lambda no3_from_daily,no3_daily: no3_from_daily-no3_daily)
+_fw(("r_before","s_before"), lambda no3_base,po4_base: ratio_redfield(no3_base,po4_base))
+_fw(("r_after","s_after"), lambda no3_after,po4_after: ratio_redfield(no3_after,po4_after))
+_fw("ppm_per_mL_tank", lambda adds_ppm_per_100L,dose_mL_per_100L,volume_L: (adds_ppm_per_100L/dose_mL_per_100L)*(100.0/volume_L))
+_fw("need_N", lambda r_after,po4_mode,no3_after,no3_min: (r_after<8) | (po4_mode & (no3_after<no3_min)))
+_fw("N_target_ppm", lambda po4_mode,no3_min,no3_max,no3_target: np.where(po4_mode,(no3_min+no3_max)/2,no3_target))
+_fw("N_dose_mL", lambda need_N,ppm_per_mL_tank,N_target_ppm,no3_after: np.where(need_N & (ppm_per_mL_tank>0),
+    np.maximum(0.0,(N_target_ppm-no3_after)/ppm_per_mL_tank),0.0))
+_fw("dGH", lambda gh_target,gh_now: np.maximum(0.0,gh_target-gh_now))
+_fw("g_shrimp", lambda dGH,volume_L,g_per_dGH_100L: dGH*(volume_L/100.0)*g_per_dGH_100L)
+_fw("ml_shrimp", lambda g_shrimp: g_shrimp*(2.3/2.0))
+_fw("g_shrimp_tpa", lambda remin_mix_to,tpa_L,g_per_dGH_100L: remin_mix_to*(tpa_L/100.0)*g_per_dGH_100L)
+_fw("ml_shrimp_tpa", lambda g_shrimp_tpa: g_shrimp_tpa*(2.3/2.0))
+_fw("dKH", lambda kh_target,kh_now: np.maximum(0.0,kh_target-kh_now))
+_fw("ml_kh_tank", lambda dKH,volume_L,ml_khplus_per_dKH_100L: dKH*(volume_L/100.0)*ml_khplus_per_dKH_100L)
+_fw("ml_kh_tpa", lambda kh_target,tpa_L,ml_khplus_per_dKH_100L: kh_target*(tpa_L/100.0)*ml_khplus_per_dKH_100L)
+_fw("ml_kh_daily", lambda volume_L: 2.0*(volume_L/100.0))
+_fw("micro_per_app", lambda micro_per30,volume_L: micro_per30*(volume_L/30.0))
+
+FW_OUTPUTS=["f_dilution","no3_base","po4_base","mgNO3_per_mL","mgPO4_per_mL","dNO3","dPO4",
+            "mL_now","no3_after","po4_after","warn_no3","warn_po4",
+            "mL_day_macro","no3_from_daily","no3_drift","r_before","s_before","r_after","s_after",
+            "ppm_per_mL_tank","need_N","N_target_ppm","N_dose_mL",
+            "dGH","g_shrimp","ml_shrimp","g_shrimp_tpa","ml_shrimp_tpa",
+            "dKH","ml_kh_tank","ml_kh_tpa","ml_kh_daily","micro_per_app"]
+
+def freshwater_plan(tanks, memo:Memo|None=None):
+    """Plano Plantado para cada tanque. `memo` (Memo(FRESHWATER)) reaproveita os nós cujas entradas não mudaram."""
+    v=(memo or FRESHWATER).evaluate(_columns(tanks,FW_DEFAULTS))
+    return _wrap(tanks,{k:v[k] for k in FW_OUTPUTS})
+
+# -------- Reef (Fusion 1 & 2 pareados) --------
+REEF=Graph("reef"); _rf=REEF.add
+_rf("ca_per_ml", lambda ca_ppm_per_ml_per_25L,volume_L: ca_ppm_per_ml_per_25L*(25.0/volume_L))
+_rf("kh_per_ml", lambda alk_meq_per_ml_per_25L,volume_L: dkh_from_meq(alk_meq_per_ml_per_25L)*(25.0/volume_L))
+_rf("max_ml_tank", lambda max_ml_per_25L_day,volume_L: max_ml_per_25L_day*(volume_L/25.0))
+_rf("max_kh_raise", lambda max_kh_raise_net: max_kh_raise_net)
+_rf("dKH_needed", lambda kh_target,kh_now: np.maximum(0.0,kh_target-kh_now))
+_rf("desired_kh_today", lambda dKH_needed,max_kh_raise,kh_cons: np.minimum(dKH_needed,max_kh_raise+kh_cons))
+_rf("ml_f2", lambda kh_per_ml,desired_kh_today: np.where(kh_per_ml>0, desired_kh_today/kh_per_ml, 0.0))
+_rf("ml_f1", lambda ca_per_ml,ca_cons: np.where(ca_per_ml>0, ca_cons/ca_per_ml, 0.0))
+def _pair(ml_f1, ml_f2, max_ml_tank):
+    ml=np.maximum(ml_f2,ml_f1); limited=ml>max_ml_tank
+    return np.where(limited,max_ml_tank,ml), limited
+_rf(("ml_pair","limited"), _pair)
+_rf("kh_gain", lambda ml_pair,kh_per_ml: ml_pair*kh_per_ml)
+_rf("ca_gain", lambda ml_pair,ca_per_ml: ml_pair*ca_per_ml)
+_rf("kh_net", lambda kh_gain,kh_cons: kh_gain-kh_cons)
+_rf("ca_net", lambda ca_gain,ca_cons: ca_gain-ca_cons)
+_rf("days_kh", lambda kh_net,dKH_needed,max_kh_raise: np.where(kh_net<=0, np.inf, np.ceil(dKH_needed/np.minimum(kh_net,max_kh_raise))))
+_rf("ok", lambda kh_now,ca_now,mg_now: in_reef_range(kh_now,"KH")&in_reef_range(ca_now,"Ca")&in_reef_range(mg_now,"Mg"))
+
+REEF_OUTPUTS=["ca_per_ml","kh_per_ml","max_ml_tank","max_kh_raise","dKH_needed","desired_kh_today",
+              "ml_f1","ml_f2","ml_pair","limited","kh_gain","ca_gain","kh_net","ca_net","days_kh","ok"]
+
+def reef_plan(tanks, memo:Memo|None=None):
+    """Plano Reef (dose pareada) para cada tanque; `memo` como em freshwater_plan."""
+    v=(memo or REEF).evaluate(_columns(tanks,REEF_DEFAULTS))
+    return _wrap(tanks,{k:v[k] for k in REEF_OUTPUTS})
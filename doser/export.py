@@ -0,0 +1,77 @@
+# doser/export.py — exportação do histórico em blocos (CSV / Parquet / Arrow IPC / JSON)
+# O arquivo é escrito bloco a bloco a partir do store (HistoryStore.iter_read), sem montar o log
+# inteiro num DataFrame; o resultado fica em cache por (banco, tanque, versão, formato).
+import io
+import pandas as pd
+from doser.cache import LRUCache
+from doser.history import HISTORY_DTYPES, MEASUREMENT_DTYPE
+
+# rótulo → (extensão, MIME)
+FORMATS={
+    "CSV":("csv","text/csv"),
+    "Parquet":("parquet","application/vnd.apache.parquet"),
+    "Arrow IPC":("arrow","application/vnd.apache.arrow.file"),
+    "JSON":("json","application/json"),
+}
+
+class ExportError(ValueError):
+    """Exportação impossível (formato desconhecido ou dependência ausente); mensagem pronta para o usuário."""
+
+EXPORT_CACHE=LRUCache(max_bytes=128*1024*1024, sizeof=len)
+
+def _arrow():
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ExportError("Para exportar Parquet/Arrow, instale `pyarrow` (ou use CSV/JSON).") from None
+    return pa
+
+def _arrow_schema(pa, columns):
+    # esquema fixo a partir de HISTORY_DTYPES: blocos com obs vazio (tipo null) ou categorias diferentes
+    # precisam sair com o mesmo tipo em todos os row groups/batches
+    types={"timestamp":pa.timestamp("ns"),MEASUREMENT_DTYPE:pa.float32(),"category":pa.string()}
+    return pa.schema([(c,types.get(c,types.get(HISTORY_DTYPES.get(c),pa.string()))) for c in columns])
+
+def _arrow_table(pa, df:pd.DataFrame, schema):
+    df=df.assign(**{c:df[c].astype(object).where(df[c].notna(),None)
+                    for c in df.columns if isinstance(df[c].dtype,pd.CategoricalDtype)})
+    return pa.Table.from_pandas(df,schema=schema,preserve_index=False)
+
+def write_history(chunks, fmt:str, out)->int:
+    """Escreve os blocos (DataFrames com o mesmo conjunto de colunas) em `out` (binário); devolve nº de linhas."""
+    if fmt not in FORMATS: raise ExportError(f"Formato desconhecido: {fmt}")
+    n=0; writer=None; first=True
+    if fmt=="JSON": out.write(b"[")
+    for df in chunks:
+        if fmt=="CSV":
+            out.write(df.to_csv(index=False,header=first).encode())
+        elif fmt=="JSON":
+            body=df.to_json(orient="records",date_format="iso",force_ascii=False)[1:-1]
+            if body: out.write((b"" if first or not n else b",")+body.encode())
+        else:
+            pa=_arrow()
+            if writer is None:
+                schema=_arrow_schema(pa,df.columns)
+                if fmt=="Parquet":
+                    import pyarrow.parquet as pq
+                    writer=pq.ParquetWriter(out,schema)
+                else: writer=pa.ipc.new_file(out,schema)
+            writer.write_table(_arrow_table(pa,df,schema))
+        n+=len(df); first=False
+    if fmt=="JSON": out.write(b"]")
+    elif writer is not None: writer.close()
+    elif first:  # histórico vazio: arquivo válido só com cabeçalho/esquema
+        write_history([pd.DataFrame({c:pd.Series(dtype=object if t=="category" else t)
+                                     for c,t in HISTORY_DTYPES.items() if c!="tank_id"})],fmt,out)
+    return n
+
+def history_bytes(store, tank:str, fmt:str, chunksize:int=50_000)->bytes:
+    """Arquivo completo do tanque no formato pedido; gerado uma vez por versão do histórico."""
+    key=(str(store.path),tank,store.version(tank),fmt)
+    def build():
+        buf=io.BytesIO(); write_history(store.iter_read(tank,chunksize),fmt,buf)
+        return buf.getvalue()
+    return EXPORT_CACHE.get_or_load(key,build)
+
+def file_name(tank:str, fmt:str)->str:
+    return f"reef_history_{tank}.{FORMATS[fmt][0]}"
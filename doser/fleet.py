@@ -0,0 +1,149 @@
+# doser/fleet.py — vários aquários: leitura em paralelo de muitos logs (zip/pasta) e visão geral da frota
+# Um arquivo por aquário; o nome do arquivo (sem extensão) vira o tank_id. XLSX e Numbers são CPU-bound,
+# então a leitura vai para um pool de processos; a gravação no SQLite continua serial, no processo do app.
+import io, multiprocessing, os, threading, zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path, PurePosixPath
+import numpy as np
+import pandas as pd
+from doser import engine, history
+
+HISTORY_EXTS=(".csv",".xlsx",".xls",".numbers")
+PARALLEL_MIN_BYTES=1*2**20  # abaixo disso (ou com 1 arquivo) ler aqui mesmo sai mais barato que acordar os workers
+
+def _tank_ids(names:list[str])->list[str]:
+    # nome do arquivo sem extensão; se repetir em pastas diferentes, usa pasta/nome
+    stems=[PurePosixPath(n).stem for n in names]
+    dup={s for s in stems if stems.count(s)>1}
+    return [str(PurePosixPath(n).with_suffix("")) if s in dup else s for n,s in zip(names,stems)]
+
+def _wanted(name:str)->bool:
+    p=PurePosixPath(name)
+    return (p.suffix.lower() in HISTORY_EXTS and not p.name.startswith((".","~$"))
+            and "__MACOSX" not in p.parts)
+
+def sources_from_zip(data:bytes)->list[tuple[str,str,bytes]]:
+    """(tank_id, nome do arquivo, bytes) de cada log dentro do zip."""
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            names=sorted(i.filename for i in z.infolist() if not i.is_dir() and _wanted(i.filename))
+            return [(t,n,z.read(n)) for t,n in zip(_tank_ids(names),names)]
+    except zipfile.BadZipFile as e:
+        raise history.HistoryLoadError("Arquivo .zip inválido ou corrompido.") from e
+
+def folder_root()->Path|None:
+    """Pasta do servidor de onde a frota pode ser lida ($DOSER_FLEET_DIR); sem ela, só upload."""
+    v=os.environ.get("DOSER_FLEET_DIR")
+    return Path(v).expanduser().resolve() if v else None
+
+def sources_from_folder(path:str|Path, root:str|Path|None=None)->list[tuple[str,str,bytes]]:
+    """(tank_id, nome do arquivo, bytes) de cada log na pasta (e subpastas). Com `root`, `path` é relativo
+    a ele e nada fora dele é lido (nem via '..' nem via links)."""
+    base=Path(path)
+    if root is not None:
+        root=Path(root).resolve(); base=(root/base).resolve()
+        if not base.is_relative_to(root): raise history.HistoryLoadError(f"Pasta fora de {root}: {path}")
+    if not base.is_dir(): raise history.HistoryLoadError(f"Pasta não encontrada: {base}")
+    names=sorted(p.relative_to(base).as_posix() for p in base.rglob("*")
+                 if p.is_file() and _wanted(p.name) and (root is None or p.resolve().is_relative_to(root)))
+    return [(t,n,(base/n).read_bytes()) for t,n in zip(_tank_ids(names),names)]
+
+def sources_from_files(files:list[tuple[str,bytes]])->list[tuple[str,str,bytes]]:
+    """Vários arquivos soltos (upload múltiplo); zips dentro da lista são abertos."""
+    out,plain=[],[]
+    for name,data in files:
+        if name.lower().endswith(".zip"): out+=sources_from_zip(data)
+        elif _wanted(name): plain.append((name,data))
+    return out+[(t,n,d) for t,(n,d) in zip(_tank_ids([n for n,_ in plain]),plain)]
+
+# -------- leitura em paralelo --------
+def _parse(job:tuple[str,bytes])->tuple[pd.DataFrame|None,str|None]:
+    name,data=job
+    try: return history.read_history(data,name),None
+    except history.HistoryLoadError as e: return None,str(e)
+
+_pool=None; _pool_workers=0; _pool_lock=threading.Lock()
+
+def _get_pool(workers:int)->ProcessPoolExecutor:
+    # um pool por processo, compartilhado entre sessões; "spawn" porque o servidor do Streamlit tem threads
+    global _pool,_pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers!=workers:
+            if _pool is not None: _pool.shutdown(wait=False)
+            _pool=ProcessPoolExecutor(max_workers=workers,mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers=workers
+        return _pool
+
+def _drop_pool(pool:ProcessPoolExecutor):
+    # worker morreu (memória, sinal): o pool quebrado não aceita mais tarefas; a próxima leitura cria outro
+    global _pool
+    with _pool_lock:
+        if _pool is pool: _pool=None
+    pool.shutdown(wait=False)
+
+def _result(pool:ProcessPoolExecutor, fut)->tuple[pd.DataFrame|None,str|None]:
+    try: return fut.result()
+    except BrokenProcessPool:
+        _drop_pool(pool); return None,"a leitura foi interrompida (processo de leitura encerrado); tente de novo."
+    except Exception as e: return None,f"erro inesperado na leitura: {e}"
+
+def read_many(sources:list[tuple[str,str,bytes]], workers:int|None=None, progress=None)->list[dict]:
+    """Lê e normaliza cada log; devolve [{tank, name, df|None, error|None, cached}] na ordem de entrada.
+    Conteúdo já lido por qualquer sessão vem do cache por hash (HISTORY_CACHE); o resto vai ao pool.
+    `progress(feitos, total)` é chamado a cada arquivo concluído."""
+    out=[{"tank":t,"name":n,"df":None,"error":None,"cached":False} for t,n,_ in sources]
+    keys=[history.content_key(d,n) for _,n,d in sources]; todo=[]
+    for i,(_,n,d) in enumerate(sources):
+        df=history.HISTORY_CACHE.get(keys[i])
+        if df is not None: out[i].update(df=df,cached=True)
+        else: todo.append(i)
+    done=len(sources)-len(todo)
+    if progress: progress(done,len(sources))
+    workers=workers or min(len(todo),os.cpu_count() or 1)
+    if len(todo)<2 or workers<2 or sum(len(sources[i][2]) for i in todo)<PARALLEL_MIN_BYTES:
+        results=((i,_parse((sources[i][1],sources[i][2]))) for i in todo)
+    else:
+        pool=_get_pool(workers)
+        submit=lambda pool: {pool.submit(_parse,(sources[i][1],sources[i][2])):i for i in todo}
+        try: futs=submit(pool)
+        except BrokenProcessPool: _drop_pool(pool); pool=_get_pool(workers); futs=submit(pool)  # quebrou desde a última leitura
+        results=((futs[f],_result(pool,f)) for f in as_completed(futs))  # falha de um worker vira erro do arquivo
+    for i,(df,err) in results:
+        out[i].update(df=df,error=err)
+        if df is not None: history.HISTORY_CACHE.put(keys[i],df)
+        done+=1
+        if progress: progress(done,len(sources))
+    return out
+
+def ingest(store, parsed:list[dict])->dict[str,int]:
+    """Grava no store cada log lido com sucesso; {tank: leituras novas}."""
+    return {p["tank"]:store.import_frame(p["df"],p["tank"]) for p in parsed if p["df"] is not None}
+
+# -------- visão geral --------
+def overview(store, potency:dict, fallback:dict, window:int=30, tanks:list[str]|None=None)->pd.DataFrame:
+    """Uma linha por aquário: última leitura de KH/Ca/Mg e se está na faixa, consumo observado (janela
+    `window`) e a dose Fusion 1 & 2 de hoje — todos os tanques numa única chamada do motor.
+    `potency`: potência/limites do produto (sidebar); `fallback`: volume e alvos quando o log não tem."""
+    lt=store.latest(tanks)
+    if lt.empty: return pd.DataFrame()
+    cons=pd.DataFrame([store.consumption(t,window) for t in lt["tank_id"]])
+    num=lambda c,default=np.nan: lt[c].astype("float64").round(2).fillna(default).to_numpy()
+    inputs=pd.DataFrame({
+        "volume_L":num("volume_L",fallback["volume_L"]),
+        "kh_now":num("KH_atual"),"ca_now":num("Ca_atual"),"mg_now":num("Mg_atual"),
+        "kh_target":num("KH_ideal",fallback["kh_target"]),"ca_target":num("Ca_ideal",fallback["ca_target"]),
+        "mg_target":num("Mg_ideal",fallback["mg_target"]),
+        "kh_cons":cons["KH_atual"].to_numpy(float),"ca_cons":cons["Ca_atual"].to_numpy(float),
+        "mg_cons":cons["Mg_atual"].to_numpy(float),**potency})
+    rp=engine.reef_plan(inputs)
+    ok={k:engine.in_reef_range(inputs[f"{k.lower()}_now"],k) for k in ("KH","Ca","Mg")}
+    return pd.DataFrame({
+        "Aquário":lt["tank_id"].astype(str).to_numpy(),"Última leitura":lt["timestamp"].to_numpy(),
+        "Volume (L)":inputs["volume_L"].to_numpy(),
+        "KH":inputs["kh_now"].to_numpy(),"Ca":inputs["ca_now"].to_numpy(),"Mg":inputs["mg_now"].to_numpy(),
+        "KH ok":ok["KH"],"Ca ok":ok["Ca"],"Mg ok":ok["Mg"],"Tudo ok":rp["ok"].to_numpy(),
+        "KH cons./dia":inputs["kh_cons"].to_numpy(),"Ca cons./dia":inputs["ca_cons"].to_numpy(),
+        "Mg cons./dia":inputs["mg_cons"].to_numpy(),
+        "Fusion 1&2 hoje (mL)":rp["ml_pair"].to_numpy().round(2),"Limitado":rp["limited"].to_numpy(),
+        "Dias p/ KH alvo":np.where(np.isfinite(rp["days_kh"].to_numpy()),rp["days_kh"].to_numpy(),np.nan)})
@@ -0,0 +1,143 @@
+# doser/graph.py — grafo de valores derivados com memoização por nó
+# Cada nó é uma função cujos parâmetros nomeiam entradas ou saídas de outros nós;
+# a ordem topológica sai das dependências. Graph.evaluate calcula tudo (uso vetorizado, lote);
+# Memo guarda o último resultado de cada nó e só recalcula os que estão a jusante de uma entrada alterada.
+import inspect
+import numpy as np
+
+class Graph:
+    """Conjunto de nós nomeados; entradas = parâmetros que nenhum nó produz."""
+    def __init__(self, name:str=""):
+        self.name=name; self.nodes={}; self._producer={}; self._order=None
+
+    def add(self, outputs:str|tuple, fn):
+        """Registra `fn` produzindo `outputs` (nome, ou tupla de nomes se fn devolve tupla)."""
+        outs=(outputs,) if isinstance(outputs,str) else tuple(outputs)
+        key=outs[0] if len(outs)==1 else outs
+        deps=tuple(inspect.signature(fn).parameters)
+        for o in outs:
+            if o in self._producer: raise ValueError(f"{self.name}: '{o}' já é produzido por outro nó")
+            self._producer[o]=key
+        self.nodes[key]=(fn,deps,outs); self._order=None
+        return fn
+
+    @property
+    def inputs(self)->list[str]:
+        return sorted({d for _,deps,_ in self.nodes.values() for d in deps if d not in self._producer})
+
+    @property
+    def outputs(self)->list[str]:
+        return list(self._producer)
+
+    def order(self)->list:
+        """Nós em ordem topológica (dependências antes); detecta ciclos."""
+        if self._order is None:
+            order,state=[],{}
+            def visit(k):
+                if state.get(k)==1: raise ValueError(f"{self.name}: ciclo em {k}")
+                if state.get(k)==2: return
+                state[k]=1
+                for d in self.nodes[k][1]:
+                    if d in self._producer: visit(self._producer[d])
+                state[k]=2; order.append(k)
+            for k in self.nodes: visit(k)
+            self._order=order
+        return self._order
+
+    def _run(self, key, values:dict):
+        fn,deps,outs=self.nodes[key]
+        out=fn(*(values[d] for d in deps))
+        if len(outs)==1: values[outs[0]]=out
+        else: values.update(zip(outs,out))
+
+    def evaluate(self, inputs:dict)->dict:
+        """Calcula todos os nós, sem memória; devolve entradas + saídas."""
+        values=dict(inputs)
+        missing=[i for i in self.inputs if i not in values]
+        if missing: raise KeyError(f"{self.name}: entradas ausentes {missing}")
+        with np.errstate(divide="ignore",invalid="ignore"):
+            for k in self.order(): self._run(k,values)
+        return values
+
+    def upstream(self, name:str)->list[str]:
+        """Entradas das quais `name` depende (direta ou indiretamente)."""
+        seen,stack=set(),[name]
+        while stack:
+            n=stack.pop()
+            if n in self._producer:
+                for d in self.nodes[self._producer[n]][1]:
+                    if d not in seen: seen.add(d); stack.append(d)
+        return sorted(d for d in seen if d not in self._producer)
+
+    def downstream(self, *names:str)->list[str]:
+        """Saídas que mudam quando alguma das entradas/saídas `names` muda (em ordem de cálculo)."""
+        dirty=set(names); out=[]
+        for k in self.order():
+            fn,deps,outs=self.nodes[k]
+            if dirty.intersection(deps):
+                dirty.update(outs); out.extend(outs)
+        return out
+
+    def describe(self)->list[dict]:
+        """Uma linha por nó: saídas, dependências e nós que o consomem."""
+        users={}
+        for k in self.order():
+            for d in self.nodes[k][1]: users.setdefault(d,[]).extend(self.nodes[k][2])
+        return [{"nó":", ".join(outs),"depende de":", ".join(deps),
+                 "usado por":", ".join(sorted({u for o in outs for u in users.get(o,[])}))}
+                for fn,deps,outs in (self.nodes[k] for k in self.order())]
+
+    def to_dot(self)->str:
+        """Grafo no formato Graphviz (para st.graphviz_chart ou `dot -Tsvg`)."""
+        lines=[f'digraph "{self.name}" {{','  rankdir=LR; node [shape=box, fontsize=10];']
+        lines+=[f'  "{i}" [shape=ellipse];' for i in self.inputs]
+        for fn,deps,outs in (self.nodes[k] for k in self.order()):
+            lines+=[f'  "{d}" -> "{o}";' for o in outs for d in deps]
+        return "\n".join(lines+["}"])
+
+def _key(v):
+    # valor → chave comparável; arrays pelo conteúdo (formato + dtype + bytes)
+    if isinstance(v,np.ndarray): return (v.shape,v.dtype.str,v.tobytes())
+    return v
+
+class Memo:
+    """Avaliação incremental de um Graph: cada nó guarda (chave das dependências, resultado)."""
+    def __init__(self, graph:Graph):
+        self.graph=graph; self._memo={}; self.last={}; self.hits=0; self.misses=0
+
+    def evaluate(self, inputs:dict)->dict:
+        values=dict(inputs)
+        missing=[i for i in self.graph.inputs if i not in values]
+        if missing: raise KeyError(f"{self.graph.name}: entradas ausentes {missing}")
+        with np.errstate(divide="ignore",invalid="ignore"):
+            for k in self.graph.order():
+                fn,deps,outs=self.graph.nodes[k]
+                key=tuple(_key(values[d]) for d in deps)
+                hit=self._memo.get(k)
+                if hit is not None and _same(hit[0],key):
+                    values.update(hit[1]); self.hits+=1; self.last[k]="memo"
+                    continue
+                self.graph._run(k,values); self.misses+=1; self.last[k]="calculado"
+                self._memo[k]=(key,{o:values[o] for o in outs})
+        return values
+
+    def recomputed(self)->list[str]:
+        """Saídas recalculadas na última avaliação."""
+        return [o for k,s in self.last.items() if s=="calculado" for o in self.graph.nodes[k][2]]
+
+    def explain(self)->list[dict]:
+        """Estado do último cálculo, nó a nó (para depuração na UI)."""
+        rows=[]
+        for k in self.graph.order():
+            fn,deps,outs=self.graph.nodes[k]; vals=self._memo.get(k,(None,{}))[1]
+            for o in outs:
+                v=vals.get(o); v=np.asarray(v).ravel()[0].item() if v is not None and np.size(v)==1 else v
+                rows.append({"nó":o,"valor":v,"última avaliação":self.last.get(k,"—"),"depende de":", ".join(deps)})
+        return rows
+
+    def clear(self):
+        self._memo.clear(); self.last.clear(); self.hits=self.misses=0
+
+def _same(a:tuple, b:tuple)->bool:
+    try: return a==b
+    except ValueError: return False  # comparação ambígua (ex.: arrays sem _key) → recalcula
@@ -0,0 +1,334 @@
+# doser/history.py — leitura e normalização do histórico Reef (CSV/XLS/XLSX/NUMBERS)
+import io, math, os, struct, hashlib, tempfile, datetime as dt
+import numpy as np
+import pandas as pd
+from doser.cache import LRUCache
+from doser import profiling
+
+COLUMN_RENAMES={
+    "KH atual":"KH_atual","Ca atual":"Ca_atual","Mg atual":"Mg_atual",
+    "KH ideal":"KH_ideal","Ca ideal":"Ca_ideal","Mg ideal":"Mg_ideal",
+    "KH/dia":"KH_cons","Ca/dia":"Ca_cons","Mg/dia":"Mg_cons",
+    "Dose (mL)":"dose_pair_mL","KH ganho/dia":"KH_gain_dia","Ca ganho/dia":"Ca_gain_dia",
+    "KH líquido/dia":"KH_liq_dia","Ca líquido/dia":"Ca_liq_dia",
+}
+NUMERIC_COLUMNS=[
+    "volume_L","KH_atual","Ca_atual","Mg_atual","KH_ideal","Ca_ideal","Mg_ideal",
+    "KH_cons","Ca_cons","Mg_cons","dose_pair_mL","KH_gain_dia","Ca_gain_dia","KH_liq_dia","Ca_liq_dia"
+]
+HISTORY_COLUMNS=["timestamp",*NUMERIC_COLUMNS,"obs"]
+# Esquema em memória: medidas com 2 casas cabem em float32 (~7 dígitos significativos, metade do float64);
+# obs e tank_id se repetem muito → category. O SQLite continua guardando REAL (float64) arredondado.
+MEASUREMENT_DTYPE="float32"
+HISTORY_DTYPES={"timestamp":"datetime64[ns]",**{c:MEASUREMENT_DTYPE for c in NUMERIC_COLUMNS},
+                "obs":"category","tank_id":"category"}
+
+class HistoryLoadError(ValueError):
+    """Arquivo de histórico ilegível; a mensagem já vem pronta para o usuário."""
+
+# -------- timestamps --------
+# Formatos comuns de controlador/planilha. Empate na amostra (ex.: 03/04/2024) fica com o primeiro da lista:
+# mês primeiro, como a inferência do pandas fazia antes.
+TS_FORMATS=[
+    "%Y-%m-%d %H:%M:%S","%Y-%m-%d %H:%M","%Y-%m-%dT%H:%M:%S","%Y-%m-%dT%H:%M","%Y-%m-%d",
+    "%m/%d/%Y %H:%M:%S","%m/%d/%Y %H:%M","%m/%d/%Y",
+    "%d/%m/%Y %H:%M:%S","%d/%m/%Y %H:%M","%d/%m/%Y",
+    "%d-%m-%Y %H:%M:%S","%d-%m-%Y %H:%M","%d-%m-%Y","%d.%m.%Y %H:%M:%S","%d.%m.%Y %H:%M","%d.%m.%Y",
+]
+TS_MIN_MATCH=0.9  # fração da amostra que o formato precisa acertar; abaixo disso, inferência do pandas
+# hora seguida de fuso: ...10:00Z, ...10:00:00+01:00, ...10:00 -0300
+_TZ_SUFFIX=r"\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?\s*(?:Z|[+-]\d{2}:?\d{2})$"
+
+def to_local_naive(ts:pd.Series)->pd.Series:
+    """Datas com fuso → horário local sem fuso, como a ingestão ao vivo grava; sem fuso ficam como estão."""
+    if isinstance(ts.dtype,pd.DatetimeTZDtype):
+        from dateutil.tz import tzlocal  # dependência do pandas; respeita horário de verão data a data
+        return ts.dt.tz_convert(tzlocal()).dt.tz_localize(None)
+    return ts
+
+def _split_tz(s:pd.Series, parse)->pd.Series:
+    # `parse` lê as datas sem fuso; as com fuso (podem vir com offsets diferentes) vão para UTC e daí para local
+    txt=s.astype(str).str.strip()
+    aware=s.notna() & txt.str.contains(_TZ_SUFFIX,regex=True)
+    if not aware.any(): return to_local_naive(parse(s))
+    out=pd.Series(pd.NaT,index=s.index,dtype="datetime64[ns]")
+    out[aware]=to_local_naive(pd.to_datetime(txt[aware],utc=True,errors="coerce",format="mixed")).astype("datetime64[ns]")
+    if not aware.all(): out[~aware]=to_local_naive(parse(s[~aware])).astype("datetime64[ns]")
+    return out
+
+def detect_ts_format(s, sample:int=500)->str|None:
+    """Formato de TS_FORMATS que melhor lê uma amostra espalhada pela coluna; None se os valores
+    não são texto (ex.: datas do Numbers/Excel) ou se nenhum formato acerta TS_MIN_MATCH."""
+    v=pd.Series(s).dropna()
+    if v.empty: return None
+    v=v.iloc[np.unique(np.linspace(0,len(v)-1,min(sample,len(v))).astype(np.int64))]
+    if not all(isinstance(x,str) for x in v): return None
+    v=v.str.strip(); best,rate=None,0.0
+    for fmt in TS_FORMATS:
+        r=pd.to_datetime(v,format=fmt,errors="coerce").notna().mean()
+        if r>rate: best,rate=fmt,r
+        if r==1.0: break
+    return best if rate>=TS_MIN_MATCH else None
+
+_TS_FIELDS={"Y":4,"m":2,"d":2,"H":2,"M":2,"S":2}
+
+def _fixed_layout(fmt:str):
+    # posição/largura de cada campo numa string de largura fixa; None se o formato tem outra diretiva
+    fields,seps,i,pos={},[],0,0
+    while i<len(fmt):
+        if fmt[i]=="%":
+            k=fmt[i+1:i+2]
+            if k not in _TS_FIELDS: return None
+            fields[k]=(pos,_TS_FIELDS[k]); pos+=_TS_FIELDS[k]; i+=2
+        else: seps.append((pos,ord(fmt[i]))); pos+=1; i+=1
+    return fields,seps,pos
+
+def _parse_fixed(s:pd.Series, fmt:str)->np.ndarray|None:
+    """Caminho rápido: com todos os campos zero-padded a string tem largura fixa, e cada campo sai
+    direto dos códigos dos caracteres (numpy), sem strptime por linha. Linha fora do padrão → NaT."""
+    layout=_fixed_layout(fmt)
+    if layout is None: return None
+    fields,seps,width=layout; n=len(s)
+    m=s.to_numpy(dtype=f"U{width+1}",na_value="").view(np.uint32).reshape(n,width+1)
+    ok=m[:,width]==0  # um caractere a mais = string mais longa que o formato
+    for p,c in seps: ok&=m[:,p]==c
+    val={}
+    for k,(p,w) in fields.items():
+        v=np.zeros(n,dtype=np.int64)
+        for j in range(p,p+w):
+            d=m[:,j].astype(np.int64)-48; ok&=(d>=0)&(d<=9); v=v*10+d
+        val[k]=v
+    Y,M,D=val["Y"],val["m"],val["d"]
+    ok&=(Y>=1678)&(Y<=2261)&(M>=1)&(M<=12)
+    month=np.where(ok,(Y-1970)*12+M-1,0).astype("datetime64[M]")
+    dim=((month+1).astype("datetime64[D]")-month.astype("datetime64[D]")).astype(np.int64)
+    ok&=(D>=1)&(D<=dim)
+    secs=val.get("H",0)*3600+val.get("M",0)*60+val.get("S",0)
+    ok&=(val.get("H",0)<24)&(val.get("M",0)<60)&(val.get("S",0)<60)
+    out=(month.astype("datetime64[D]")+(D-1)).astype("datetime64[ns]")+secs*np.timedelta64(1,"s")
+    out[~ok]=np.datetime64("NaT")
+    return out
+
+@profiling.timed("parse_ts")
+def parse_ts(s, fmt:str|None=None)->pd.Series:
+    """Texto → datetime64 numa passada vetorizada. `fmt` vem de detect_ts_format (detectado aqui se
+    omitido); linhas que não batem com o formato — e colunas sem formato reconhecido — vão para a
+    inferência do pandas, como antes. Datas com fuso viram horário local sem fuso."""
+    s=pd.Series(s)
+    fmt=fmt or detect_ts_format(s)
+    if fmt is None:
+        def infer(v):
+            ts=pd.to_datetime(v,errors="coerce")
+            return pd.to_datetime(v,errors="coerce",dayfirst=True) if ts.isna().mean()>0.5 else ts
+        return _split_tz(s,infer)
+    fast=None if fmt.startswith("%Y-") else _parse_fixed(s,fmt)  # ISO: o parser em C do pandas já é rápido
+    ts=pd.Series(fast,index=s.index) if fast is not None else pd.to_datetime(s,format=fmt,errors="coerce")
+    rest=ts.isna()&s.notna()
+    if rest.any():  # espaços, sem zero à esquerda (3/4/2024 8:05), segundos fracionários, datas de planilha...
+        sub=pd.to_datetime(s[rest].astype(str).str.strip(),format=fmt,errors="coerce").astype("datetime64[ns]")
+        miss=sub.isna()
+        if miss.any():
+            sub[miss]=_split_tz(s[rest][miss],lambda v: pd.to_datetime(v,errors="coerce",format="mixed",
+                                                                        dayfirst=fmt.startswith("%d"))).astype("datetime64[ns]")
+        ts[rest]=sub
+    return ts
+
+def enforce_schema(df:pd.DataFrame, tank:str|None=None)->pd.DataFrame:
+    """Converte as colunas conhecidas para HISTORY_DTYPES (as demais ficam como estão).
+    `tank` preenche/força a coluna tank_id."""
+    if tank is not None: df=df.assign(tank_id=tank)
+    for c,dtype in HISTORY_DTYPES.items():
+        if c not in df.columns or df[c].dtype==dtype: continue
+        if c=="timestamp":
+            ts=df[c] if pd.api.types.is_datetime64_any_dtype(df[c]) else parse_ts(df[c])
+            df[c]=to_local_naive(ts).astype(dtype)
+        elif dtype==MEASUREMENT_DTYPE: df[c]=pd.to_numeric(df[c],errors="coerce").round(2).astype(dtype)
+        else:
+            v=df[c].astype(object)
+            df[c]=v.where(v.notna() & (v.astype(str)!=""),None).astype("category")
+    return df
+
+def normalize_history(df:pd.DataFrame)->pd.DataFrame:
+    return enforce_schema(df.rename(columns=COLUMN_RENAMES))
+
+NUMBERS_REQUIRED={"timestamp","volume_L","KH_atual","Ca_atual","Mg_atual"}
+# O caminho rápido lê a estrutura interna do numbers-parser; só roda nas versões (major.minor) conferidas
+# (requirements.txt fixa a mesma; tests/test_history.py compara os dois caminhos célula a célula).
+# Outra versão usa a API pública até passar nesse teste e entrar aqui.
+NUMBERS_FAST_VERSIONS=("4.21",)
+_numbers_fast_state=None  # None: ainda não conferido neste processo; True/False: bateu/não bateu com a API pública
+
+def _numbers_value(buf, model, table_id):
+    # decodifica só o valor de uma célula (layout v5 do numbers-parser); tipos raros → NotImplementedError
+    if buf is None: return None
+    if buf[0]!=5: raise NotImplementedError
+    ctype=buf[1]; flags=struct.unpack_from("<i",buf,8)[0]; off=12
+    d128=double=seconds=string_id=None
+    if flags & 0x1:
+        from numbers_parser.cell import _unpack_decimal128
+        d128=_unpack_decimal128(buf[off:off+16]); off+=16
+    if flags & 0x2: double=struct.unpack_from("<d",buf,off)[0]; off+=8
+    if flags & 0x4: seconds=struct.unpack_from("<d",buf,off)[0]; off+=8
+    if flags & 0x8: string_id=struct.unpack_from("<i",buf,off)[0]
+    if ctype==0: return None
+    if ctype in (2,10): return d128                   # número / moeda
+    if ctype==3: return model.table_string(table_id,string_id)
+    if ctype==5: return _NUMBERS_EPOCH+dt.timedelta(seconds=seconds)
+    if ctype==6: return double>0.0
+    raise NotImplementedError
+
+_NUMBERS_EPOCH=dt.datetime(2001,1,1)
+
+def _numbers_fast(path:str)->pd.DataFrame:
+    """Lê direto do modelo do numbers-parser: cabeçalho de cada tabela, depois só a tabela
+    escolhida, coluna a coluna. Evita montar um objeto Cell por célula do documento."""
+    from pathlib import Path
+    from numbers_parser.model import _NumbersModel
+    model=_NumbersModel(Path(path),None)
+    tables=[tid for sid in model.sheet_ids() for tid in model.table_ids(sid)]
+    if not tables: return pd.DataFrame()
+    def header(tid):
+        row=model.storage_buffers(tid).get(0) or []
+        return ["" if v is None else str(v) for v in (_numbers_value(b,model,tid) for b in row)]
+    headers=[header(tid) for tid in tables]
+    i=next((i for i,h in enumerate(headers) if NUMBERS_REQUIRED.issubset(h)),0)
+    tid,cols=tables[i],headers[i]
+    buffers=model.storage_buffers(tid); n=model.number_of_rows(tid)
+    rows=[buffers.get(r) or () for r in range(1,n)]
+    data={}
+    for j in range(len(cols)):
+        data[j]=[_numbers_value(r[j],model,tid) if j<len(r) else None for r in rows]
+    df=pd.DataFrame(data,index=range(len(rows))); df.columns=cols
+    return df
+
+def _numbers_header(t)->list[str]:
+    if t.num_rows==0: return []
+    return ["" if x is None else str(x) for x in next(t.iter_rows(max_row=0,values_only=True))]
+
+def _numbers_public(path:str)->pd.DataFrame:
+    from numbers_parser import Document
+    doc=Document(path)
+    tables=[t for s in doc.sheets for t in s.tables]
+    if not tables: return pd.DataFrame()
+    # escolhe a tabela olhando só a linha de cabeçalho; cai na primeira se nenhuma bater
+    headers=[_numbers_header(t) for t in tables]
+    i=next((i for i,h in enumerate(headers) if NUMBERS_REQUIRED.issubset(h)),0)
+    t,header=tables[i],headers[i]
+    if t.num_rows<=1: return pd.DataFrame(columns=header)
+    df=pd.DataFrame({j:col for j,col in enumerate(t.iter_cols(min_row=1,values_only=True))})
+    df.columns=header
+    return df
+
+def _numbers_fast_ok()->bool:
+    import numbers_parser
+    v=".".join(str(getattr(numbers_parser,"__version__","")).split(".")[:2])
+    return v in NUMBERS_FAST_VERSIONS and _numbers_fast_state is not False
+
+def _same_cell(a, b)->bool:
+    if a is None or a=="" or a!=a: return b is None or b=="" or b!=b
+    if isinstance(a,(int,float)) and isinstance(b,(int,float)) and not isinstance(a,bool): return math.isclose(a,b,rel_tol=1e-9)
+    return a==b
+
+def _numbers_agree(fast:pd.DataFrame, public:pd.DataFrame)->bool:
+    """Mesmo cabeçalho, tamanho e valor em todas as células nos dois caminhos."""
+    if list(fast.columns)!=list(public.columns) or fast.shape!=public.shape: return False
+    return all(_same_cell(a,b) for j in range(fast.shape[1])
+               for a,b in zip(fast.iloc[:,j].tolist(),public.iloc[:,j].tolist()))
+
+def _read_numbers(data:bytes)->pd.DataFrame:
+    global _numbers_fast_state
+    try:
+        import numbers_parser  # noqa: F401
+    except Exception:
+        raise HistoryLoadError("Para abrir .numbers, instale `numbers-parser` (ou exporte para CSV).") from None
+    # numbers-parser só abre por caminho; o temporário é apagado ao sair
+    fd,path=tempfile.mkstemp(suffix=".numbers")
+    try:
+        with os.fdopen(fd,"wb") as tmp: tmp.write(data)
+        if _numbers_fast_ok():
+            try: df=_numbers_fast(path)
+            except Exception: df=None  # célula de tipo incomum: API pública
+            if df is not None:
+                if _numbers_fast_state: return df
+                # primeiro arquivo do processo: confere com o Document (que monta todas as células — por isso
+                # só uma vez); divergência desliga o caminho rápido até reiniciar
+                public=_numbers_public(path); _numbers_fast_state=_numbers_agree(df,public)
+                return df if _numbers_fast_state else public
+        return _numbers_public(path)
+    finally:
+        os.unlink(path)
+
+# -------- CSV em blocos (logs longos de controlador) --------
+def _coerce_chunk(df:pd.DataFrame, fmt:str|None)->pd.DataFrame:
+    df=df.rename(columns=COLUMN_RENAMES)
+    df["timestamp"]=parse_ts(df["timestamp"],fmt)
+    for c in NUMERIC_COLUMNS:
+        if c in df.columns: df[c]=pd.to_numeric(df[c],errors="coerce").astype(MEASUREMENT_DTYPE)
+    return df.dropna(subset=["timestamp"])
+
+def _last_per_period(df:pd.DataFrame, resolution:str)->pd.DataFrame:
+    # mesmo critério do "Compactar por dia": último valor não nulo de cada coluna no período
+    period=df["timestamp"].dt.floor(resolution)
+    return df.groupby(period,sort=True).last().reset_index(drop=True)
+
+def read_csv_chunked(src, resolution:str|None="D", chunksize:int=100_000)->pd.DataFrame:
+    """Lê um CSV em blocos de `chunksize` linhas, já renomeando, tipando e agregando ao
+    `resolution` (ex.: "D") durante a leitura. O pico de memória segue o bloco, não o arquivo.
+    Com resolution=None, só renomeia/tipa (sem agregação)."""
+    parts=[]; carry=None; fmt=False
+    for chunk in pd.read_csv(src,chunksize=chunksize):
+        if "timestamp" not in chunk.rename(columns=COLUMN_RENAMES).columns:
+            raise HistoryLoadError("O CSV precisa de uma coluna `timestamp` para leitura em blocos.")
+        if fmt is False:  # decide o formato uma vez, no primeiro bloco
+            fmt=detect_ts_format(chunk.rename(columns=COLUMN_RENAMES)["timestamp"])
+        chunk=_coerce_chunk(chunk,fmt)
+        if resolution is None: parts.append(chunk); continue
+        if carry is not None: chunk=pd.concat([carry,chunk],ignore_index=True)
+        if chunk.empty: continue
+        chunk=chunk.sort_values("timestamp",kind="stable")
+        # o último período pode continuar no próximo bloco: segura até fechar
+        period=chunk["timestamp"].dt.floor(resolution); open_=period==period.iloc[-1]
+        carry=chunk[open_]
+        if (~open_).any(): parts.append(_last_per_period(chunk[~open_],resolution))
+    if carry is not None and not carry.empty: parts.append(_last_per_period(carry,resolution))
+    if not parts: return enforce_schema(pd.DataFrame(columns=HISTORY_COLUMNS))
+    df=pd.concat(parts,ignore_index=True)
+    if resolution is not None:  # arquivo fora de ordem: períodos repetidos entre blocos
+        df=_last_per_period(df.sort_values("timestamp",kind="stable"),resolution)
+    return enforce_schema(df)
+
+def read_history(data:bytes, name:str)->pd.DataFrame:
+    """Lê bytes de um arquivo de histórico e devolve o DataFrame normalizado."""
+    name=(name or "").lower()
+    if not name.endswith((".csv",".xlsx",".xls",".numbers")):
+        raise HistoryLoadError("Formato não suportado. Use CSV, XLSX, XLS ou NUMBERS.")
+    try:
+        if name.endswith(".csv"): df=pd.read_csv(io.BytesIO(data))
+        elif name.endswith((".xlsx",".xls")): df=pd.read_excel(io.BytesIO(data))
+        else: df=_read_numbers(data)
+        return normalize_history(df)
+    except HistoryLoadError: raise
+    except Exception as e:
+        raise HistoryLoadError("Não consegui ler o arquivo. Tente CSV/Excel ou verifique o conteúdo.") from e
+
+# -------- Cache por conteúdo (compartilhado entre sessões) --------
+def content_key(data:bytes, name:str)->str:
+    ext=(name or "").lower().rsplit(".",1)[-1]
+    return f"{hashlib.sha256(data).hexdigest()}.{ext}"
+
+HISTORY_CACHE=LRUCache(sizeof=lambda df: df.memory_usage(deep=True).sum(), copy=lambda df: df.copy())
+
+def load_history_cached(data:bytes, name:str, key:str|None=None, resolution:str|None=None)->pd.DataFrame:
+    """Como read_history, mas reaproveita o resultado de qualquer sessão que já leu o mesmo conteúdo.
+    Com `resolution` (só CSV), usa a leitura em blocos agregada por período."""
+    key=key or content_key(data,name)
+    if resolution is None:
+        return HISTORY_CACHE.get_or_load(key, lambda: read_history(data,name))
+    if not (name or "").lower().endswith(".csv"):
+        raise HistoryLoadError("A leitura em blocos só vale para CSV.")
+    def load():
+        try: return read_csv_chunked(io.BytesIO(data),resolution)
+        except HistoryLoadError: raise
+        except Exception as e:
+            raise HistoryLoadError("Não consegui ler o arquivo. Tente CSV/Excel ou verifique o conteúdo.") from e
+    return HISTORY_CACHE.get_or_load(f"{key}@{resolution}", load)
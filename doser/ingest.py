@@ -0,0 +1,315 @@
+# doser/ingest.py — ingestão ao vivo de leituras do controlador (asyncio, em segundo plano)
+# Fontes: uma pasta de entrada (arquivos .json/.jsonl/.csv/.xlsx largados ali) e um endpoint TCP local
+# que aceita JSON por linha (socket) ou HTTP (POST /readings, GET /status).
+# As leituras passam por uma fila limitada — quando enche, quem envia espera (back-pressure: o socket
+# para de ser lido, o HTTP responde 503 depois de `put_timeout`) — e são gravadas em micro-lotes:
+# uma transação por tanque a cada `flush_ms` ou `batch_max` leituras. Datas repetidas (no lote ou já
+# no banco) são descartadas pelo store. Cada lote com leitura nova incrementa `generation`.
+import asyncio, json, threading, time, datetime as dt
+from collections import deque
+from pathlib import Path
+import numpy as np
+from doser import history
+from doser.store import DEFAULT_TANK
+
+DROP_EXTS=(".json",".jsonl",".ndjson",".csv",".xlsx",".xls",".numbers")
+ALIASES={"KH":"KH_atual","Ca":"Ca_atual","Mg":"Mg_atual","ts":"timestamp","time":"timestamp","tank":"tank_id",
+         **history.COLUMN_RENAMES}
+MEASURED=("KH_atual","Ca_atual","Mg_atual")
+LINE_LIMIT=2**20  # maior linha aceita no socket / cabeçalho HTTP (bytes)
+
+class IngestError(RuntimeError):
+    """Serviço não pôde subir (porta ocupada, pasta inválida); mensagem pronta para o usuário."""
+
+# -------- normalização de uma leitura --------
+def _timestamp(v, now_if_missing:bool=True)->dt.datetime:
+    # sem data: agora (só ao vivo); número: epoch (s ou ms); texto ISO; com fuso → horário local sem fuso, como o app grava
+    if v is None or v=="" or v!=v:
+        if not now_if_missing: raise ValueError("leitura sem data")
+        return dt.datetime.now().replace(microsecond=0)
+    if isinstance(v,(int,float)):
+        try: return dt.datetime.fromtimestamp(v/1000 if v>1e11 else v)
+        except (OverflowError,OSError): raise ValueError(f"data fora do intervalo: {v}") from None
+    t=v if isinstance(v,dt.datetime) else dt.datetime.fromisoformat(str(v).strip().replace("Z","+00:00"))
+    return t.astimezone().replace(tzinfo=None) if t.tzinfo else t
+
+def normalize_reading(obj:dict, tank:str=DEFAULT_TANK, now_if_missing:bool=True)->tuple[str,dict]:
+    """{"ts": ..., "KH": 8.4, "Ca": 425, ...} → (tank_id, linha no formato do store).
+    Aceita os nomes do histórico (KH_atual, "KH atual"…) e os curtos; ValueError se não houver KH/Ca/Mg.
+    Sem data vale "agora" só para leituras ao vivo; de arquivo (`now_if_missing=False`) é ValueError."""
+    if not isinstance(obj,dict): raise ValueError("leitura precisa ser um objeto JSON")
+    row={ALIASES.get(k,k):v for k,v in obj.items()}
+    tank=str(row.pop("tank_id",None) or tank)
+    ts=_timestamp(row.get("timestamp"),now_if_missing)
+    vals={}
+    for c in history.NUMERIC_COLUMNS:
+        v=row.get(c)
+        if v is None or v=="": continue
+        v=float(str(v).replace(",",".")) if isinstance(v,str) else float(v)
+        if v==v: vals[c]=v
+    if not any(c in vals for c in MEASURED): raise ValueError("leitura sem KH, Ca ou Mg")
+    obs=row.get("obs")
+    obs="" if obs is None or obs!=obs else str(obs).strip()  # NaN (JSON aceita) não vira o texto "nan"
+    return tank,{"timestamp":ts,**vals,"obs":obs}
+
+def read_drop_file(path:Path)->list[dict]:
+    """Registros de um arquivo da pasta de entrada (ainda não normalizados); data ilegível vira None."""
+    suffix=path.suffix.lower()
+    if suffix==".json":
+        data=json.loads(path.read_text(encoding="utf-8"))
+        return data if isinstance(data,list) else [data]
+    if suffix in (".jsonl",".ndjson"):
+        return [json.loads(l) for l in path.read_text(encoding="utf-8").splitlines() if l.strip()]
+    df=history.read_history(path.read_bytes(),path.name)
+    df=df.astype(object).where(df.notna(),None)
+    return df.to_dict("records")
+
+# -------- serviço --------
+class IngestService:
+    """Loop asyncio numa thread própria (o Streamlit é síncrono); um por processo, como o store.
+    `start()` sobe e devolve quando o endpoint já está ouvindo; `stop()` grava o que ficou na fila."""
+    def __init__(self, store, drop_dir:str|Path|None=None, host:str="127.0.0.1", port:int|None=None,
+                 tank:str=DEFAULT_TANK, batch_max:int=2000, flush_ms:int=250, queue_max:int=20_000,
+                 poll_s:float=1.0, put_timeout:float=2.0):
+        self.store=store; self.drop_dir=Path(drop_dir).expanduser() if drop_dir else None
+        self.host=host; self.port=port; self.tank=tank
+        self.batch_max=batch_max; self.flush_s=flush_ms/1000; self.queue_max=queue_max
+        self.poll_s=poll_s; self.put_timeout=put_timeout
+        self.generation=0; self.changed={}  # tank → generation da última leitura nova
+        self._cond=threading.Condition(); self._thread=None; self._loop=None; self._stop=None; self._queue=None
+        self._clients={}  # writer → tarefa de cada conexão aberta (fechadas no stop: wait_closed espera por elas)
+        self._counts=dict.fromkeys(("recebidas","gravadas","repetidas","rejeitadas","lotes","arquivos"),0)
+        self._recent=deque(maxlen=256)  # (instante, gravadas no lote) para a taxa
+        self.last_batch={"leituras":0,"ms":0.0}; self.last_error=None; self.started=None
+
+    @property
+    def running(self)->bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running: return
+        if self.drop_dir is None and self.port is None: raise IngestError("Informe a pasta de entrada e/ou a porta.")
+        ready=threading.Event(); err=[]
+        def main():
+            try: asyncio.run(self.serve(ready))
+            except Exception as e:
+                err.append(e); ready.set()
+        self._thread=threading.Thread(target=main,name="doser-ingest",daemon=True); self._thread.start()
+        ready.wait()
+        if err:
+            self._thread.join(); self._thread=None
+            raise IngestError(f"Não consegui iniciar a ingestão: {err[0]}") from err[0]
+
+    def stop(self, timeout:float=10.0):
+        if not self.running: return
+        self._loop.call_soon_threadsafe(self._stop.set); self._thread.join(timeout)
+        # thread ainda viva segura a porta: não esquece dela, senão o próximo start() subiria um segundo loop
+        if self._thread.is_alive(): raise IngestError(f"A ingestão não parou em {timeout:g} s; tente parar de novo.")
+        self._thread=None
+
+    async def serve(self, ready:threading.Event|None=None):
+        """Corre até stop(); pode ser usado direto com asyncio.run (sem thread)."""
+        self._loop=asyncio.get_running_loop(); self._stop=asyncio.Event()
+        self._queue=asyncio.Queue(self.queue_max)
+        server=None; tasks=[]
+        try:
+            if self.drop_dir is not None:
+                self.drop_dir.mkdir(parents=True,exist_ok=True)
+                (self.drop_dir/"processados").mkdir(exist_ok=True); (self.drop_dir/"com_erro").mkdir(exist_ok=True)
+            if self.port is not None:
+                server=await asyncio.start_server(self._handle,self.host,self.port,limit=LINE_LIMIT)
+                self.port=server.sockets[0].getsockname()[1]  # porta 0 → a que o sistema escolheu
+        except OSError as e:
+            raise IngestError(str(e)) from e
+        self.started=time.time()
+        writer=asyncio.create_task(self._writer())
+        if self.drop_dir is not None: tasks.append(asyncio.create_task(self._watch()))
+        if ready: ready.set()
+        try: await self._stop.wait()
+        finally:
+            if server:
+                server.close()
+                clients=dict(self._clients)
+                for w in clients: w.close()  # socket persistente: readline devolve b"" e o handler termina
+                if clients: await asyncio.wait(clients.values(),timeout=5)
+                await server.wait_closed()
+            for t in tasks: t.cancel()
+            await asyncio.gather(*tasks,return_exceptions=True)
+            await self._queue.join(); writer.cancel()
+
+    # -------- entrada --------
+    async def _put(self, obj, timeout:float|None=None, from_file:bool=False)->bool:
+        try: item=normalize_reading(obj,self.tank,now_if_missing=not from_file)
+        except (ValueError,TypeError,OverflowError,OSError) as e:
+            self._counts["rejeitadas"]+=1; self.last_error=str(e); return True
+        self._counts["recebidas"]+=1
+        if not self._queue.full(): self._queue.put_nowait(item); return True
+        if timeout is None: await self._queue.put(item); return True
+        try: await asyncio.wait_for(self._queue.put(item),timeout); return True
+        except asyncio.TimeoutError: self._counts["recebidas"]-=1; return False
+
+    async def _handle(self, reader:asyncio.StreamReader, writer:asyncio.StreamWriter):
+        self._clients[writer]=asyncio.current_task()
+        try:
+            line=await self._readline(reader)
+            if line[:5] in (b"POST ",b"PUT /",b"GET /"): await self._http(line,reader,writer)
+            else:
+                # socket: uma leitura JSON por linha; enquanto a fila está cheia, esta conexão não é lida
+                while line:
+                    if line.strip():
+                        try: await self._put(json.loads(line))
+                        except json.JSONDecodeError as e: self._counts["rejeitadas"]+=1; self.last_error=str(e)
+                    line=await self._readline(reader)
+        except (ConnectionError,asyncio.IncompleteReadError,asyncio.LimitOverrunError): pass
+        finally:
+            self._clients.pop(writer,None); writer.close()
+            try: await writer.wait_closed()
+            except ConnectionError: pass
+
+    async def _readline(self, reader:asyncio.StreamReader)->bytes:
+        """Próxima linha do socket; linha acima de LINE_LIMIT é descartada inteira e conta como rejeitada."""
+        tail=False
+        while True:
+            try: line=await reader.readline()
+            except ValueError as e:  # LimitOverrunError do asyncio: o trecho lido já foi descartado
+                if not tail: self._counts["rejeitadas"]+=1; self.last_error=f"linha acima de {LINE_LIMIT} bytes"
+                tail="not found" in str(e)  # separador ainda não chegou: o resto da linha vem na próxima leitura
+                continue
+            if not tail: return line
+            tail=False  # fim da linha longa, também descartado
+
+    async def _http(self, request:bytes, reader, writer):
+        try:
+            method,path=request.decode("latin-1").split()[:2]
+            headers={}
+            while (h:=await reader.readline()).strip():
+                k,_,v=h.decode("latin-1").partition(":"); headers[k.strip().lower()]=v.strip()
+            length=int(headers.get("content-length",0) or 0)
+            if length<0: raise ValueError("content-length negativo")
+        except ValueError as e: return _respond(writer,400,{"erro":f"requisição inválida: {e}"})
+        if method=="GET" and path.rstrip("/") in ("","/status"): return _respond(writer,200,self.stats())
+        if method not in ("POST","PUT") or path.rstrip("/")!="/readings": return _respond(writer,404,{"erro":"use POST /readings"})
+        body=await reader.readexactly(length)
+        try:
+            data=json.loads(body) if body.lstrip()[:1] in (b"[",b"{") else [json.loads(l) for l in body.splitlines() if l.strip()]
+        except json.JSONDecodeError as e: return _respond(writer,400,{"erro":str(e)})
+        rows=data if isinstance(data,list) else [data]; before=self._counts["rejeitadas"]
+        for i,obj in enumerate(rows):
+            if not await self._put(obj,self.put_timeout):
+                return _respond(writer,503,{"aceitas":i,"erro":"fila cheia, tente de novo"},{"Retry-After":"1"})
+        _respond(writer,202,{"aceitas":len(rows)-(self._counts["rejeitadas"]-before),
+                             "rejeitadas":self._counts["rejeitadas"]-before})
+
+    async def _watch(self):
+        # arquivo recém-modificado pode estar sendo escrito: fica para a próxima volta
+        while True:
+            now=time.time()
+            try: files=sorted(self.drop_dir.iterdir())
+            except OSError as e: self.last_error=f"pasta de entrada: {e}"; files=[]
+            for p in files:
+                if p.name.startswith(".") or p.suffix.lower() not in DROP_EXTS: continue
+                # arquivo que some ou não pode ser movido não derruba a vigia: registra e segue para o próximo
+                try:
+                    if not p.is_file() or now-p.stat().st_mtime<self.poll_s: continue
+                    try: rows=await asyncio.to_thread(read_drop_file,p)
+                    except (ValueError,OSError,history.HistoryLoadError) as e:
+                        self.last_error=f"{p.name}: {e}"; p.replace(self.drop_dir/"com_erro"/p.name); continue
+                    for obj in rows: await self._put(obj,from_file=True)  # sem data → rejeitada, não "agora"
+                    p.replace(self.drop_dir/"processados"/p.name); self._counts["arquivos"]+=1
+                except OSError as e: self.last_error=f"{p.name}: {e}"
+            await asyncio.sleep(self.poll_s)
+
+    # -------- gravação em micro-lotes --------
+    async def _writer(self):
+        q=self._queue
+        while True:
+            batch=[await q.get()]
+            # fila curta: espera flush_ms juntando o que chegar; com a fila cheia grava direto, sem pausa
+            if q.qsize()<self.batch_max-1: await asyncio.sleep(self.flush_s)
+            while len(batch)<self.batch_max and not q.empty(): batch.append(q.get_nowait())
+            try: await asyncio.to_thread(self._commit,batch)
+            except Exception as e: self.last_error=f"gravação: {e}"
+            finally:
+                for _ in batch: q.task_done()
+
+    def _commit(self, batch:list[tuple[str,dict]]):
+        t=time.perf_counter(); by_tank={}
+        for tank,row in batch: by_tank.setdefault(tank,[]).append(row)
+        added={tank:self.store.append_many(rows,tank) for tank,rows in by_tank.items()}  # uma transação por tanque
+        n=sum(added.values())
+        self._counts["gravadas"]+=n; self._counts["repetidas"]+=len(batch)-n; self._counts["lotes"]+=1
+        self.last_batch={"leituras":len(batch),"ms":(time.perf_counter()-t)*1000}; self._recent.append((time.time(),n))
+        if n:
+            with self._cond:
+                self.generation+=1
+                for tank,k in added.items():
+                    if k: self.changed[tank]=self.generation
+                self._cond.notify_all()
+
+    # -------- para a UI --------
+    def wait(self, generation:int, timeout:float|None=None)->int:
+        """Bloqueia até haver um lote gravado depois de `generation` (ou estourar o timeout); devolve a atual."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.generation>generation,timeout)
+            return self.generation
+
+    def stats(self)->dict:
+        now=time.time(); recent=[n for t,n in self._recent if now-t<=10]
+        return {**self._counts,"fila":self._queue.qsize() if self._queue else 0,
+                "por_segundo":round(sum(recent)/10,1),"ultimo_lote":self.last_batch,
+                "geracao":self.generation,"porta":self.port,"pasta":str(self.drop_dir) if self.drop_dir else None,
+                "erro":self.last_error}
+
+def _respond(writer, status:int, body:dict, headers:dict|None=None):
+    data=json.dumps(body,ensure_ascii=False).encode()
+    reason={200:"OK",202:"Accepted",400:"Bad Request",404:"Not Found",503:"Service Unavailable"}[status]
+    head=[f"HTTP/1.1 {status} {reason}","Content-Type: application/json; charset=utf-8",
+          f"Content-Length: {len(data)}","Connection: close",*(f"{k}: {v}" for k,v in (headers or {}).items())]
+    writer.write(("\r\n".join(head)+"\r\n\r\n").encode()+data)
+
+# -------- dispositivo de teste --------
+async def fake_device(host:str="127.0.0.1", port:int|None=None, drop_dir:str|Path|None=None, rate:float=1000,
+                      seconds:float=10, tank:str=DEFAULT_TANK, via:str="socket", batch:int=200,
+                      step_s:int=60, dup:float=0.01, seed:int=0)->int:
+    """Controlador simulado: passeio aleatório de KH/Ca/Mg a `rate` leituras/s durante `seconds`.
+    As datas avançam `step_s` por leitura (um log acelerado) e uma fração `dup` é reenviada, para
+    exercitar a deduplicação. via: "socket" (JSON por linha), "http" (POST em lotes de `batch`) ou
+    "dir" (um .jsonl por lote na pasta de entrada). Devolve quantas leituras enviou."""
+    r=np.random.default_rng(seed); level=np.array([8.5,420.0,1300.0])
+    t0=dt.datetime.now().replace(microsecond=0)-dt.timedelta(seconds=step_s*int(rate*seconds))
+    sent=0; i=0; start=time.perf_counter(); prev=[]
+    conn=await asyncio.open_connection(host,port) if via=="socket" else None
+    if via=="dir": Path(drop_dir).mkdir(parents=True,exist_ok=True)
+    try:
+        while (elapsed:=time.perf_counter()-start)<seconds:
+            k=max(1,min(batch,int(rate*elapsed)-sent))
+            rows=[]
+            for _ in range(k):
+                level=level+r.normal(0,[.01,.2,.3]); i+=1
+                rows.append({"ts":(t0+dt.timedelta(seconds=step_s*i)).isoformat(),"tank":tank,
+                             "KH":round(level[0],2),"Ca":round(level[1],2),"Mg":round(level[2],2)})
+            if prev: rows+=[prev[j] for j in r.integers(0,len(prev),r.binomial(len(rows),dup))]
+            prev=rows[-50:]
+            if via=="socket":
+                conn[1].write(b"".join(json.dumps(x).encode()+b"\n" for x in rows)); await conn[1].drain()
+            elif via=="http": await _post(host,port,rows)
+            else:
+                p=Path(drop_dir)/f"{tank}_{i:09d}.jsonl"; tmp=p.with_suffix(".tmp")
+                tmp.write_text("".join(json.dumps(x)+"\n" for x in rows)); tmp.replace(p)
+            sent+=len(rows)
+            ahead=sent/rate-(time.perf_counter()-start)
+            if ahead>0: await asyncio.sleep(ahead)
+    finally:
+        if conn: conn[1].close(); await conn[1].wait_closed()
+    return sent
+
+async def _post(host:str, port:int, rows:list[dict]):
+    body=json.dumps(rows).encode()
+    while True:
+        reader,writer=await asyncio.open_connection(host,port)
+        writer.write(f"POST /readings HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n\r\n".encode()+body)
+        await writer.drain(); status=(await reader.readline()).split()[1]; await reader.read()
+        writer.close(); await writer.wait_closed()
+        if status!=b"503": return
+        await asyncio.sleep(1)  # back-pressure do serviço: espera e reenvia
@@ -0,0 +1,73 @@
+# doser/planner.py — plano multi-dia de Fusion 1 & 2 (pareado ou partes separadas)
+# Cada parâmetro é afim na dose acumulada D_t:  KH_t = KH_0 + D_t·kh_per_ml − t·consumo.
+# Os limites viram um intervalo para D_t por dia; uma passada para frente acha a dose
+# acumulada máxima alcançável (hi_t) e uma para trás escolhe, dentro dela, a mais próxima
+# do caminho que segura o alvo — o que chega ao alvo no menor número de dias sem
+# ultrapassar o teto (faixa ou alvo), a dose máxima por dia nem o limite de alta de KH.
+# Tudo vetorizado por tanque: o laço é só sobre os dias.
+import numpy as np
+from doser.engine import REEF_DEFAULTS, REEF_RANGES, _columns, dkh_from_meq
+
+TOL={"KH":0.01,"Ca":0.5}
+
+def _plan_1d(U, Dstar, step):
+    """U, Dstar: (n, days+1) teto e alvo da dose acumulada; step: (n,) dose máxima por dia."""
+    n,T=U.shape; step=step[:,None] if np.ndim(step) else np.full((n,1),step)
+    hi=np.zeros((n,T))
+    for t in range(1,T):
+        hi[:,t]=np.maximum(0.0,np.minimum(U[:,t],hi[:,t-1]+step[:,0]))
+    D=np.zeros((n,T))
+    D[:,-1]=np.clip(Dstar[:,-1],0.0,hi[:,-1])
+    for t in range(T-1,0,-1):
+        lo_=np.maximum(0.0,D[:,t]-step[:,0]); hi_=np.minimum(hi[:,t-1],D[:,t])
+        D[:,t-1]=np.clip(Dstar[:,t-1],lo_,np.maximum(lo_,hi_))
+    D[:,0]=0.0
+    return D
+
+def _first_day(ok):
+    hit=ok.any(axis=1)
+    return np.where(hit,ok.argmax(axis=1).astype(float),np.inf)
+
+def plan_doses(tanks, days:int=30, mode:str="paired", ranges:dict=REEF_RANGES)->dict:
+    """Plano de `days` dias para cada tanque (colunas como engine.reef_plan).
+    mode="paired": mesma dose de Fusion 1 e 2 por dia; mode="separate": cada parte com sua dose.
+    Devolve arrays: dose_f1/dose_f2 (n, days) em mL/dia, KH/Ca/Mg (n, days+1) e
+    days_kh/days_ca/mg_out_day (n,) — inf quando não acontece no horizonte."""
+    c=_columns(tanks,REEF_DEFAULTS); vol=c["volume_L"]; n=len(vol)
+    ca_per_ml=c["ca_ppm_per_ml_per_25L"]*(25.0/vol)
+    kh_per_ml=dkh_from_meq(c["alk_meq_per_ml_per_25L"])*(25.0/vol)
+    max_ml_tank=c["max_ml_per_25L_day"]*(vol/25.0)
+    t=np.arange(days+1)[None,:]
+    kh0,ca0,mg0=c["kh_now"][:,None],c["ca_now"][:,None],c["mg_now"][:,None]
+    kh_cons,ca_cons,mg_cons=c["kh_cons"][:,None],c["ca_cons"][:,None],c["mg_cons"][:,None]
+    # teto: pareado usa o máximo da faixa (como max(ml_f2, ml_f1) no plano diário, o Ca pode pedir
+    # mais dose do que o KH); separado não passa do próprio alvo. O alvo do usuário nunca é cortado.
+    kh_ceil=(np.maximum(c["kh_target"],ranges["KH"][1]) if mode=="paired" else c["kh_target"])[:,None]
+    ca_ceil=(np.maximum(c["ca_target"],ranges["Ca"][1]) if mode=="paired" else c["ca_target"])[:,None]
+
+    with np.errstate(divide="ignore",invalid="ignore"):
+        kpm=np.where(kh_per_ml>0,kh_per_ml,np.nan)[:,None]; cpm=np.where(ca_per_ml>0,ca_per_ml,np.nan)[:,None]
+        U_kh=np.nan_to_num((kh_ceil-kh0+t*kh_cons)/kpm,nan=np.inf)
+        D_kh=np.nan_to_num((c["kh_target"][:,None]-kh0+t*kh_cons)/kpm,nan=0.0)
+        D_ca=np.nan_to_num((c["ca_target"][:,None]-ca0+t*ca_cons)/cpm,nan=0.0)
+        step_kh=np.minimum(max_ml_tank,np.nan_to_num((c["max_kh_raise_net"]+c["kh_cons"])/kpm[:,0],nan=0.0))
+        if mode=="paired":
+            U_ca=np.nan_to_num((ca_ceil-ca0+t*ca_cons)/cpm,nan=np.inf)
+            D=_plan_1d(np.minimum(U_kh,U_ca),np.maximum(D_kh,D_ca),step_kh)
+            D2=D1=D
+        elif mode=="separate":
+            U_ca=np.nan_to_num((ca_ceil-ca0+t*ca_cons)/cpm,nan=np.inf)
+            D2=_plan_1d(U_kh,D_kh,step_kh)
+            D1=_plan_1d(U_ca,D_ca,max_ml_tank)
+        else:
+            raise ValueError(f"modo desconhecido: {mode}")
+
+    KH=kh0+D2*np.nan_to_num(kpm)-t*kh_cons
+    Ca=ca0+D1*np.nan_to_num(cpm)-t*ca_cons
+    Mg=np.maximum(0.0,mg0-t*mg_cons)
+    return {
+        "dose_f1":np.diff(D1,axis=1),"dose_f2":np.diff(D2,axis=1),"KH":KH,"Ca":Ca,"Mg":Mg,
+        "days_kh":_first_day(KH>=c["kh_target"][:,None]-TOL["KH"]),
+        "days_ca":_first_day(Ca>=c["ca_target"][:,None]-TOL["Ca"]),
+        "mg_out_day":_first_day(Mg<ranges["Mg"][0]),
+    }
@@ -0,0 +1,91 @@
+# doser/profiling.py — tempo por seção nomeada de cada rerun (opt-in)
+# Sem medição ativa na thread, section() devolve um contexto vazio (custo desprezível);
+# com run() ativo, soma os ms de cada seção, guarda os últimos `window` valores por seção (p50/p95)
+# e grava uma linha JSON por rerun no log.
+import contextlib, functools, json, os, threading, time
+from collections import deque
+from pathlib import Path
+import numpy as np
+
+_NULL=contextlib.nullcontext()
+_current=threading.local()  # o Streamlit roda cada sessão numa thread: a medição em curso é por thread
+
+def default_log_path()->Path:
+    return Path(os.environ.get("DOSER_PROFILE_LOG") or Path.home()/".doser"/"profile.jsonl")
+
+class Profiler:
+    """Histograma móvel por seção, compartilhado entre sessões do processo; log JSONL opcional."""
+    def __init__(self, window:int=500, log_path:str|Path|None=None):
+        self.window=window; self.log_path=Path(log_path) if log_path else None
+        self._hist={}; self._lock=threading.Lock(); self.runs=0
+
+    def begin(self, label:str):
+        """Começa a medir um rerun nesta thread (descarta uma medição anterior que não terminou)."""
+        _current.run={"label":label,"sections":{},"t0":time.perf_counter()}
+
+    def end(self, **meta)->dict|None:
+        """Fecha a medição corrente desta thread, registra e devolve {label, total_ms, sections}."""
+        rec=getattr(_current,"run",None); _current.run=None
+        if rec is None: return None
+        total=(time.perf_counter()-rec["t0"])*1000
+        self.record(rec["label"],total,rec["sections"],**meta)
+        return {"label":rec["label"],"total_ms":total,"sections":rec["sections"]}
+
+    @contextlib.contextmanager
+    def run(self, label:str, **meta):
+        """Mede um bloco como um rerun (ex.: fragmento). Dentro de outra medição, só repassa."""
+        if getattr(_current,"run",None) is not None:
+            yield; return
+        self.begin(label)
+        try: yield
+        finally: self.end(**meta)
+
+    def record(self, label:str, total_ms:float, sections:dict, **meta):
+        with self._lock:
+            self.runs+=1
+            for name,ms in ((f"[{label}] total",total_ms),*sections.items()):
+                self._hist.setdefault(name,deque(maxlen=self.window)).append(ms)
+            if self.log_path is None: return
+            line={"ts":time.time(),"label":label,"total_ms":round(total_ms,3),
+                  "sections":{k:round(v,3) for k,v in sections.items()},**meta}
+            self.log_path.parent.mkdir(parents=True,exist_ok=True)
+            with open(self.log_path,"a",encoding="utf-8") as f: f.write(json.dumps(line,ensure_ascii=False)+"\n")
+
+    def summary(self)->list[dict]:
+        """Uma linha por seção: amostras, último, p50 e p95 (ms) na janela móvel."""
+        with self._lock:
+            items=[(k,np.fromiter(v,dtype="float64")) for k,v in self._hist.items()]
+        return [{"seção":k,"n":len(v),"último (ms)":round(v[-1],2),"p50 (ms)":round(float(np.percentile(v,50)),2),
+                 "p95 (ms)":round(float(np.percentile(v,95)),2)} for k,v in sorted(items,key=lambda kv: kv[0])]
+
+    def histogram(self, name:str, bins:int=12):
+        """Histograma da janela móvel de uma seção: DataFrame (ms = centro da faixa, reruns); None se vazio."""
+        with self._lock:
+            v=np.fromiter(self._hist.get(name,()),dtype="float64")
+        if not len(v): return None
+        import pandas as pd
+        counts,edges=np.histogram(v,bins=bins)
+        return pd.DataFrame({"ms":((edges[:-1]+edges[1:])/2).round(1),"reruns":counts})
+
+    def reset(self):
+        with self._lock: self._hist.clear(); self.runs=0
+
+def section(name:str):
+    """`with section("parse_ts"):` — soma o tempo do bloco na medição corrente desta thread, se houver."""
+    rec=getattr(_current,"run",None)
+    return _NULL if rec is None else _timed(rec["sections"],name)
+
+@contextlib.contextmanager
+def _timed(sections:dict, name:str):
+    t0=time.perf_counter()
+    try: yield
+    finally: sections[name]=sections.get(name,0.0)+(time.perf_counter()-t0)*1000
+
+def timed(name:str):
+    """Decorador: a função inteira conta como a seção `name`."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*a,**k):
+            with section(name): return fn(*a,**k)
+        return wrapper
+    return deco
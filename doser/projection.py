@@ -0,0 +1,53 @@
+# doser/projection.py — projeção KH/Ca/Mg em forma fechada (somas acumuladas) + Monte Carlo
+# Reproduz o passo diário do card "Projeção (simulada)":
+#   KH ← min(alvo, KH + max(0, min(ganho − consumo, limite de alta)))
+#   Ca ← min(alvo, Ca + ganho − consumo)
+#   Mg ← max(0, Mg − consumo)
+# sem laço em Python: cada trajetória é uma soma acumulada com teto/piso “refletido”.
+import numpy as np
+
+def clamped_cumsum(v0, steps, upper=None, lower=None):
+    """v_t = min(upper, v_{t-1} + steps_t) (ou max(lower, …)) ao longo do último eixo, em O(n) vetorizado.
+    Devolve v_0..v_n (n+1 valores); v0 não é limitado, como no laço original."""
+    steps=np.asarray(steps,float); v0=np.asarray(v0,float)
+    s=v0[...,None]+np.cumsum(steps,axis=-1)
+    if upper is not None:
+        s=s-np.maximum.accumulate(np.maximum(0.0,s-np.asarray(upper,float)[...,None]),axis=-1)
+    elif lower is not None:
+        s=s+np.maximum.accumulate(np.maximum(0.0,np.asarray(lower,float)[...,None]-s),axis=-1)
+    return np.concatenate([np.broadcast_to(v0[...,None],s.shape[:-1]+(1,)),s],axis=-1)
+
+def _daily_steps(kh_gain, ca_gain, kh_cons, ca_cons, mg_cons, max_kh_raise):
+    kh_gain=np.maximum(0.0,kh_gain); ca_gain=np.maximum(0.0,ca_gain)
+    kh=np.maximum(0.0,np.minimum(kh_gain-kh_cons,max_kh_raise))
+    return kh, ca_gain-ca_cons, -np.asarray(mg_cons,float)
+
+def project(kh_now, ca_now, mg_now, kh_gain, ca_gain, kh_cons, ca_cons, mg_cons,
+            kh_target, ca_target, max_kh_raise, days:int)->dict:
+    """Trajetória determinística (dose e consumo constantes), dias 0..days. Entradas escalares ou arrays
+    (um tanque por posição) → arrays (…, days+1)."""
+    kh,ca,mg=_daily_steps(kh_gain,ca_gain,kh_cons,ca_cons,mg_cons,max_kh_raise)
+    ones=np.ones(days)
+    return {"KH":clamped_cumsum(kh_now,np.asarray(kh)[...,None]*ones,upper=kh_target),
+            "Ca":clamped_cumsum(ca_now,np.asarray(ca)[...,None]*ones,upper=ca_target),
+            "Mg":clamped_cumsum(mg_now,np.asarray(mg)[...,None]*ones,lower=0.0)}
+
+def monte_carlo(kh_now, ca_now, mg_now, kh_gain, ca_gain, kh_cons, ca_cons, mg_cons,
+                kh_target, ca_target, max_kh_raise, days:int, noise:dict, n:int=1000, seed:int=0)->dict:
+    """`n` cenários de uma vez. O consumo de cada dia é o informado mais um desvio sorteado (bootstrap)
+    de `noise[param]` — desvios observados em torno da mediana do histórico. Sem amostras, o parâmetro
+    fica determinístico. Devolve {param: array (n, days+1)}."""
+    rng=np.random.default_rng(seed)
+    def sample(key, base):
+        d=np.asarray(noise.get(key,()),float)
+        if d.size==0: return np.full((n,days),float(base))
+        return base+rng.choice(d,size=(n,days))
+    kh,ca,mg=_daily_steps(kh_gain,ca_gain,sample("KH",kh_cons),sample("Ca",ca_cons),sample("Mg",mg_cons),max_kh_raise)
+    full=lambda v: np.full(n,float(v))
+    return {"KH":clamped_cumsum(full(kh_now),kh,upper=full(kh_target)),
+            "Ca":clamped_cumsum(full(ca_now),ca,upper=full(ca_target)),
+            "Mg":clamped_cumsum(full(mg_now),mg,lower=full(0.0))}
+
+def bands(paths:dict, q=(5,25,50,75,95))->dict:
+    """Percentis por dia: {param: {q: array (days+1,)}}."""
+    return {k:dict(zip(q,np.percentile(v,q,axis=0))) for k,v in paths.items()}
@@ -0,0 +1,117 @@
+# doser/ranges.py — tabela única de faixas recomendadas (grupo/espécie × parâmetro) e classificador vetorizado
+# Cada regra tem a faixa [min, max] e uma margem de atenção logo fora dela (padrão: 10% da largura da faixa).
+# O classificador rotula qualquer quantidade de leituras ou tanques de uma vez: OK, WARN (atenção) ou OUT (fora).
+# `Rules.version` muda com o conteúdo da tabela: é a chave dos caches (HTML das tabelas, contagens do histórico).
+import hashlib, html
+import numpy as np
+
+OK,WARN,OUT=0,1,2
+LEVELS=("ok","atenção","fora")
+WARN_FRACTION=0.10
+
+NEO="Neocaridina davidi (Red Cherry, etc.)"
+CARIDINA="Caridina cantonensis (Crystal/Bee/Taiwan Bee)"
+# (grupo, parâmetro, rótulo, min, max)
+RULE_ROWS=(
+    ("Reef","KH","KH (°dKH)",8.0,12.0),
+    ("Reef","Ca","Ca (ppm)",380.0,450.0),
+    ("Reef","Mg","Mg (ppm)",1250.0,1350.0),
+    (NEO,"pH","pH",6.5,7.8),
+    (NEO,"GH","GH (°dH)",6.0,12.0),
+    (NEO,"KH","KH (°dKH)",3.0,8.0),
+    (CARIDINA,"pH","pH",5.5,6.5),
+    (CARIDINA,"GH","GH (°dH)",4.0,6.0),
+    (CARIDINA,"KH","KH (°dKH)",0.0,2.0),
+)
+SHRIMP_GROUPS=(NEO,CARIDINA)
+# colunas do histórico Reef para cada parâmetro da regra
+REEF_COLUMNS={"KH":"KH_atual","Ca":"Ca_atual","Mg":"Mg_atual"}
+
+def classify(values, lo, hi, warn=0.0)->np.ndarray:
+    """Nível por valor (int8): OK dentro de [lo, hi], WARN até `warn` fora dela, OUT além disso ou NaN.
+    Tudo é broadcast: um valor contra várias regras, várias leituras contra uma regra, etc."""
+    v=np.asarray(values,dtype="float64")
+    out=np.full(np.broadcast_shapes(v.shape,np.shape(lo),np.shape(hi),np.shape(warn)),OUT,dtype=np.int8)
+    with np.errstate(invalid="ignore"):
+        out[np.broadcast_to((v>=lo-warn)&(v<=hi+warn),out.shape)]=WARN
+        out[np.broadcast_to((v>=lo)&(v<=hi),out.shape)]=OK
+    return out
+
+class Rules:
+    """Regras indexadas por (grupo, parâmetro), com min/max/margem em arrays alinhados."""
+    def __init__(self, rows=RULE_ROWS, warn_fraction:float=WARN_FRACTION):
+        self.rows=tuple(rows)
+        self.group=[r[0] for r in self.rows]; self.param=[r[1] for r in self.rows]; self.label=[r[2] for r in self.rows]
+        self.lo=np.array([r[3] for r in self.rows],dtype="float64"); self.hi=np.array([r[4] for r in self.rows],dtype="float64")
+        self.warn=(self.hi-self.lo)*warn_fraction
+        self.index={(g,p):i for i,(g,p) in enumerate(zip(self.group,self.param))}
+        self.version=hashlib.sha1(repr((self.rows,warn_fraction)).encode()).hexdigest()[:12]
+
+    def _i(self, group:str, param:str)->int:
+        try: return self.index[(group,param)]
+        except KeyError: raise KeyError(f"sem faixa para {param} em {group}") from None
+
+    def limits(self, group:str, param:str)->tuple[float,float]:
+        i=self._i(group,param); return float(self.lo[i]),float(self.hi[i])
+
+    def bounds(self, group:str="Reef", columns:dict=REEF_COLUMNS)->dict:
+        """{coluna do histórico: (min, max, margem)} — o formato de HistoryStore.range_counts."""
+        return {c:(float(self.lo[i]),float(self.hi[i]),float(self.warn[i])) for p,c in columns.items() for i in (self._i(group,p),)}
+
+    def range_text(self, group:str, param:str)->str:
+        lo,hi=self.limits(group,param); return f"{lo:g}–{hi:g}"
+
+    def classify(self, values, group:str, param:str, decimals:int|None=2)->np.ndarray:
+        """Níveis de muitas leituras de um parâmetro (arredondadas a `decimals`, como são exibidas)."""
+        i=self._i(group,param); v=np.asarray(values,dtype="float64")
+        if decimals is not None: v=np.round(v,decimals)
+        return classify(v,self.lo[i],self.hi[i],self.warn[i])
+
+    def matrix(self, values:dict, groups, decimals:int|None=2)->np.ndarray:
+        """(grupos × parâmetros): o mesmo conjunto de valores contra as faixas de cada grupo, numa passada."""
+        idx=np.array([[self._i(g,p) for p in values] for g in groups])
+        v=np.array([values[p] for p in values],dtype="float64")
+        if decimals is not None: v=np.round(v,decimals)
+        return classify(v[None,:],self.lo[idx],self.hi[idx],self.warn[idx])
+
+    def flag_frame(self, df, group:str="Reef", columns:dict=REEF_COLUMNS):
+        """Níveis por leitura de um histórico inteiro: DataFrame Int8 com uma coluna por parâmetro (NA sem leitura)."""
+        import pandas as pd
+        out={}
+        for p,c in columns.items():
+            if c not in df.columns: continue
+            v=df[c].to_numpy(dtype="float64",na_value=np.nan)
+            out[p]=pd.array(self.classify(v,group,p),dtype="Int8"); out[p][np.isnan(v)]=pd.NA  # sem leitura ≠ fora
+        return pd.DataFrame(out,index=df.index)
+
+RULES=Rules()
+
+# -------- HTML (tabelas de faixas) --------
+CELL_STYLE={OK:"background-color:#065f46; color:#ecfeff; font-weight:600;",
+            WARN:"background-color:#78350f; color:#fef3c7; font-weight:600;",
+            OUT:"background-color:#7f1d1d; color:#fee2e2; font-weight:600;"}
+
+def html_table(columns:list[str], rows:list[list], levels:list[list[int|None]])->str:
+    """Tabela HTML simples (classe `dataframe`, estilizada pelo CSS do app); nível None = célula sem cor."""
+    head="".join(f"<th>{html.escape(str(c))}</th>" for c in columns)
+    body="".join("<tr>"+"".join(f'<td style="{CELL_STYLE[l]}">{html.escape(str(v))}</td>' if l is not None
+                                 else f"<td>{html.escape(str(v))}</td>" for v,l in zip(r,lv))+"</tr>"
+                 for r,lv in zip(rows,levels))
+    return f'<table class="dataframe"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+def species_html(values:dict, groups=SHRIMP_GROUPS, rules:Rules=RULES)->str:
+    """Uma linha por grupo com as faixas; célula verde se o valor atual está nela, âmbar se está na margem."""
+    lv=rules.matrix(values,groups)
+    rows=[[g,*(rules.range_text(g,p) for p in values)] for g in groups]
+    levels=[[None,*(int(l) if l!=OUT else None for l in row)] for row in lv]
+    labels=[rules.label[rules._i(groups[0],p)] for p in values]
+    return html_table(["Grupo",*labels],rows,levels)
+
+def current_html(values:dict, group:str="Reef", rules:Rules=RULES)->str:
+    """Valor atual de cada parâmetro ao lado da faixa, colorido pelo nível (verde/âmbar/vermelho)."""
+    rows,levels=[],[]
+    for p,v in values.items():
+        i=rules._i(group,p)
+        rows.append([rules.label[i],f"{v:.2f}",rules.range_text(group,p)])
+        levels.append([None,int(rules.classify(v,group,p)),None])
+    return html_table(["Parâmetro","Atual","Faixa"],rows,levels)
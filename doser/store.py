@@ -0,0 +1,402 @@
+# doser/store.py — histórico Reef persistente (SQLite), indexado por tanque e data
+# Escritas só acrescentam linhas; leituras pedem a janela que precisam (start/end/last).
+import os, sqlite3, threading, datetime as dt
+from pathlib import Path
+import pandas as pd
+from doser.history import NUMERIC_COLUMNS, HISTORY_COLUMNS, enforce_schema, parse_ts, to_local_naive
+from doser import consumption as cons, downsample
+
+DEFAULT_TANK="principal"
+ROLLUP_PARAMS=["KH_atual","Ca_atual","Mg_atual"]
+ROLLUP_RESOLUTIONS=("D","W","M")  # dia, semana (começa na segunda), mês
+RAW_SERIES_LIMIT=200_000  # acima disso read_series agrega min/máx no SQLite em vez de trazer as linhas
+
+def default_path()->Path:
+    return Path(os.environ.get("DOSER_DB") or Path.home()/".doser"/"history.sqlite")
+
+def _obs(v)->str|None:
+    # NaN/None/vazio → sem observação (não o texto "nan")
+    return (str(v).strip() or None) if pd.notna(v) else None
+
+def _epoch(ts)->int:
+    t=pd.Timestamp(ts)
+    if t.tzinfo is not None: t=to_local_naive(pd.Series([t])).iloc[0]  # com fuso: horário local, como a ingestão
+    return int(t.value//1_000_000_000)
+
+class HistoryStore:
+    """Leituras por (tank_id, ts). `ts` é epoch em segundos (horário local sem fuso, como no app)."""
+    def __init__(self, path:str|Path|None=None):
+        self.path=Path(path) if path is not None else default_path()
+        if str(self.path)!=":memory:": self.path.parent.mkdir(parents=True,exist_ok=True)
+        self._lock=threading.RLock()
+        self._db=sqlite3.connect(str(self.path),check_same_thread=False,isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        cols=",".join(f'"{c}" REAL' for c in NUMERIC_COLUMNS)
+        self._db.executescript(f"""
+            CREATE TABLE IF NOT EXISTS readings(
+                tank_id TEXT NOT NULL, ts INTEGER NOT NULL, {cols}, obs TEXT,
+                PRIMARY KEY(tank_id, ts)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS tanks(tank_id TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS rollups(
+                tank_id TEXT NOT NULL, res TEXT NOT NULL, param TEXT NOT NULL, period INTEGER NOT NULL,
+                last REAL, last_ts INTEGER, sum REAL, n INTEGER, min REAL, max REAL,
+                PRIMARY KEY(tank_id, res, param, period)) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS consumption(tank_id TEXT PRIMARY KEY, state TEXT NOT NULL);
+        """)
+        self._cons={}  # tank → {(param, janela): ConsumptionEstimator}
+        self._range_counts={}  # (tank, faixas) → (último ts contado, contagens) — ver range_counts
+        self._insert=(f'INSERT INTO readings(tank_id,ts,{",".join(chr(34)+c+chr(34) for c in NUMERIC_COLUMNS)},obs) '
+                      f'VALUES ({",".join("?"*(len(NUMERIC_COLUMNS)+3))})')
+        with self._lock:
+            empty=self._db.execute("SELECT 1 FROM rollups LIMIT 1").fetchone() is None
+            if empty and self._db.execute("SELECT 1 FROM readings LIMIT 1").fetchone() is not None:
+                self.rebuild_rollups()
+
+    # -------- escrita --------
+    def append(self, row:dict, tank:str=DEFAULT_TANK)->bool:
+        """Acrescenta uma leitura; False se já existe uma no mesmo segundo."""
+        return self.append_many([row],tank)==1
+
+    def append_many(self, rows:list[dict], tank:str=DEFAULT_TANK)->int:
+        params=[(tank,_epoch(r["timestamp"]),*(_num(r.get(c)) for c in NUMERIC_COLUMNS),_obs(r.get("obs")))
+                for r in rows if not pd.isna(r.get("timestamp"))]
+        return self._write(tank,params)
+
+    def import_frame(self, df:pd.DataFrame, tank:str=DEFAULT_TANK)->int:
+        """Importa um histórico carregado (upload). Linhas sem data são ignoradas; datas repetidas também."""
+        if df is None or df.empty or "timestamp" not in df.columns: return 0
+        ts=df["timestamp"]
+        ts=to_local_naive(ts if pd.api.types.is_datetime64_any_dtype(ts) else parse_ts(ts))  # com fuso → local
+        df=df[ts.notna()]; ts=ts[ts.notna()].astype("datetime64[s]").astype("int64")
+        cols=[ts.tolist()]
+        for c in NUMERIC_COLUMNS:
+            # float32 do esquema em memória volta a float64 com 2 casas (8.51, não 8.5100002)
+            cols.append(pd.to_numeric(df[c],errors="coerce").astype("float64").round(2).astype(object)
+                        .where(df[c].notna(),None).tolist() if c in df.columns else [None]*len(df))
+        obs=[_obs(v) for v in df["obs"]] if "obs" in df.columns else [None]*len(df)
+        return self._write(tank,[(tank,*vals) for vals in zip(*cols,obs)])
+
+    def _write(self, tank:str, params:list)->int:
+        if not params: return 0
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                params=self._new_only(tank,params); added=len(params)
+                self._db.executemany(self._insert,params)
+                self._update_rollups(tank,params)
+                self._update_consumption(tank,params)
+                if added: self._db.execute("INSERT INTO tanks(tank_id,version) VALUES (?,1) "
+                                           "ON CONFLICT(tank_id) DO UPDATE SET version=version+1",(tank,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK"); self._cons.pop(tank,None); raise
+            if added:  # leitura anterior à última contagem de faixas: a contagem incremental não vale mais
+                lo=min(p[1] for p in params)
+                for k in [k for k,(last,_) in self._range_counts.items() if k[0]==tank and lo<=last]: del self._range_counts[k]
+        return added
+
+    def _new_only(self, tank:str, params:list)->list:
+        # descarta datas que já existem (no banco ou repetidas no próprio lote), mantendo a primeira
+        ts=[p[1] for p in params]
+        seen={r[0] for r in self._db.execute("SELECT ts FROM readings WHERE tank_id=? AND ts BETWEEN ? AND ?",
+                                             (tank,min(ts),max(ts)))}
+        out=[]
+        for p in params:
+            if p[1] in seen: continue
+            seen.add(p[1]); out.append(p)
+        return out
+
+    # -------- rollups (dia/semana/mês) --------
+    def _update_rollups(self, tank:str, params:list):
+        """Soma o lote recém-inserido aos agregados por período (last/média/mín/máx por parâmetro)."""
+        if not params: return
+        idx=[NUMERIC_COLUMNS.index(c)+2 for c in ROLLUP_PARAMS]
+        if len(params)>256:
+            df=pd.DataFrame({"ts":[p[1] for p in params],**{c:[p[i] for p in params] for c,i in zip(ROLLUP_PARAMS,idx)}})
+            return self._merge_rollups(tank,df)
+        # lote pequeno (append manual / ingestão ao vivo): agrega em Python puro, sem pandas
+        acc={}
+        for p in params:
+            t=dt.datetime(1970,1,1)+dt.timedelta(seconds=p[1])
+            for c,i in zip(ROLLUP_PARAMS,idx):
+                v=p[i]
+                if v is None: continue
+                for res in ROLLUP_RESOLUTIONS:
+                    k=(res,c,_period_epoch(t,res)); a=acc.get(k)
+                    if a is None: acc[k]=[v,p[1],v,1,v,v]
+                    else:
+                        if p[1]>=a[1]: a[0],a[1]=v,p[1]
+                        a[2]+=v; a[3]+=1; a[4]=min(a[4],v); a[5]=max(a[5],v)
+        self._upsert_rollups([(tank,res,c,per,*a) for (res,c,per),a in acc.items()])
+
+    def _merge_rollups(self, tank:str, df:pd.DataFrame):
+        long=df.melt(id_vars=["ts"],value_vars=ROLLUP_PARAMS,var_name="param",value_name="v").dropna(subset=["v"])
+        if long.empty: return
+        long["v"]=long["v"].astype(float)
+        t=pd.to_datetime(long["ts"],unit="s")
+        rows=[]
+        for res in ROLLUP_RESOLUTIONS:
+            long["period"]=period_start(t,res).astype("datetime64[s]").astype("int64")
+            g=long.sort_values("ts").groupby(["param","period"],sort=False)
+            agg=g.agg(last=("v","last"),last_ts=("ts","last"),sum=("v","sum"),n=("v","size"),
+                      min=("v","min"),max=("v","max")).reset_index()
+            rows+=[(tank,res,r.param,int(r.period),float(r.last),int(r.last_ts),float(r.sum),int(r.n),float(r.min),float(r.max))
+                   for r in agg.itertuples(index=False)]
+        self._upsert_rollups(rows)
+
+    def _upsert_rollups(self, rows:list):
+        self._db.executemany("""
+            INSERT INTO rollups(tank_id,res,param,period,last,last_ts,sum,n,min,max) VALUES (?,?,?,?,?,?,?,?,?,?)
+            ON CONFLICT(tank_id,res,param,period) DO UPDATE SET
+              last=CASE WHEN excluded.last_ts>=rollups.last_ts THEN excluded.last ELSE rollups.last END,
+              last_ts=MAX(rollups.last_ts,excluded.last_ts),
+              sum=rollups.sum+excluded.sum, n=rollups.n+excluded.n,
+              min=MIN(rollups.min,excluded.min), max=MAX(rollups.max,excluded.max)""",rows)
+
+    def rebuild_rollups(self, chunk:int=200_000):
+        """Recalcula os rollups a partir das leituras (banco criado antes dos rollups existirem)."""
+        cols=",".join(f'"{c}"' for c in ROLLUP_PARAMS)
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.execute("DELETE FROM rollups"); self._db.execute("DELETE FROM consumption"); self._cons.clear()
+                for (tank,) in self._db.execute("SELECT DISTINCT tank_id FROM readings").fetchall():
+                    cur=self._db.execute(f"SELECT ts,{cols} FROM readings WHERE tank_id=? ORDER BY ts",(tank,))
+                    while rows:=cur.fetchmany(chunk):
+                        self._merge_rollups(tank,pd.DataFrame.from_records(rows,columns=["ts",*ROLLUP_PARAMS]))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK"); raise
+
+    # -------- consumo observado (estado salvo ao lado do histórico) --------
+    def _daily_last(self, tank:str, param:str, start:int|None=None, end:int|None=None)->list[tuple[int,float]]:
+        where=["tank_id=?","res='D'","param=?"]; args=[tank,param]
+        if start is not None: where.append("period>=?"); args.append(start)
+        if end is not None: where.append("period<=?"); args.append(end)
+        rows=self._db.execute(f"SELECT period,last FROM rollups WHERE {' AND '.join(where)} ORDER BY period",args)
+        return [(p//86400,v) for p,v in rows]
+
+    def _build_estimator(self, tank:str, param:str, window:int)->cons.ConsumptionEstimator:
+        # só lê a janela (e o ponto anterior a ela), não o histórico inteiro
+        last=self._db.execute("SELECT MAX(period) FROM rollups WHERE tank_id=? AND res='D' AND param=?",(tank,param)).fetchone()[0]
+        if last is None: return cons.ConsumptionEstimator(window,cons.CLAMPS.get(param))
+        cutoff=last-window*86400
+        prev=self._db.execute("SELECT MAX(period) FROM rollups WHERE tank_id=? AND res='D' AND param=? AND period<=?",
+                              (tank,param,cutoff)).fetchone()[0]
+        pts=self._daily_last(tank,param,start=cutoff+1 if prev is None else prev)
+        return cons.ConsumptionEstimator.from_points([d for d,_ in pts],[v for _,v in pts],window,cons.CLAMPS.get(param))
+
+    def _estimators(self, tank:str)->dict:
+        if tank in self._cons: return self._cons[tank]
+        row=self._db.execute("SELECT state FROM consumption WHERE tank_id=?",(tank,)).fetchone()
+        if row: ests=cons.loads(row[0])
+        else:
+            ests={(p,w):self._build_estimator(tank,p,w) for p in ROLLUP_PARAMS for w in cons.CONSUMPTION_WINDOWS}
+            self._db.execute("INSERT OR REPLACE INTO consumption(tank_id,state) VALUES (?,?)",(tank,cons.dumps(ests)))
+        self._cons[tank]=ests
+        return ests
+
+    def _update_consumption(self, tank:str, params:list):
+        if not params: return
+        ests=self._estimators(tank)
+        days=sorted({p[1]//86400*86400 for p in params})
+        for param in ROLLUP_PARAMS:
+            touched={d//86400 for d in days}
+            pts=[(d,v) for d,v in self._daily_last(tank,param,days[0],days[-1]) if d in touched]
+            if not pts: continue
+            for (p,w),est in list(ests.items()):
+                if p!=param: continue
+                if est.last_day is None or pts[0][0]>=est.last_day:
+                    for d,v in pts: est.update(d,v)
+                else:  # leitura antiga (import fora de ordem): refaz só a janela
+                    ests[(p,w)]=self._build_estimator(tank,p,w)
+        self._db.execute("INSERT OR REPLACE INTO consumption(tank_id,state) VALUES (?,?)",(tank,cons.dumps(ests)))
+
+    def consumption(self, tank:str=DEFAULT_TANK, window:int=30, method:str="median")->dict[str,float]:
+        """Consumo observado por parâmetro (°dKH/dia, ppm/dia). method: "median" ou "theil-sen"."""
+        with self._lock:
+            ests=self._estimators(tank)
+            return {p:(e.theil_sen() if method=="theil-sen" else e.consumption())
+                    for (p,w),e in ests.items() if w==window}
+
+    def consumption_deviations(self, tank:str=DEFAULT_TANK, window:int=90)->dict:
+        """Desvios diários observados do consumo, por parâmetro, na janela (amostras para Monte Carlo)."""
+        with self._lock:
+            return {p:e.deviations() for (p,w),e in self._estimators(tank).items() if w==window}
+
+    def rollup(self, tank:str=DEFAULT_TANK, res:str="D", start=None, end=None)->pd.DataFrame:
+        """Agregados em formato longo: period, param, last, mean, min, max, n (ordenado por período)."""
+        where=["tank_id=?","res=?"]; args=[tank,res]
+        if start is not None: where.append("period>=?"); args.append(_epoch(period_start(pd.Series([pd.Timestamp(start)]),res).iloc[0]))
+        if end is not None: where.append("period<=?"); args.append(_epoch(end))
+        with self._lock:
+            rows=self._db.execute(f"SELECT period,param,last,sum/n,min,max,n FROM rollups WHERE {' AND '.join(where)} "
+                                  "ORDER BY period,param",args).fetchall()
+        df=pd.DataFrame.from_records(rows,columns=["period","param","last","mean","min","max","n"])
+        df["period"]=pd.to_datetime(df["period"],unit="s")
+        return df
+
+    def rollup_wide(self, tank:str=DEFAULT_TANK, res:str="D", stat:str="last", start=None, end=None)->pd.DataFrame:
+        """Uma coluna por parâmetro (KH_atual, Ca_atual, Mg_atual) com a estatística pedida, índice = período."""
+        long=self.rollup(tank,res,start,end)
+        wide=long.pivot(index="period",columns="param",values=stat)
+        return wide.reindex(columns=ROLLUP_PARAMS)
+
+    # -------- leitura --------
+    def read(self, tank:str=DEFAULT_TANK, start=None, end=None, columns:list[str]|None=None,
+             last:int|None=None)->pd.DataFrame:
+        """Janela [start, end] do tanque em ordem de data; `last` limita às N leituras mais recentes."""
+        cols=[c for c in (columns or HISTORY_COLUMNS) if c!="timestamp"]
+        where=["tank_id=?"]; args=[tank]
+        if start is not None: where.append("ts>=?"); args.append(_epoch(start))
+        if end is not None: where.append("ts<=?"); args.append(_epoch(end))
+        sql=f'SELECT ts,{",".join(chr(34)+c+chr(34) for c in cols)} FROM readings WHERE {" AND ".join(where)}'
+        sql+=f" ORDER BY ts DESC LIMIT {int(last)}" if last else " ORDER BY ts"
+        with self._lock:
+            rows=self._db.execute(sql,args).fetchall()
+        if last: rows.reverse()
+        return _frame(rows,cols)
+
+    def iter_read(self, tank:str=DEFAULT_TANK, chunksize:int=50_000, columns:list[str]|None=None,
+                  start=None, end=None):
+        """Como read(), mas em blocos de até `chunksize` linhas (paginação por ts, sem OFFSET).
+        Memória limitada ao bloco: usado pelas exportações."""
+        cols=[c for c in (columns or HISTORY_COLUMNS) if c!="timestamp"]
+        sql=(f'SELECT ts,{",".join(chr(34)+c+chr(34) for c in cols)} FROM readings '
+             f'WHERE tank_id=? AND ts>? AND ts<=? ORDER BY ts LIMIT ?')
+        after=-2**62 if start is None else _epoch(start)-1; hi=2**62 if end is None else _epoch(end)
+        while True:
+            with self._lock:
+                rows=self._db.execute(sql,(tank,after,hi,chunksize)).fetchall()
+            if not rows: return
+            yield _frame(rows,cols)
+            if len(rows)<chunksize: return
+            after=rows[-1][0]
+
+    def read_series(self, tank:str=DEFAULT_TANK, columns:list[str]=ROLLUP_PARAMS, points:int=1000,
+                    start=None, end=None)->pd.DataFrame:
+        """Séries da janela em formato longo (timestamp, Parametro, Valor) com até ~`points` pontos cada.
+        Janelas com até RAW_SERIES_LIMIT leituras: lê tudo e reduz por LTTB; acima disso o SQLite devolve
+        só o mín. e o máx. de cada balde de tempo. attrs: "rows" (leituras na janela) e "method"."""
+        rows=self.count(tank,start,end)
+        if rows<=RAW_SERIES_LIMIT:
+            df=self.read(tank,start,end,columns=["timestamp",*columns])
+            long=df.melt(id_vars=["timestamp"],value_vars=columns,var_name="Parametro",value_name="Valor")
+            long=downsample.downsample_long(long,"timestamp",points,"lttb")
+            method="lttb" if rows>points else "bruto"
+        else:
+            lo,hi=self.bounds(tank) if start is None or end is None else (None,None)
+            lo=_epoch(start if start is not None else lo); hi=_epoch(end if end is not None else hi)
+            nb=max(points//2,1); aggs=",".join(f'MIN("{c}"),MAX("{c}")' for c in columns)
+            with self._lock:
+                res=self._db.execute(f"SELECT (ts-?)*?/?,MIN(ts),MAX(ts),{aggs} FROM readings "
+                                     "WHERE tank_id=? AND ts BETWEEN ? AND ? GROUP BY 1 ORDER BY 1",
+                                     (lo,nb,hi-lo+1,tank,lo,hi)).fetchall()
+            # mínimo no início do balde e máximo no fim: um traço vertical por balde, como o min/máx por pixel
+            parts=[]
+            for j,c in enumerate(columns):
+                for k,t in ((3+2*j,1),(4+2*j,2)):
+                    parts.append(pd.DataFrame({"timestamp":[r[t] for r in res],"Parametro":c,"Valor":[r[k] for r in res]}))
+            long=pd.concat(parts,ignore_index=True).dropna(subset=["Valor"]).sort_values(["Parametro","timestamp"],kind="stable")
+            long["timestamp"]=pd.to_datetime(long["timestamp"],unit="s").astype("datetime64[ns]"); long["Valor"]=long["Valor"].astype("float32")
+            long=long.reset_index(drop=True); method="minmax"
+        long.attrs.update(rows=rows,method=method)
+        return long
+
+    def range_counts(self, tank:str, bounds:dict[str,tuple[float,float,float]])->dict[str,tuple[int,int]]:
+        """Leituras fora da faixa no histórico inteiro. bounds: {coluna: (min, max, margem)} (ver
+        ranges.Rules.bounds); devolve {coluna: (atenção, fora)}. A primeira chamada varre o tanque; as
+        seguintes só somam as leituras mais novas que a última contagem (um import com datas antigas zera)."""
+        key=(tank,tuple(bounds.items())); aggs=[]
+        for c,(lo,hi,w) in bounds.items():
+            aggs+=[f'TOTAL(("{c}"<{lo} OR "{c}">{hi}) AND "{c}" BETWEEN {lo-w} AND {hi+w})',
+                   f'TOTAL("{c}"<{lo-w} OR "{c}">{hi+w})']
+        with self._lock:
+            after,prev=self._range_counts.get(key,(-2**62,None))
+            r=self._db.execute(f"SELECT MAX(ts),{','.join(aggs)} FROM readings WHERE tank_id=? AND ts>?",(tank,after)).fetchone()
+            counts={c:(int(r[1+2*j])+(prev[c][0] if prev else 0),int(r[2+2*j])+(prev[c][1] if prev else 0))
+                    for j,c in enumerate(bounds)}
+            self._range_counts[key]=(after if r[0] is None else r[0],counts)
+        return counts
+
+    def read_out_of_range(self, tank:str, bounds:dict[str,tuple[float,float,float]], last:int=500)->pd.DataFrame:
+        """As `last` leituras mais recentes com alguma coluna fora de [min, max] (margem incluída)."""
+        cond=" OR ".join(f'"{c}"<{lo} OR "{c}">{hi}' for c,(lo,hi,_) in bounds.items())
+        sql=(f'SELECT ts,{",".join(chr(34)+c+chr(34) for c in NUMERIC_COLUMNS)},obs FROM readings '
+             f"WHERE tank_id=? AND ({cond}) ORDER BY ts DESC LIMIT {int(last)}")
+        with self._lock:
+            rows=self._db.execute(sql,(tank,)).fetchall()
+        rows.reverse()
+        return _frame(rows,[*NUMERIC_COLUMNS,"obs"])
+
+    def count(self, tank:str=DEFAULT_TANK, start=None, end=None)->int:
+        where=["tank_id=?"]; args=[tank]
+        if start is not None: where.append("ts>=?"); args.append(_epoch(start))
+        if end is not None: where.append("ts<=?"); args.append(_epoch(end))
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM readings WHERE {' AND '.join(where)}",args).fetchone()[0]
+
+    def bounds(self, tank:str=DEFAULT_TANK)->tuple[pd.Timestamp,pd.Timestamp]|None:
+        with self._lock:
+            lo,hi=self._db.execute("SELECT MIN(ts),MAX(ts) FROM readings WHERE tank_id=?",(tank,)).fetchone()
+        return None if lo is None else (pd.Timestamp(lo,unit="s"),pd.Timestamp(hi,unit="s"))
+
+    def version(self, tank:str=DEFAULT_TANK)->int:
+        """Muda a cada escrita no tanque; serve de chave para caches de leitura."""
+        with self._lock:
+            r=self._db.execute("SELECT version FROM tanks WHERE tank_id=?",(tank,)).fetchone()
+        return r[0] if r else 0
+
+    def fleet_version(self)->int:
+        """Soma das versões de todos os tanques: muda a cada escrita em qualquer um."""
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(version),0) FROM tanks").fetchone()[0]
+
+    def latest(self, tanks:list[str]|None=None)->pd.DataFrame:
+        """Uma linha por tanque: data e volume/ideais da leitura mais recente e, para KH/Ca/Mg, o último
+        valor não vazio (rollup diário). Cada busca é um MAX no índice: custo por tanque, não por leitura."""
+        tanks=self.tanks() if tanks is None else list(tanks)
+        base=("SELECT ts,volume_L,KH_ideal,Ca_ideal,Mg_ideal FROM readings WHERE tank_id=? "
+              "AND ts=(SELECT MAX(ts) FROM readings WHERE tank_id=?)")
+        last=("SELECT last FROM rollups WHERE tank_id=? AND res='D' AND param=? AND period="
+              "(SELECT MAX(period) FROM rollups WHERE tank_id=? AND res='D' AND param=?)")
+        rows=[]
+        with self._lock:
+            for t in tanks:
+                r=self._db.execute(base,(t,t)).fetchone()
+                if r is None: continue
+                vals=[(self._db.execute(last,(t,p,t,p)).fetchone() or (None,))[0] for p in ROLLUP_PARAMS]
+                rows.append((t,*r,*vals))
+        df=pd.DataFrame.from_records(rows,columns=["tank_id","timestamp","volume_L","KH_ideal","Ca_ideal","Mg_ideal",*ROLLUP_PARAMS])
+        df["timestamp"]=pd.to_datetime(df["timestamp"],unit="s")
+        return enforce_schema(df)
+
+    def tanks(self)->list[str]:
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT tank_id FROM tanks ORDER BY tank_id")]
+
+    def close(self):
+        with self._lock: self._db.close()
+
+def period_start(ts:pd.Series, res:str)->pd.Series:
+    day=ts.dt.floor("D")
+    if res=="D": return day
+    if res=="W": return day-pd.to_timedelta(day.dt.weekday,unit="D")
+    if res=="M": return day-pd.to_timedelta(day.dt.day-1,unit="D")
+    raise ValueError(f"resolução desconhecida: {res}")
+
+def _period_epoch(t:dt.datetime, res:str)->int:
+    day=dt.datetime(t.year,t.month,t.day)
+    if res=="W": day-=dt.timedelta(days=day.weekday())
+    elif res=="M": day=day.replace(day=1)
+    return int((day-dt.datetime(1970,1,1)).total_seconds())
+
+def _frame(rows:list, cols:list[str])->pd.DataFrame:
+    df=pd.DataFrame.from_records(rows,columns=["timestamp",*cols])
+    df["timestamp"]=pd.to_datetime(df["timestamp"],unit="s")
+    return enforce_schema(df)
+
+def _num(v):
+    try: v=float(v)
+    except (TypeError,ValueError): return None
+    return None if v!=v else round(v,2)
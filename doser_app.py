@@ -1,17 +1,43 @@
 # doser_app.py — v2.12
-import io, json, math, datetime as dt, tempfile
+import json, math, os, functools, datetime as dt
+from pathlib import Path
 import pandas as pd
-import altair as alt
 import streamlit as st
+from doser import catalog, downsample, engine, export, fleet, graph, history, ingest, planner, profiling, projection, ranges
+from doser.store import HistoryStore, DEFAULT_TANK
+from doser.engine import schedule_days
 
 st.set_page_config(page_title="Doser • Aquários", page_icon="💧", layout="wide")
 
+# -------- Medição de desempenho (opt-in: toggle na sidebar ou DOSER_PROFILE=1) --------
+@st.cache_resource
+def get_profiler()->profiling.Profiler:
+    return profiling.Profiler(log_path=profiling.default_log_path())
+
+def profiling_on()->bool:
+    return st.session_state.get("profile_on", os.environ.get("DOSER_PROFILE")=="1")
+
+def profiled(label:str):
+    """Fragmentos rerodam sozinhos: cada rerun do fragmento vira uma medição própria."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*a,**k):
+            if not profiling_on(): return fn(*a,**k)
+            with get_profiler().run(label): return fn(*a,**k)
+        return wrapper
+    return deco
+
+if profiling_on(): get_profiler().begin("script")
+
 PRIMARY_BG = "#0b1220"; CARD_BG = "#0f172a"; BORDER = "#1f2937"
 TEXT = "#e2e8f0"; MUTED = "#94a3b8"; ACCENT = "#60a5fa"
 GOOD = "#22c55e"; WARN = "#fbbf24"; BAD = "#ef4444"
 
 # ---------------- CSS ----------------
-st.markdown(f"""
+# Strings estáticas montadas uma vez por processo; o st.markdown continua a cada rerun (o Streamlit redesenha tudo).
+@functools.lru_cache(maxsize=None)
+def base_css()->str:
+    return f"""
 <style>
   @import url('https://fonts.googleapis.com/css2?family=Inter:wght@400;600;700&display=swap');
   :root {{ --primary:{ACCENT}; --text:{TEXT}; --muted:{MUTED};
@@ -45,8 +71,9 @@ st.markdown(f"""
   table.dataframe th, table.dataframe td{{ border:1px solid var(--border); padding:6px 8px; }}
   table.dataframe th{{ background:#0d162c; color:#e5e7eb; }}
 </style>
-""", unsafe_allow_html=True)
+"""
 
+@functools.lru_cache(maxsize=None)
 def theme_css(mode:str)->str:
     return "<style>:root{--primary:#22c55e}</style>" if mode=="Doce + Camarões" else "<style>:root{--primary:#60a5fa}</style>"
 
@@ -55,6 +82,7 @@ def kpi(title, value, subtitle="", cls=""):
     return f"""<div class="kpi"><div class="label">{title}</div>
                <div class="value{cls}">{value}</div><div class="sub">{subtitle}</div></div>"""
 
+@functools.lru_cache(maxsize=None)
 def render_badges(mode:str)->str:
     return ("""<div class="badge-row"><span class="badge green">🌿 Plantado</span>
                <span class="badge pink">🦐 Camarões</span><span class="badge slate">⚗️ Macro & Micro</span></div>"""
@@ -62,6 +90,7 @@ def render_badges(mode:str)->str:
             """<div class="badge-row"><span class="badge blue">🪸 Reef</span>
                <span class="badge slate">⚗️ Fusion 1 & 2</span></div>""")
 
+@functools.lru_cache(maxsize=None)
 def render_top_banner_svg(mode:str)->str:
     if mode=="Doce + Camarões":
         stops=[("#34d399","0%"),("#60a5fa","60%"),("#f472b6","100%")]; overlay="#0ea5e9"
@@ -74,92 +103,460 @@ def render_top_banner_svg(mode:str)->str:
       <path d="M0,90 C300,150 900,30 1200,90 L1200,160 L0,160 Z" fill="{overlay}" opacity="0.25"/>
       <path d="M0,110 C300,170 900,50 1200,110 L1200,160 L0,160 Z" fill="white" opacity="0.06"/></svg></div>"""
 
-# -------- Helpers Plantado --------
-def conversions(density_g_per_ml: float, pctN: float, pctP: float):
-    mgN = pctN/100.0 * density_g_per_ml * 1000.0
-    mgP = pctP/100.0 * density_g_per_ml * 1000.0
-    return mgN*(62/14), mgP*(95/31)  # mg NO3/mL, mg PO4/mL
+# -------- Loader CSV/XLS/XLSX/NUMBERS --------
+@profiling.timed("ler arquivo")
+def load_history_any(up_file, key:str|None=None, resolution:str|None=None)->pd.DataFrame|None:
+    try:
+        return history.load_history_cached(up_file.getvalue(), up_file.name, key, resolution)
+    except history.HistoryLoadError as e:
+        st.error(str(e)); return None
+
+@st.cache_resource
+def get_store()->HistoryStore:
+    return HistoryStore()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def projection_bands(args:tuple, noise:dict)->dict:
+    return projection.bands(projection.monte_carlo(*args, noise=noise, n=1000))
+
+def graph_memo(name:str, g:graph.Graph)->graph.Memo:
+    """Memo do grafo de cálculo por sessão: só recalcula os nós a jusante do que mudou na sidebar."""
+    if name not in st.session_state: st.session_state[name]=graph.Memo(g)
+    return st.session_state[name]
+
+def graph_debug(memo:graph.Memo):
+    with st.sidebar.expander("🔍 Grafo de cálculo (depuração)"):
+        st.caption(f"Última edição recalculou {len(memo.recomputed())} de {len(memo.graph.outputs)} valores • "
+                   f"na sessão: {memo.hits} nós reaproveitados, {memo.misses} calculados")
+        df=pd.DataFrame(memo.explain())
+        if not df.empty: df["valor"]=df["valor"].astype(str)  # mistura números e flags: o Arrow não aceita coluna object mista
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+HISTORY_WINDOWS={"30 dias":30,"90 dias":90,"1 ano":365,"Tudo":None}
+HISTORY_RESOLUTIONS={"Dia":"D","Semana":"W","Mês":"M","Leituras (bruto)":None}
+CHART_POINTS=1000  # orçamento de pontos por série no gráfico histórico (LTTB ou mín/máx por balde)
+
+# -------- Tabelas de faixas (regras em doser.ranges; HTML em cache por versão das regras e valores atuais) --------
+@profiling.timed("faixas (HTML)")
+@st.cache_data(max_entries=64, show_spinner=False)
+def shrimp_ranges_html(rules_version:str, pH_now:float, gh_now:float, kh_now:float)->str:
+    return ranges.species_html({"pH":pH_now,"GH":gh_now,"KH":kh_now})
+
+@profiling.timed("faixas (HTML)")
+@st.cache_data(max_entries=64, show_spinner=False)
+def reef_ranges_html(rules_version:str, kh_now:float, ca_now:float, mg_now:float)->str:
+    return ranges.current_html({"KH":kh_now,"Ca":ca_now,"Mg":mg_now})
+
+# -------- Leituras do store (chave = versão do tanque: qualquer escrita invalida) --------
+@profiling.timed("histórico: leitura/agregação")
+@st.cache_data(max_entries=16, show_spinner=False)
+def history_chart_data(_store:HistoryStore, tank:str, version:int, res:str|None, days_back:int|None,
+                       zoom:tuple|None=None)->pd.DataFrame:
+    # no máximo CHART_POINTS pontos por série vão ao navegador; com zoom, relê só a janela visível
+    bounds=_store.bounds(tank); end=None
+    start=None if days_back is None or bounds is None else bounds[1]-pd.Timedelta(days=days_back)
+    if zoom is not None: start,end=zoom
+    if res is not None:
+        # rollups pré-agregados: um ponto por período (último registro), com média/mín/máx no tooltip
+        df=(_store.rollup(tank, res, start=start, end=end)
+            .rename(columns={"period":"Dia","param":"Parametro","last":"Valor"}))
+        out=downsample.downsample_long(df, "Dia", CHART_POINTS, "lttb")
+        out.attrs.update(rows=len(df)//3, method="lttb" if len(out)<len(df) else "bruto")
+        return out
+    return _store.read_series(tank, ["KH_atual","Ca_atual","Mg_atual"], CHART_POINTS, start, end)
+
+@profiling.timed("consumo observado")
+@st.cache_data(max_entries=16, show_spinner=False)
+def observed_consumption(_store:HistoryStore, tank:str, version:int, window:int, method:str)->dict:
+    return _store.consumption(tank, window, method)
+
+@profiling.timed("consumo observado")
+@st.cache_data(max_entries=4, show_spinner=False)
+def consumption_noise(_store:HistoryStore, tank:str, version:int)->dict:
+    dev=_store.consumption_deviations(tank, 90)
+    return {"KH":tuple(dev["KH_atual"]),"Ca":tuple(dev["Ca_atual"]),"Mg":tuple(dev["Mg_atual"])}
+
+@profiling.timed("tabela do histórico")
+@st.cache_data(max_entries=4, show_spinner=False)
+def history_tail(_store:HistoryStore, tank:str, version:int, rules_version:str, only_out:bool=False)->pd.DataFrame:
+    # 500 mais recentes (ou as 500 mais recentes fora da faixa) + coluna com os parâmetros fora/na margem
+    df=_store.read_out_of_range(tank, ranges.RULES.bounds()) if only_out else _store.read(tank, last=500)
+    flags=ranges.RULES.flag_frame(df)
+    marks=[flags[p].map({ranges.OUT:p,ranges.WARN:f"{p} (atenção)"}).fillna("") for p in flags]
+    df.insert(1,"Faixa",[", ".join(x for x in t if x) for t in zip(*marks)] if marks else "")
+    return df
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def history_range_counts(_store:HistoryStore, tank:str, version:int, rules_version:str)->dict:
+    return _store.range_counts(tank, ranges.RULES.bounds())
+
+
+def reset_zoom():
+    st.session_state.reef_zoom=None
+    st.session_state.reef_zoom_n=st.session_state.get("reef_zoom_n",0)+1
+
+# -------- Gráficos (altair só é importado quando um gráfico aparece na tela) --------
+@profiling.timed("gráfico (montagem)")
+def history_chart(df_long:pd.DataFrame, res:str|None):
+    """Linhas por parâmetro; arrastar no gráfico seleciona a janela de zoom (seleção "zoom" no eixo x)."""
+    import altair as alt
+    if res is not None:
+        x_enc=alt.X('Dia:T', axis=alt.Axis(title='Data', format='%m/%Y' if res=="M" else '%d/%m', labelAngle=-20,
+                                           **({"tickCount":"day"} if res=="D" else {})))
+        extra_tt=[alt.Tooltip('mean:Q', title='Média', format='.2f'), alt.Tooltip('min:Q', title='Mín', format='.2f'),
+                  alt.Tooltip('max:Q', title='Máx', format='.2f')]
+    else:
+        x_enc=alt.X('timestamp:T', axis=alt.Axis(title='Data', format='%d/%m', labelAngle=-20))
+        extra_tt=[]
+
+    # dados só no layer: com o DataFrame nos dois subgráficos o Altair o serializa para compará-los
+    base=alt.Chart().encode(
+        x=x_enc,
+        y=alt.Y('Valor:Q', axis=alt.Axis(title='Valor')),
+        color=alt.Color('Parametro:N', legend=alt.Legend(title=None)),
+        tooltip=[alt.Tooltip(df_long.columns[0]+':T', title='Data', format='%d/%m/%Y'),
+                 alt.Tooltip('Parametro:N', title='Parâmetro'),
+                 alt.Tooltip('Valor:Q', title='Valor', format='.2f'), *extra_tt]
+    )
+    line=base.mark_line(interpolate='monotone', strokeWidth=2.5).add_params(alt.selection_interval(name="zoom", encodings=["x"]))
+    # bolinhas só com poucos pontos: com a série reduzida elas viram um borrão e dobram o JSON enviado
+    if df_long.groupby("Parametro", observed=True).size().max()>120: return alt.layer(line, data=df_long)
+    return alt.layer(line, base.mark_circle(size=64), data=df_long)
+
+@profiling.timed("gráfico (montagem)")
+def projection_chart(long:pd.DataFrame, df_band:pd.DataFrame|None, days:int):
+    import altair as alt
+    x_fmt='%d/%m' if days<=120 else '%m/%Y'
+    chart=(alt.Chart(long).mark_line(interpolate='monotone', strokeWidth=2.5)
+           .encode(x=alt.X('Data:T', axis=alt.Axis(title='Data', format=x_fmt, labelAngle=-20)),
+                   y='Valor:Q', color='Parametro:N',
+                   tooltip=[alt.Tooltip('Data:T', title='Data', format='%d/%m/%Y'),
+                            alt.Tooltip('Parametro:N'), alt.Tooltip('Valor:Q', format='.2f')])
+           .properties(height=260))
+    if df_band is not None:
+        band=alt.Chart(df_band).encode(x='Data:T', color=alt.Color('Parametro:N', legend=None))
+        chart=(band.mark_area(opacity=0.15).encode(y='p5:Q', y2='p95:Q')
+               + band.mark_area(opacity=0.25).encode(y='p25:Q', y2='p75:Q') + chart)
+    return chart
+
+# -------- Cartões Reef como fragmentos: widgets de um cartão reexecutam só o cartão --------
+# (edições na sidebar ainda rodam o script todo; aí os caches acima evitam reler/reagregar o histórico)
+@st.fragment
+@profiled("reef_plan_card")
+def reef_plan_card(ri:dict):
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("## Plano multi-dia (Fusion 1 & 2)")
+    pc1,pc2=st.columns(2)
+    with pc1: plan_days=st.slider("Dias do plano", min_value=7, max_value=90, value=14, step=1)
+    with pc2: plan_mode=st.radio("Dosagem", ["Pareada (mesma dose)","Partes separadas"], horizontal=True)
+    pl=planner.plan_doses(ri, days=plan_days, mode="paired" if plan_mode.startswith("Pareada") else "separate")
+    fmt_days=lambda d: "fora do horizonte" if d==math.inf else f"{int(d)} dia(s)"
+    st.write(f"KH no alvo em **{fmt_days(pl['days_kh'][0])}** • Ca no alvo em **{fmt_days(pl['days_ca'][0])}**.")
+    if pl["mg_out_day"][0]!=math.inf:
+        st.markdown(f'<span class="warn">Mg sai da faixa no dia {int(pl["mg_out_day"][0])}</span> (Fusion não repõe Mg).', unsafe_allow_html=True)
+    df_pl=pd.DataFrame({"Dia":pd.date_range(dt.date.today(), periods=plan_days, freq="D").strftime("%d/%m"),
+                        "Fusion 1 (mL)":pl["dose_f1"][0].round(2),"Fusion 2 (mL)":pl["dose_f2"][0].round(2),
+                        "KH (°dKH)":pl["KH"][0,1:].round(2),"Ca (ppm)":pl["Ca"][0,1:].round(2),"Mg (ppm)":pl["Mg"][0,1:].round(2)})
+    st.dataframe(df_pl, use_container_width=True, hide_index=True)
+    st.caption("Menor prazo até o alvo respeitando a dose máxima por dia, o limite de alta de KH e o teto das faixas recomendadas.")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+@st.fragment
+@profiled("reef_visual_card")
+def reef_visual_card(store:HistoryStore, tank:str, ri:dict, rp:dict):
+    version=store.version(tank); bounds=store.bounds(tank)
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("## Visualização")
+    view_mode=st.radio("Mostrar", ["Histórico (valores medidos)","Projeção (simulada)"], horizontal=True, index=0)
+
+    if view_mode.startswith("Histórico"):
+        st.markdown("### Gráfico histórico (KH, Ca, Mg) por data")
+        if bounds is not None:
+            window=st.radio("Período", list(HISTORY_WINDOWS), horizontal=True, index=1, on_change=reset_zoom)
+            res_label=st.radio("Resolução", list(HISTORY_RESOLUTIONS), horizontal=True, index=0, on_change=reset_zoom)
+            res=HISTORY_RESOLUTIONS[res_label]
+            zoom=st.session_state.get("reef_zoom")
+            if zoom is not None:
+                zc1,zc2=st.columns([3,1])
+                with zc1: st.caption(f"🔍 Zoom: {zoom[0]:%d/%m/%Y %H:%M} – {zoom[1]:%d/%m/%Y %H:%M}")
+                with zc2: st.button("↩️ Período inteiro", on_click=reset_zoom)
+            df_long=history_chart_data(store, tank, version, res, HISTORY_WINDOWS[window], zoom)
+
+            chart=history_chart(df_long, res)
+            with profiling.section("gráfico (envio)"):
+                ev=st.altair_chart(chart, use_container_width=True, on_select="rerun",
+                                   key=f"reef_hist_chart_{st.session_state.get('reef_zoom_n',0)}")
+            sel=(ev.selection.get("zoom") or {}).get(df_long.columns[0]) if ev else None
+            if sel and len(sel)==2 and sel[1]>sel[0]:
+                # a seleção vem em ms; nova chave do gráfico limpa o pincel depois de aplicar o zoom
+                st.session_state.reef_zoom=tuple(pd.to_datetime(sel, unit="ms"))
+                st.session_state.reef_zoom_n=st.session_state.get("reef_zoom_n",0)+1
+                st.rerun(scope="fragment")
+            if df_long.attrs.get("method") in ("lttb","minmax"):
+                st.caption(f"Gráfico reduzido a {len(df_long)//3:,} pontos por série de {df_long.attrs['rows']:,} "
+                           f"({'LTTB' if df_long.attrs['method']=='lttb' else 'mín/máx por intervalo'}); "
+                           "arraste sobre o gráfico para ver os detalhes de um trecho.".replace(",","."))
+
+            # Consumo observado: estimador incremental salvo no store (janela móvel, O(log n) por leitura)
+            cw,cm=st.columns(2)
+            with cw: cons_window=st.radio("Janela do consumo", [7,30,90], index=1, horizontal=True, format_func=lambda d: f"{d} dias")
+            with cm: cons_method=st.radio("Método", ["Mediana das variações","Theil–Sen"], horizontal=True)
+            cons_obs=observed_consumption(store, tank, version, cons_window, "theil-sen" if cons_method=="Theil–Sen" else "median")
+            kh_cons_obs,ca_cons_obs,mg_cons_obs=cons_obs["KH_atual"],cons_obs["Ca_atual"],cons_obs["Mg_atual"]
+
+            k1,k2,k3=st.columns(3)
+            with k1: st.markdown(kpi("KH – consumo observado", f"{kh_cons_obs:.2f} °dKH/dia"), unsafe_allow_html=True)
+            with k2: st.markdown(kpi("Ca – consumo observado", f"{ca_cons_obs:.2f} ppm/dia"), unsafe_allow_html=True)
+            with k3: st.markdown(kpi("Mg – consumo observado", f"{mg_cons_obs:.2f} ppm/dia"), unsafe_allow_html=True)
+            st.caption("Em Dia/Semana/Mês, o ponto é o **último registro** do período (média, mín. e máx. no tooltip). "
+                       "O consumo observado usa o último registro de cada dia, nos últimos 7/30/90 dias do histórico.")
+        else:
+            st.info("Seu histórico ainda está vazio. Adicione linhas no card abaixo e o gráfico aparece aqui.")
+    else:
+        st.markdown("### Projeção por data (KH, Ca, Mg)")
+        default_start=dt.date.today()
+        if bounds is not None: default_start=bounds[1].date()
+        start=st.date_input("Iniciar projeção em", value=default_start)
+        days=st.slider("Dias para projetar", min_value=7, max_value=1825, value=14, step=1)
+        noise={"KH":(),"Ca":(),"Mg":()}
+        if bounds is not None: noise=consumption_noise(store, tank, version)
+        has_noise=any(len(v)>=3 for v in noise.values())
+        use_mc=st.checkbox("Faixas de incerteza (Monte Carlo com o consumo observado)", value=has_noise, disabled=not has_noise)
+
+        args=(ri["kh_now"],ri["ca_now"],ri["mg_now"],rp["kh_gain"],rp["ca_gain"],ri["kh_cons"],ri["ca_cons"],ri["mg_cons"],
+              ri["kh_target"],ri["ca_target"],rp["max_kh_raise"],days)
+        dates=pd.date_range(start, periods=days+1, freq="D")
+        with profiling.section("projeção"): traj=projection.project(*args)
+        names={"KH":"KH (°dKH)","Ca":"Ca (ppm)","Mg":"Mg (ppm)"}
+        df_proj=pd.DataFrame({"Data":dates,**{names[k]:v for k,v in traj.items()}})
+        long=df_proj.melt(id_vars=["Data"], var_name="Parametro", value_name="Valor")
+        df_band=None
+        if use_mc:
+            with profiling.section("projeção"): bd=projection_bands(args, noise)
+            df_band=pd.concat([pd.DataFrame({"Data":dates,"Parametro":names[k],**{f"p{q}":v for q,v in b.items()}})
+                               for k,b in bd.items()], ignore_index=True)
+        chart=projection_chart(long, df_band, days)
+        with profiling.section("gráfico (envio)"): st.altair_chart(chart, use_container_width=True)
+        st.caption("Projeção: dose pareada diária constante; Mg cai apenas pelo consumo. "
+                   "Faixas: percentis 5–95 e 25–75 de 1000 cenários com o consumo diário sorteado dos desvios observados (90 dias).")
+
+    st.markdown('</div>', unsafe_allow_html=True)
 
-def schedule_days(start_day: str, freq: int):
-    days=["Dom","Seg","Ter","Qua","Qui","Sex","Sáb"]
-    idx=days.index(start_day); order=[days[(idx+i)%7] for i in range(7)]
-    micros=[order[2]] if freq==1 else ([order[2],order[5]] if freq==2 else [order[1],order[3],order[5]] if freq==3 else [])
-    return order, micros
+@st.fragment
+@profiled("reef_history_card")
+def reef_history_card(store:HistoryStore, tank:str, session_row:dict):
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("## Histórico Reef (CSV / Excel / Numbers)")
+    if (flash:=st.session_state.pop("reef_flash",None)): getattr(st,flash[0])(flash[1])
+    up=st.file_uploader("Carregar arquivo", type=["csv","xlsx","xls","numbers"], key="reef_uploader")
+    big_csv=st.checkbox("CSV grande (log do controlador): ler em blocos e guardar 1 ponto por dia", value=False)
+    if up is not None:
+        resolution="D" if big_csv and up.name.lower().endswith(".csv") else None
+        sig=history.content_key(up.getvalue(), up.name)+(f"@{resolution}" if resolution else "")
+        if st.session_state.get("reef_loaded_sig")!=sig:
+            df_loaded=load_history_any(up, sig.split("@")[0], resolution)
+            if df_loaded is not None:
+                added=store.import_frame(df_loaded, tank); st.session_state.reef_loaded_sig=sig
+                # rerun completo: o cartão de Visualização também precisa ver as leituras novas
+                st.session_state.reef_flash=("success",f"Histórico importado: {added} linha(s) nova(s) de {len(df_loaded)}.")
+                st.rerun()
+        cs=history.HISTORY_CACHE.stats()
+        st.caption(f"Cache de arquivos: {cs['hits']} acertos • {cs['misses']} faltas • {cs['entries']} itens • {cs['bytes']/2**20:.1f}/{cs['max_bytes']/2**20:.0f} MB")
+    obs=st.text_input("Observações (opcional)")
+    if st.button("➕ Adicionar linha desta sessão"):
+        row={"timestamp":dt.datetime.now().isoformat(timespec="seconds"),**session_row,"obs":obs or ""}
+        if store.append(row, tank):
+            st.session_state.reef_flash=("success","Linha adicionada ao histórico."); st.rerun()
+        else: st.warning("Já existe uma leitura neste mesmo horário.")
+
+    version=store.version(tank)
+    counts=history_range_counts(store, tank, version, ranges.RULES.version)
+    n_out=sum(w+o for w,o in counts.values())
+    fc1,fc2=st.columns([2,1])
+    with fc1: st.caption("Fora da faixa no histórico inteiro: "+" • ".join(
+        f"{p} **{counts[c][1]}** (+{counts[c][0]} na margem)" for p,c in ranges.REEF_COLUMNS.items()))
+    with fc2: only_out=st.checkbox("Só leituras fora da faixa", key="reef_only_out", disabled=not n_out)
+    st.dataframe(history_tail(store, tank, version, ranges.RULES.version, only_out and n_out>0), use_container_width=True)
+    st.caption(f"{store.count(tank)} leituras salvas em `{store.path}` (tabela mostra as 500 mais recentes).")
+    # exportação só sob demanda: o arquivo é montado em blocos ao clicar e fica em cache até a próxima escrita
+    ec1,ec2=st.columns([1,1])
+    with ec1: fmt=st.selectbox("Formato da exportação", list(export.FORMATS), key="reef_export_fmt")
+    with ec2:
+        st.write(""); st.write("")
+        if st.button("📦 Preparar arquivo"): st.session_state.reef_export=(fmt,version)
+    if st.session_state.get("reef_export")==(fmt,version):
+        try:
+            with profiling.section("exportação"): data=export.history_bytes(store, tank, fmt)
+            st.download_button(f"⬇️ Baixar histórico ({fmt})", data=data,
+                               file_name=export.file_name(tank, fmt), mime=export.FORMATS[fmt][1])
+        except export.ExportError as e: st.error(str(e))
+    st.caption("O histórico fica salvo entre sessões; upload acrescenta as leituras do arquivo (datas repetidas são ignoradas).")
+    st.markdown('</div>', unsafe_allow_html=True)
 
-def ratio_redfield(no3:float, po4:float):
-    if po4<=0: return math.inf,"bad"
-    r=no3/po4
-    return r, ("good" if 8<=r<=15 else "warn" if 6<=r<=18 else "bad")
+# -------- Leituras ao vivo (serviço de ingestão em segundo plano, um por processo) --------
+LIVE_REFRESH_S=2
+LIVE_DEFAULT_DIR=Path.home()/".doser"/"entrada"  # pasta usada sem DOSER_INGEST_DIR
+
+@st.cache_resource
+def get_ingest()->ingest.IngestService:
+    # DOSER_INGEST_DIR / DOSER_INGEST_PORT ligam a ingestão junto com o servidor
+    port=os.environ.get("DOSER_INGEST_PORT")
+    svc=ingest.IngestService(get_store(), drop_dir=os.environ.get("DOSER_INGEST_DIR") or None, port=int(port) if port else None)
+    if svc.drop_dir is not None or svc.port is not None: svc.start()
+    return svc
+
+@st.fragment(run_every=LIVE_REFRESH_S)
+def live_status(svc:ingest.IngestService, store:HistoryStore, tank:str):
+    s=svc.stats()
+    k1,k2,k3,k4=st.columns(4)
+    with k1: st.markdown(kpi("Gravadas", f"{s['gravadas']:,}".replace(",","."), f"{s['por_segundo']:.0f}/s nos últimos 10 s"), unsafe_allow_html=True)
+    with k2: st.markdown(kpi("Repetidas / rejeitadas", f"{s['repetidas']} / {s['rejeitadas']}", "mesma data já salva / sem KH, Ca e Mg"), unsafe_allow_html=True)
+    with k3: st.markdown(kpi("Fila", f"{s['fila']}", f"limite {svc.queue_max}", "bad" if s["fila"]>=svc.queue_max else ""), unsafe_allow_html=True)
+    with k4: st.markdown(kpi("Último lote", f"{s['ultimo_lote']['leituras']} leituras", f"{s['ultimo_lote']['ms']:.0f} ms"), unsafe_allow_html=True)
+    where=[f"`{svc.host}:{s['porta']}` (JSON por linha ou POST /readings)" if s["porta"] else "",
+           f"pasta `{s['pasta']}`" if s["pasta"] else ""]
+    st.caption("Recebendo em "+" e ".join(w for w in where if w)+(f" • último erro: {s['erro']}" if s["erro"] else ""))
+    # leitura nova no aquário da tela: rerun do app (gráfico, tabela e consumo saem dos caches por versão)
+    if st.session_state.get("live_follow", True) and store.version(tank)!=st.session_state.get("live_seen"):
+        st.rerun()
+
+@st.fragment
+@profiled("live_ingest_card")
+def live_ingest_card(store:HistoryStore, tank:str):
+    svc=get_ingest()
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("## Leituras ao vivo (controlador)")
+    if svc.running:
+        live_status(svc, store, tank)
+        lc1,lc2=st.columns([1,1])
+        with lc1: st.toggle("Atualizar gráficos automaticamente", value=True, key="live_follow")
+        with lc2:
+            if st.button("⏹️ Parar ingestão"):
+                try: svc.stop()
+                except ingest.IngestError as e: st.error(str(e))
+                else: st.rerun()
+    else:
+        # pasta e porta só da configuração do servidor (não da tela): sem DOSER_INGEST_DIR, a pasta fixa em ~/.doser
+        folder=svc.drop_dir or LIVE_DEFAULT_DIR
+        st.markdown(f"Pasta de entrada: `{folder}` • "+(f"porta local: `{svc.host}:{svc.port}`" if svc.port else "sem endpoint TCP/HTTP"))
+        st.caption("Para mudar, defina `DOSER_INGEST_DIR` / `DOSER_INGEST_PORT` e reinicie o app.")
+        if st.button("▶️ Iniciar ingestão"):
+            svc.drop_dir=folder
+            try: svc.start()
+            except ingest.IngestError as e: st.error(str(e))
+            else: st.rerun()
+    st.caption("O controlador envia KH/Ca/Mg como JSON (`{\"ts\": \"2024-05-01T10:00\", \"KH\": 8.4, \"Ca\": 425, \"Mg\": 1310, \"tank\": \"principal\"}`) "
+               "por TCP, HTTP ou em arquivos .json/.jsonl/.csv na pasta. As leituras são gravadas em lotes; datas repetidas são ignoradas. "
+               "Para testar: `python -m doser device --port 8765 --rate 1000`.")
+    st.markdown('</div>', unsafe_allow_html=True)
 
-# -------- Helpers Reef --------
-def dkh_from_meq(meq): return meq*2.8
+@st.cache_data(max_entries=8, show_spinner=False)
+def fleet_overview(_store:HistoryStore, fleet_version:int, potency:tuple, fallback:tuple)->pd.DataFrame:
+    return fleet.overview(_store, dict(potency), dict(fallback))
 
-# -------- Loader CSV/XLS/XLSX/NUMBERS --------
-def load_history_any(up_file)->pd.DataFrame|None:
-    name=(up_file.name or "").lower()
-    try:
-        if name.endswith(".csv"):
-            df=pd.read_csv(up_file)
-        elif name.endswith((".xlsx",".xls")):
-            df=pd.read_excel(up_file)
-        elif name.endswith(".numbers"):
-            try:
-                from numbers_parser import Document
-            except Exception:
-                st.error("Para abrir .numbers, instale `numbers-parser` (ou exporte para CSV)."); return None
-            with tempfile.NamedTemporaryFile(delete=False,suffix=".numbers") as tmp:
-                tmp.write(up_file.getbuffer()); path=tmp.name
-            doc=Document(path); chosen=None; want={"timestamp","volume_L","KH_atual","Ca_atual","Mg_atual"}
-            for s in doc.sheets:
-                for t in s.tables:
-                    mat=[]
-                    for row in t.rows():
-                        cells=getattr(row,"cells",row)
-                        mat.append([getattr(c,"value",c) for c in cells])
-                    if not mat: continue
-                    header=[str(x) for x in mat[0]]
-                    if want.issubset(set(header)):
-                        chosen=pd.DataFrame(mat[1:],columns=header); break
-                if chosen is not None: break
-            if chosen is None:
-                s=doc.sheets[0]; t=s.tables[0]; mat=[]
-                for row in t.rows():
-                    cells=getattr(row,"cells",row)
-                    mat.append([getattr(c,"value",c) for c in cells])
-                header=[str(x) for x in mat[0]] if mat else []
-                chosen=pd.DataFrame(mat[1:],columns=header)
-            df=chosen
+FLEET_COLUMNS={"Última leitura":st.column_config.DatetimeColumn(format="DD/MM/YYYY HH:mm"),
+               **{c:st.column_config.NumberColumn(format="%.2f") for c in
+                  ("KH","Ca","Mg","KH cons./dia","Ca cons./dia","Mg cons./dia","Fusion 1&2 hoje (mL)")},
+               "Volume (L)":st.column_config.NumberColumn(format="%.0f"),
+               "Dias p/ KH alvo":st.column_config.NumberColumn(format="%.0f")}
+
+@st.fragment
+@profiled("fleet_card")
+def fleet_card(store:HistoryStore, potency:dict, fallback:dict):
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown("## Frota (vários aquários)")
+    if (flash:=st.session_state.pop("fleet_flash",None)): getattr(st,flash[0])(flash[1])
+    fc1,fc2=st.columns([1.3,1])
+    with fc1: ups=st.file_uploader("Logs por aquário (.zip ou vários arquivos — o nome do arquivo vira o aquário)",
+                                   type=["zip","csv","xlsx","xls","numbers"], accept_multiple_files=True, key="fleet_uploader")
+    # pasta no servidor só dentro de DOSER_FLEET_DIR (configurado por quem administra o servidor)
+    root=fleet.folder_root(); folder=""
+    if root is not None:
+        with fc2: folder=st.text_input(f"…ou uma subpasta de `{root}`", placeholder=". (a pasta toda)").strip()
+    if st.button("📥 Importar frota", disabled=not ups and not folder):
+        try:
+            src=fleet.sources_from_files([(u.name,u.getvalue()) for u in ups or []])
+            if folder: src+=fleet.sources_from_folder(folder, root=root)
+        except history.HistoryLoadError as e: st.error(str(e))
         else:
-            st.error("Formato não suportado. Use CSV, XLSX, XLS ou NUMBERS."); return None
-
-        df=df.rename(columns={
-            "KH atual":"KH_atual","Ca atual":"Ca_atual","Mg atual":"Mg_atual",
-            "KH ideal":"KH_ideal","Ca ideal":"Ca_ideal","Mg ideal":"Mg_ideal",
-            "KH/dia":"KH_cons","Ca/dia":"Ca_cons","Mg/dia":"Mg_cons",
-            "Dose (mL)":"dose_pair_mL","KH ganho/dia":"KH_gain_dia","Ca ganho/dia":"Ca_gain_dia",
-            "KH líquido/dia":"KH_liq_dia","Ca líquido/dia":"Ca_liq_dia",
-        })
-
-        def parse_ts(s):
-            ts=pd.to_datetime(s,errors="coerce")
-            if ts.isna().mean()>0.5: ts=pd.to_datetime(s,errors="coerce",dayfirst=True)
-            return ts
-        if "timestamp" in df.columns: df["timestamp"]=parse_ts(df["timestamp"])
-
-        numeric=[
-            "volume_L","KH_atual","Ca_atual","Mg_atual","KH_ideal","Ca_ideal","Mg_ideal",
-            "KH_cons","Ca_cons","Mg_cons","dose_pair_mL","KH_gain_dia","Ca_gain_dia","KH_liq_dia","Ca_liq_dia"
-        ]
-        for c in numeric:
-            if c in df.columns: df[c]=pd.to_numeric(df[c],errors="coerce").round(2)
-        return df
-    except Exception:
-        st.error("Não consegui ler o arquivo. Tente CSV/Excel ou verifique o conteúdo."); return None
+            # leitura em paralelo (pool de processos); gravação no SQLite em série, aqui
+            bar=st.progress(0.0, text="Lendo arquivos…")
+            with profiling.section("frota: leitura"):
+                parsed=fleet.read_many(src, progress=lambda d,n: bar.progress(d/max(n,1), text=f"Lendo arquivos… {d}/{n}"))
+            with profiling.section("frota: gravação"): added=fleet.ingest(store, parsed)
+            errs=[f"{p['name']}: {p['error']}" for p in parsed if p["error"]]
+            msg=f"{len(added)} aquário(s) importado(s), {sum(added.values())} leitura(s) nova(s)."
+            if errs: msg+=f" Não lidos ({len(errs)}): "+"; ".join(errs[:5])+(" …" if len(errs)>5 else "")
+            # rerun completo: a lista de aquários da sidebar também muda
+            st.session_state.fleet_flash=("warning" if errs else "success", msg); st.rerun()
+
+    with profiling.section("frota: visão geral"):
+        ov=fleet_overview(store, store.fleet_version(), tuple(potency.items()), tuple(fallback.items()))
+    if ov.empty:
+        st.info("Nenhum aquário com histórico ainda. Envie um .zip (ou vários arquivos) com um log por aquário.")
+    else:
+        k1,k2,k3=st.columns(3)
+        with k1: st.markdown(kpi("Aquários", f"{len(ov)}"), unsafe_allow_html=True)
+        n_bad=int((~ov["Tudo ok"]).sum())
+        with k2: st.markdown(kpi("Fora da faixa", f"{n_bad}", "KH, Ca ou Mg", "bad" if n_bad else "good"), unsafe_allow_html=True)
+        with k3: st.markdown(kpi("Fusion 1 & 2 hoje", f"{ov['Fusion 1&2 hoje (mL)'].sum():.1f} mL", "soma da frota (cada parte)"), unsafe_allow_html=True)
+        f1,f2=st.columns([1,1])
+        with f1: only_bad=st.checkbox("Só aquários fora da faixa")
+        with f2: q=st.text_input("Filtrar por nome", key="fleet_filter").strip().lower()
+        show=ov[~ov["Tudo ok"]] if only_bad else ov
+        if q: show=show[show["Aquário"].str.lower().str.contains(q, regex=False)]
+        st.dataframe(show, hide_index=True, use_container_width=True, column_config=FLEET_COLUMNS)
+        st.caption("Último valor registrado de cada parâmetro; consumo observado em 30 dias; dose de hoje com a potência "
+                   "da sidebar e volume/alvos do log (ou da sidebar, se o log não tiver).")
+    st.markdown('</div>', unsafe_allow_html=True)
+
+# -------- Catálogo de produtos (doser.catalog: carregado uma vez por processo, coeficientes prontos) --------
+MANUAL_PRODUCT="Manual (digitar o rótulo)"
+CATALOG_COLUMNS={c:st.column_config.NumberColumn(format="%.2f") for c in ("Efeito de 1 unid.","Para +1","Falta","Dose p/ alvo")}
+
+def get_catalog()->catalog.Catalog:
+    try: return catalog.load()
+    except catalog.CatalogError as e:
+        st.sidebar.warning(f"{e} Usando só o catálogo embutido."); return catalog.load(builtin_only=True)
+
+def product_fields(cat:catalog.Catalog, slot:str, key:str)->tuple[str|None,dict|None]:
+    """Produto do catálogo para um tipo (selectbox da sidebar): (nome, campos do rótulo); (None, None) = manual."""
+    opts=cat.choices(slot); labels=[MANUAL_PRODUCT]+[f"{b} – {p}" for b,p in opts]
+    pick=st.selectbox("Produto", labels, index=1 if opts else 0, key=key)
+    if pick==MANUAL_PRODUCT: return None,None
+    b,p=opts[labels.index(pick)-1]; st.caption(cat.describe(b,p))
+    return p,cat.fields(b,p)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def catalog_doses(catalog_version:str, volume_L:float, deltas:tuple|None=None, products:tuple|None=None,
+                  slots:tuple|None=None)->pd.DataFrame:
+    cat=get_catalog()
+    return pd.DataFrame(cat.dose_table(volume_L, dict(deltas) if deltas is not None else None, products, slots)).drop(columns="Volume (L)")
+
+@st.fragment
+@profiled("catalog_search")
+def catalog_search(cat:catalog.Catalog, vol:float, slots:tuple):
+    with st.expander("📦 Catálogo de produtos"):
+        q=st.text_input("Buscar", key="catalog_q", placeholder="marca, produto ou parâmetro (ex.: kh, cálcio)")
+        hits=cat.search(q, slots=slots)
+        if not hits: st.caption("Nenhum produto encontrado."); return
+        df=catalog_doses(cat.version, vol, products=tuple(hits))
+        st.dataframe(df[["Produto","Parâmetro","Unid.","Para +1"]], hide_index=True, use_container_width=True, column_config=CATALOG_COLUMNS)
+        st.caption(f"Quanto de cada produto sobe +1 no parâmetro em {vol:.0f} L. Produtos próprios: `{catalog.user_path()}`.")
+
+def catalog_card(cat:catalog.Catalog, vol:float, deltas:dict, slots:tuple):
+    st.markdown('<div class="card">', unsafe_allow_html=True)
+    st.markdown(f"## Doses por produto ({vol:.0f} L)")
+    df=catalog_doses(cat.version, vol, tuple(deltas.items()), slots=slots)
+    st.dataframe(df, hide_index=True, use_container_width=True, column_config=CATALOG_COLUMNS)
+    st.caption("Todos os produtos do catálogo para este volume: efeito de 1 mL (ou g), quanto sobe +1 e a dose para cobrir "
+               "o que falta até o alvo. Não considera limites diários do fabricante.")
+    st.markdown('</div>', unsafe_allow_html=True)
 
 # -------------- Banner, header e modo --------------
+# o radio "mode" grava em session_state antes do rerun, então o modo já é conhecido aqui: tema e banner entram uma vez só
 mode_default=st.session_state.get("mode","Doce + Camarões")
-st.markdown(theme_css(mode_default), unsafe_allow_html=True)
-st.markdown(render_top_banner_svg(mode_default), unsafe_allow_html=True)
+st.markdown(base_css()+theme_css(mode_default)+render_top_banner_svg(mode_default), unsafe_allow_html=True)
 
 colh1,colh2=st.columns([1,1.2])
 with colh1:
@@ -169,13 +566,14 @@ with colh2:
     st.radio("Tipo de aquário", ["Doce + Camarões","Marinho (Reef)"], horizontal=True, key="mode", index=0)
 
 mode=st.session_state["mode"]
-st.markdown(theme_css(mode), unsafe_allow_html=True)
 st.markdown(render_badges(mode), unsafe_allow_html=True)
 
 # ---------------- Sidebar ----------------
 with st.sidebar:
     st.markdown("## ⚙️ Parâmetros do aquário")
     vol=st.number_input("Volume útil (L)", min_value=1.0, value=50.0, step=1.0, format="%.2f")
+    cat=get_catalog()
+    catalog_search(cat, vol, catalog.MODE_SLOTS["fw" if mode=="Doce + Camarões" else "reef"])
 
     if mode=="Doce + Camarões":
         do_tpa=st.checkbox("Vou fazer TPA agora", value=True)
@@ -200,9 +598,12 @@ with st.sidebar:
             po4_target=(po4_min+po4_max)/2
 
         st.markdown("---"); st.markdown("### 🧪 Macro (líquido)")
-        pctN=st.number_input("% N (elementar)", min_value=0.0, value=1.37, step=0.01, format="%.2f")
-        pctP=st.number_input("% P (elementar)", min_value=0.0, value=0.34, step=0.01, format="%.2f")
-        density=st.number_input("Densidade (g/mL)", min_value=0.5, value=1.00, step=0.01, format="%.2f")
+        _,f=product_fields(cat,"macro","product_macro")
+        if f: pctN,pctP,density=f["pctN"],f["pctP"],f["density"]
+        else:
+            pctN=st.number_input("% N (elementar)", min_value=0.0, value=1.37, step=0.01, format="%.2f")
+            pctP=st.number_input("% P (elementar)", min_value=0.0, value=0.34, step=0.01, format="%.2f")
+            density=st.number_input("Densidade (g/mL)", min_value=0.5, value=1.00, step=0.01, format="%.2f")
 
         st.markdown("---"); st.markdown("### 📅 Consumo & Agenda")
         tpa_day=st.selectbox("Dia da TPA (para agenda)", options=["Dom","Seg","Ter","Qua","Qui","Sex","Sáb"], index=1)
@@ -212,17 +613,28 @@ with st.sidebar:
         micro_freq=st.selectbox("Aplicações de micro/semana", options=[1,2,3], index=1)
 
         st.markdown("---"); st.markdown("### 🌿 Nitrogênio isolado")
-        dose_mL_per_100L=st.number_input("mL por dose (100 L)", min_value=0.1, value=6.0, step=0.1, format="%.2f")
-        adds_ppm_per_100L=st.number_input("ppm NO₃ por dose (100 L)", min_value=0.1, value=4.8, step=0.1, format="%.2f")
+        _,f=product_fields(cat,"nitrogen","product_nitrogen")
+        if f: dose_mL_per_100L,adds_ppm_per_100L=f["dose_mL_per_100L"],f["adds_ppm_per_100L"]
+        else:
+            dose_mL_per_100L=st.number_input("mL por dose (100 L)", min_value=0.1, value=6.0, step=0.1, format="%.2f")
+            adds_ppm_per_100L=st.number_input("ppm NO₃ por dose (100 L)", min_value=0.1, value=4.8, step=0.1, format="%.2f")
 
-        st.markdown("---"); st.markdown("### 🧱 GH & KH (ReeFlowers)")
+        st.markdown("---"); st.markdown("### 🧱 GH & KH")
         gh_target=st.number_input("GH alvo (°dH)", min_value=0.0, value=7.0, step=0.5, format="%.2f")
-        g_per_dGH_100L=st.number_input("Shrimp Minerals (pó): g por +1°dGH/100 L", min_value=0.1, value=2.0, step=0.1, format="%.2f")
+        gh_name,f=product_fields(cat,"gh","product_gh")
+        if f: g_per_dGH_100L=f["g_per_dGH_100L"]
+        else: g_per_dGH_100L=st.number_input("Remineralizador (pó): g por +1°dGH/100 L", min_value=0.1, value=2.0, step=0.1, format="%.2f")
         remin_mix_to=st.number_input("Remineralizar TPA até GH (°dH)", min_value=0.0, value=gh_target, step=0.5, format="%.2f")
         kh_target=st.number_input("KH alvo (°dKH)", min_value=0.0, value=3.0, step=0.5, format="%.2f")
-        ml_khplus_per_dKH_100L=st.number_input("KH+ mL por +1°dKH/100 L", min_value=1.0, value=30.0, step=1.0, format="%.2f")
+        kh_name,f=product_fields(cat,"kh","product_kh")
+        if f: ml_khplus_per_dKH_100L=f["ml_khplus_per_dKH_100L"]
+        else: ml_khplus_per_dKH_100L=st.number_input("KH+ mL por +1°dKH/100 L", min_value=1.0, value=30.0, step=1.0, format="%.2f")
 
     else:
+        tanks=get_store().tanks()
+        if set(tanks)-{DEFAULT_TANK}:
+            st.markdown("---")
+            st.selectbox("Aquário (histórico e gráficos)", [DEFAULT_TANK]+[t for t in tanks if t!=DEFAULT_TANK], key="reef_tank")
         st.markdown("---"); st.markdown("### 🧪 Testes atuais (Reef)")
         kh_now=st.number_input("KH atual (°dKH)", min_value=0.0, value=8.0, step=0.1, format="%.2f")
         ca_now=st.number_input("Cálcio atual (ppm)", min_value=200.0, value=420.0, step=5.0, format="%.2f")
@@ -239,36 +651,31 @@ with st.sidebar:
         mg_cons=st.number_input("Consumo Mg (ppm/dia)", min_value=0.0, value=1.0, step=0.5, format="%.2f")
 
         st.markdown("---"); st.markdown("### 🧪 Potência (Fusion 1 & 2)")
-        ca_ppm_per_ml_per_25L=st.number_input("Fusion 1: +ppm Ca por 1 mL/25 L", min_value=0.1, value=4.0, step=0.1, format="%.2f")
-        alk_meq_per_ml_per_25L=st.number_input("Fusion 2: +meq/L por 1 mL/25 L", min_value=0.01, value=0.176, step=0.001, format="%.3f")
+        _,f=product_fields(cat,"ca","product_ca")
+        if f: ca_ppm_per_ml_per_25L=f["ca_ppm_per_ml_per_25L"]
+        else: ca_ppm_per_ml_per_25L=st.number_input("Fusion 1: +ppm Ca por 1 mL/25 L", min_value=0.1, value=4.0, step=0.1, format="%.2f")
+        _,f=product_fields(cat,"alk","product_alk")
+        if f: alk_meq_per_ml_per_25L=f["alk_meq_per_ml_per_25L"]
+        else: alk_meq_per_ml_per_25L=st.number_input("Fusion 2: +meq/L por 1 mL/25 L", min_value=0.01, value=0.176, step=0.001, format="%.3f")
         max_ml_per_25L_day=st.number_input("Máx. mL por 25 L/dia (cada)", min_value=0.5, value=4.0, step=0.5, format="%.2f")
         max_kh_raise_net=st.number_input("Limite de aumento líquido KH (°dKH/dia)", min_value=0.2, value=1.0, step=0.1, format="%.2f")
 
 # ---------------- Plantado ----------------
 if mode=="Doce + Camarões":
-    tpa_eff=tpa if do_tpa else 0.0
-    f_dilution=1.0-(tpa_eff/vol)
-    no3_base=no3_now*f_dilution; po4_base=po4_now*f_dilution
-    mgNO3,mgPO4=conversions(density,pctN,pctP); dNO3=mgNO3/vol; dPO4=mgPO4/vol
-
-    if target_mode.startswith("PO₄"):
-        mL_now=max(0.0,(po4_target-po4_base)/dPO4) if dPO4>0 else 0.0
-        po4_after=po4_base+mL_now*dPO4; no3_after=no3_base+mL_now*dNO3
-        warn_no3=not (no3_min<=no3_after<=no3_max); warn_po4=False
-    else:
-        mL_now=max(0.0,(no3_target-no3_base)/dNO3) if dNO3>0 else 0.0
-        no3_after=no3_base+mL_now*dNO3; po4_after=po4_base+mL_now*dPO4
-        warn_po4=not (po4_min<=po4_after<=po4_max); warn_no3=False
-
-    mL_day_macro=(po4_daily/dPO4) if dPO4>0 else 0.0
-    no3_from_daily=mL_day_macro*dNO3; no3_drift=no3_from_daily-no3_daily
-    r_before,s_before=ratio_redfield(no3_base,po4_base)
-    r_after,s_after=ratio_redfield(no3_after,po4_after)
-
-    ppm_per_mL_tank=(adds_ppm_per_100L/dose_mL_per_100L)*(100.0/vol)
-    need_N = (r_after<8) or (target_mode.startswith("PO₄") and (no3_after<no3_min))
-    N_target_ppm=(no3_min+no3_max)/2 if target_mode.startswith("PO₄") else no3_target
-    N_dose_mL=max(0.0,(N_target_ppm-no3_after)/ppm_per_mL_tank) if need_N and ppm_per_mL_tank>0 else 0.0
+    with profiling.section("cálculo (motor)"):
+        fw=engine.row(engine.freshwater_plan({
+            "volume_L":vol,"do_tpa":do_tpa,"tpa_L":tpa,"no3_now":no3_now,"po4_now":po4_now,"gh_now":gh_now,"kh_now":kh_now,
+            "target":"PO4" if target_mode.startswith("PO₄") else "NO3","po4_target":po4_target,"no3_target":no3_target,
+            **({"no3_min":no3_min,"no3_max":no3_max} if target_mode.startswith("PO₄") else {"po4_min":po4_min,"po4_max":po4_max}),
+            "pctN":pctN,"pctP":pctP,"density":density,"po4_daily":po4_daily,"no3_daily":no3_daily,"micro_per30":micro_per30,
+            "dose_mL_per_100L":dose_mL_per_100L,"adds_ppm_per_100L":adds_ppm_per_100L,
+            "gh_target":gh_target,"g_per_dGH_100L":g_per_dGH_100L,"remin_mix_to":remin_mix_to,
+            "kh_target":kh_target,"ml_khplus_per_dKH_100L":ml_khplus_per_dKH_100L,
+        }, memo=graph_memo("fw_graph", engine.FRESHWATER)))
+    f_dilution,no3_base,po4_base,dNO3,dPO4=fw["f_dilution"],fw["no3_base"],fw["po4_base"],fw["dNO3"],fw["dPO4"]
+    mL_now,no3_after,po4_after,warn_no3,warn_po4=fw["mL_now"],fw["no3_after"],fw["po4_after"],fw["warn_no3"],fw["warn_po4"]
+    mL_day_macro,r_before,r_after,s_after=fw["mL_day_macro"],fw["r_before"],fw["r_after"],fw["s_after"]
+    N_target_ppm,N_dose_mL=fw["N_target_ppm"],fw["N_dose_mL"]
 
     k1,k2,k3,k4,k5=st.columns(5)
     with k1: st.markdown(kpi("🎯 Dose agora (macro)", f"{mL_now:.2f} mL","para atingir o alvo"), unsafe_allow_html=True)
@@ -304,7 +711,7 @@ if mode=="Doce + Camarões":
 
     # Agenda semanal
     order_days,micro_days=schedule_days(tpa_day,micro_freq)
-    micro_per_app=micro_per30*(vol/30.0)
+    micro_per_app=fw["micro_per_app"]
     rows=[]
     for j,d in enumerate(order_days):
         macro=mL_day_macro; micro=micro_per_app if d in micro_days else 0.0; note=[]
@@ -319,56 +726,39 @@ if mode=="Doce + Camarões":
     st.markdown('</div>', unsafe_allow_html=True)
 
     # GH/KH
-    dGH=max(0.0, gh_target-gh_now); g_shrimp=dGH*(vol/100.0)*g_per_dGH_100L
-    ml_per_g=2.3/2.0; ml_shrimp=g_shrimp*ml_per_g
-    g_shrimp_tpa=remin_mix_to*(tpa/100.0)*g_per_dGH_100L; ml_shrimp_tpa=g_shrimp_tpa*ml_per_g
-    dKH=max(0.0, kh_target-kh_now); ml_kh_tank=dKH*(vol/100.0)*ml_khplus_per_dKH_100L
-    ml_kh_tpa=kh_target*(tpa/100.0)*ml_khplus_per_dKH_100L; ml_kh_daily=2.0*(vol/100.0)
+    dGH,g_shrimp,ml_shrimp=fw["dGH"],fw["g_shrimp"],fw["ml_shrimp"]
+    g_shrimp_tpa,ml_shrimp_tpa=fw["g_shrimp_tpa"],fw["ml_shrimp_tpa"]
+    dKH,ml_kh_tank,ml_kh_tpa,ml_kh_daily=fw["dKH"],fw["ml_kh_tank"],fw["ml_kh_tpa"],fw["ml_kh_daily"]
 
     c1,c2=st.columns(2)
     with c1:
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("## GH – Shrimp Minerals (pó)")
+        st.markdown(f"## GH – {gh_name or 'remineralizador (pó)'}")
         st.write(f"Δ GH: **{dGH:.2f} °dH** → **{g_shrimp:.2f} g** (≈ {ml_shrimp:.2f} mL).")
         if do_tpa and tpa>0: st.write(f"Remineralizar TPA a **{remin_mix_to:.2f} °dH** em **{tpa:.0f} L** → **{g_shrimp_tpa:.2f} g** (≈ {ml_shrimp_tpa:.2f} mL).")
-        st.caption("Regra: 2 g (~2,3 mL) elevam +1 °dH em 100 L.")
+        st.caption(f"Regra: {g_per_dGH_100L:g} g (~{g_per_dGH_100L*(2.3/2.0):.1f} mL) elevam +1 °dH em 100 L.")
         st.markdown('</div>', unsafe_allow_html=True)
     with c2:
         st.markdown('<div class="card">', unsafe_allow_html=True)
-        st.markdown("## KH – ReeFlowers KH+")
+        st.markdown(f"## KH – {kh_name or 'KH+'}")
         st.write(f"Δ KH: **{dKH:.2f} °dKH** → **{ml_kh_tank:.2f} mL** de KH+.")
         if do_tpa and tpa>0: st.write(f"Preparar TPA: alvo **{kh_target:.2f} °dKH** em **{tpa:.0f} L** → **{ml_kh_tpa:.2f} mL**.")
         st.write(f"Manutenção diária sugerida: **{ml_kh_daily:.2f} mL/dia** (2 mL/100 L).")
-        st.caption("Regra: 30 mL/100 L → +1 °dKH.")
+        st.caption(f"Regra: {ml_khplus_per_dKH_100L:g} mL/100 L → +1 °dKH.")
         st.markdown('</div>', unsafe_allow_html=True)
 
+    catalog_card(cat, vol, {"GH":dGH,"KH":dKH,**({"PO4":po4_target-po4_base} if target_mode.startswith("PO₄") else {"NO3":no3_target-no3_base})},
+                 catalog.MODE_SLOTS["fw"])
+
     # Faixas camarões
-    data=[{"Grupo":"Neocaridina davidi (Red Cherry, etc.)","pH_range":(6.5,7.8),"GH_range":(6.0,12.0),"KH_range":(3.0,8.0)},
-          {"Grupo":"Caridina cantonensis (Crystal/Bee/Taiwan Bee)","pH_range":(5.5,6.5),"GH_range":(4.0,6.0),"KH_range":(0.0,2.0)}]
-    dfp=pd.DataFrame({
-        "Grupo":[d["Grupo"] for d in data],
-        "pH":[f"{d['pH_range'][0]:.1f}–{d['pH_range'][1]:.1f}" for d in data],
-        "pH_min":[d["pH_range"][0] for d in data],"pH_max":[d["pH_range"][1] for d in data],
-        "GH (°dH)":[f"{d['GH_range'][0]:.0f}–{d['GH_range'][1]:.0f}" for d in data],
-        "GH_min":[d["GH_range"][0] for d in data],"GH_max":[d["GH_range"][1] for d in data],
-        "KH (°dKH)":[f"{d['KH_range'][0]:.0f}–{d['KH_range'][1]:.0f}" for d in data],
-        "KH_min":[d["KH_range"][0] for d in data],"KH_max":[d["KH_range"][1] for d in data],
-    })
-    show=dfp[["Grupo","pH","GH (°dH)","KH (°dKH)"]].copy()
-    def _hl(_,dfp=dfp,pH_now=pH_now,gh_now=gh_now,kh_now=kh_now):
-        s=pd.DataFrame('', index=show.index, columns=show.columns)
-        for i in show.index:
-            r=dfp.loc[i]
-            if r["pH_min"]<=pH_now<=r["pH_max"]: s.at[i,"pH"]='background-color:#065f46; color:#ecfeff; font-weight:600;'
-            if r["GH_min"]<=gh_now<=r["GH_max"]: s.at[i,"GH (°dH)"]='background-color:#065f46; color:#ecfeff; font-weight:600;'
-            if r["KH_min"]<=kh_now<=r["KH_max"]: s.at[i,"KH (°dKH)"]='background-color:#065f46; color:#ecfeff; font-weight:600;'
-        return s
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("## Faixas recomendadas (Doce – camarões)")
-    st.markdown(show.style.apply(_hl, axis=None).to_html(), unsafe_allow_html=True)
+    st.markdown(shrimp_ranges_html(ranges.RULES.version,pH_now,gh_now,kh_now), unsafe_allow_html=True)
     st.caption("Compromisso p/ Neo + Caridina: pH ~6,8–7,0; GH 6–7; KH 2–3.")
     st.markdown('</div>', unsafe_allow_html=True)
 
+    graph_debug(st.session_state.fw_graph)
+
     cfg={"mode":"freshwater_shrimp","tank":{"volume_L":vol,"do_tpa_now":do_tpa,"tpa_L":tpa}}
     st.download_button("💾 Salvar configuração (JSON)",
                        data=json.dumps(cfg,indent=2,ensure_ascii=False).encode(),
@@ -376,44 +766,24 @@ if mode=="Doce + Camarões":
 
 # ---------------- Reef ----------------
 else:
-    ca_per_ml= (st.session_state.get('ca_ppm_per_ml_per_25L', None) or 4.0) * (25.0/vol)
-    # Releitura a partir dos widgets (já definidos no sidebar Reef)
-    ca_per_ml = st.session_state.get('ca_ppm_per_ml_per_25L', 4.0) * (25.0/vol)
-    alk_meq = st.session_state.get('alk_meq_per_ml_per_25L', 0.176)
-    kh_per_ml = dkh_from_meq(alk_meq) * (25.0/vol)
-    max_ml_tank = st.session_state.get('max_ml_per_25L_day', 4.0) * (vol/25.0)
-    max_kh_raise = st.session_state.get('max_kh_raise_net', 1.0)
-
-    # traz do sidebar
-    kh_now = st.session_state.get('KH atual (°dKH)', None) or st.session_state.get('kh_now', None) or kh_now
-    ca_now = st.session_state.get('Cálcio atual (ppm)', None) or ca_now
-    mg_now = st.session_state.get('Magnésio atual (ppm)', None) or mg_now
-    kh_target = st.session_state.get('KH ideal (°dKH)', None) or kh_target
-    ca_target = st.session_state.get('Ca ideal (ppm)', None) or ca_target
-    mg_target = st.session_state.get('Mg ideal (ppm)', None) or mg_target
-    kh_cons = st.session_state.get('Consumo KH (°dKH/dia)', None) or kh_cons
-    ca_cons = st.session_state.get('Consumo Ca (ppm/dia)', None) or ca_cons
-    mg_cons = st.session_state.get('Consumo Mg (ppm/dia)', None) or mg_cons
-
-    dKH_needed = max(0.0, kh_target - kh_now)
-    desired_kh_today = min(dKH_needed, max_kh_raise + kh_cons)
-    ml_f2 = (desired_kh_today / kh_per_ml) if kh_per_ml>0 else 0.0
-    ml_f1 = (ca_cons / ca_per_ml) if ca_per_ml>0 else 0.0
-    ml_pair = max(ml_f2, ml_f1); limited=False
-    if ml_pair>max_ml_tank: ml_pair=max_ml_tank; limited=True
-
-    kh_gain = ml_pair * kh_per_ml
-    ca_gain = ml_pair * ca_per_ml
-    kh_net  = kh_gain - kh_cons
-    ca_net  = ca_gain - ca_cons
-    days_kh = math.inf if kh_net<=0 else math.ceil(dKH_needed / min(kh_net, max_kh_raise))
+    reef_inputs={
+        "volume_L":vol,"kh_now":kh_now,"ca_now":ca_now,"mg_now":mg_now,
+        "kh_target":kh_target,"ca_target":ca_target,"mg_target":mg_target,
+        "kh_cons":kh_cons,"ca_cons":ca_cons,"mg_cons":mg_cons,
+        "ca_ppm_per_ml_per_25L":ca_ppm_per_ml_per_25L,"alk_meq_per_ml_per_25L":alk_meq_per_ml_per_25L,
+        "max_ml_per_25L_day":max_ml_per_25L_day,"max_kh_raise_net":max_kh_raise_net,
+    }
+    with profiling.section("cálculo (motor)"):
+        rp=engine.row(engine.reef_plan(reef_inputs, memo=graph_memo("reef_graph", engine.REEF)))
+    graph_debug(st.session_state.reef_graph)
+    max_kh_raise,ml_pair,limited=rp["max_kh_raise"],rp["ml_pair"],rp["limited"]
+    kh_gain,ca_gain,kh_net,ca_net,days_kh=rp["kh_gain"],rp["ca_gain"],rp["kh_net"],rp["ca_net"],rp["days_kh"]
 
     k1,k2,k3,k4=st.columns(4)
     with k1: st.markdown(kpi("🧪 Fusion 1 (diário)", f"{ml_pair:.2f} mL", f"{ca_gain:.2f} ppm Ca/dia (bruto)"), unsafe_allow_html=True)
     with k2: st.markdown(kpi("🧪 Fusion 2 (diário)", f"{ml_pair:.2f} mL", f"{kh_gain:.2f} °dKH/dia (bruto)"), unsafe_allow_html=True)
-    ok=(8<=round(kh_now)<=12) and (380<=round(ca_now)<=450) and (1250<=round(mg_now)<=1350)
-    with k3: st.markdown(kpi("🎛️ Estado atual", f"KH {kh_now:.2f} • Ca {ca_now:.2f} • Mg {mg_now:.2f}", "verde=ok, vermelho=fora", "good" if ok else "bad"), unsafe_allow_html=True)
-    with k4: st.markdown(kpi("📅 Dias p/ KH alvo", "—" if days_kh==math.inf else f"~{days_kh}", f"alvo {kh_target:.2f} °dKH"), unsafe_allow_html=True)
+    with k3: st.markdown(kpi("🎛️ Estado atual", f"KH {kh_now:.2f} • Ca {ca_now:.2f} • Mg {mg_now:.2f}", "verde=ok, vermelho=fora", "good" if rp["ok"] else "bad"), unsafe_allow_html=True)
+    with k4: st.markdown(kpi("📅 Dias p/ KH alvo", "—" if days_kh==math.inf else f"~{int(days_kh)}", f"alvo {kh_target:.2f} °dKH"), unsafe_allow_html=True)
 
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("## Resumo (Reef) – Fusion 1 & 2 (pareados)")
@@ -422,164 +792,46 @@ else:
     if limited: st.markdown('<span class="bad">Limitado pelo fabricante (dose capada).</span>', unsafe_allow_html=True)
     st.caption("Dosar as partes em locais diferentes; não exceder 4 mL/25 L/dia de cada.")
 
-    # -------- VISUALIZAÇÃO --------
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown("## Visualização")
-    view_mode=st.radio("Mostrar", ["Histórico (valores medidos)","Projeção (simulada)"], horizontal=True, index=0)
+    reef_plan_card(reef_inputs)
 
-    if view_mode.startswith("Histórico"):
-        st.markdown("### Gráfico histórico (KH, Ca, Mg) por data")
-        if "reef_history" in st.session_state and not st.session_state.reef_history.empty:
-            dfh=st.session_state.reef_history.copy()
-            def parse_ts(s):
-                ts=pd.to_datetime(s,errors="coerce")
-                if ts.isna().mean()>0.5: ts=pd.to_datetime(s,errors="coerce",dayfirst=True)
-                return ts
-            dfh["timestamp"]=parse_ts(dfh["timestamp"])
-            dfh=dfh.dropna(subset=["timestamp"]).sort_values("timestamp")
-
-            compact_daily=st.checkbox("Compactar por dia (usa o último registro de cada dia)", value=True)
-
-            if compact_daily:
-                # === FIXO: um ponto por dia ===
-                df_day=(dfh.set_index("timestamp")
-                          .resample("D").last()
-                          .dropna(subset=["KH_atual","Ca_atual","Mg_atual"], how="all")
-                          .reset_index().rename(columns={"timestamp":"Dia"}))
-                df_plot=df_day.set_index("Dia")[["KH_atual","Ca_atual","Mg_atual"]]
-                df_long=df_day.melt(id_vars=["Dia"], value_vars=["KH_atual","Ca_atual","Mg_atual"],
-                                    var_name="Parametro", value_name="Valor")
-                x_enc=alt.X('Dia:T', axis=alt.Axis(title='Data', format='%d/%m', labelAngle=-20, tickCount='day'))
-            else:
-                df_plot=dfh.set_index("timestamp")[["KH_atual","Ca_atual","Mg_atual"]]
-                df_long=dfh.melt(id_vars=["timestamp"], value_vars=["KH_atual","Ca_atual","Mg_atual"],
-                                 var_name="Parametro", value_name="Valor")
-                x_enc=alt.X('timestamp:T', axis=alt.Axis(title='Data', format='%d/%m', labelAngle=-20))
-
-            base=alt.Chart(df_long).encode(
-                x=x_enc,
-                y=alt.Y('Valor:Q', axis=alt.Axis(title='Valor')),
-                color=alt.Color('Parametro:N', legend=alt.Legend(title=None)),
-                tooltip=[alt.Tooltip(df_long.columns[0]+':T', title='Data', format='%d/%m/%Y'),
-                         alt.Tooltip('Parametro:N', title='Parâmetro'),
-                         alt.Tooltip('Valor:Q', title='Valor', format='.2f')]
-            )
-            st.altair_chart(base.mark_line(interpolate='monotone', strokeWidth=2.5) + base.mark_circle(size=64), use_container_width=True)
-
-            # Consumo observado (mediana das variações entre pontos)
-            idx=df_plot.index
-            dt_days=idx.to_series().diff().dt.total_seconds().div(86400.0).replace([0, None], pd.NA).fillna(1.0)
-            df_obs=df_plot.copy()
-            for col in ["KH_atual","Ca_atual","Mg_atual"]:
-                per_day=(df_obs[col].diff()/dt_days).replace([pd.NA,float("inf"),-float("inf")],0)
-                df_obs[col+"_dday"]=per_day
-
-            def med_cons(s, clamp=None):
-                s=pd.to_numeric(s,errors="coerce").dropna()
-                if clamp is not None: s=s.clip(lower=-clamp, upper=clamp)
-                return float(max(0.0, round(-s.median(),2))) if not s.empty else 0.0
-
-            kh_cons_obs=med_cons(df_obs["KH_atual_dday"], clamp=3.0)
-            ca_cons_obs=med_cons(df_obs["Ca_atual_dday"], clamp=50.0)
-            mg_cons_obs=med_cons(df_obs["Mg_atual_dday"], clamp=20.0)
+    store=get_store(); tank=st.session_state.get("reef_tank", DEFAULT_TANK)
+    st.session_state.live_seen=store.version(tank)  # versão que os cartões abaixo mostram (ver live_status)
+    reef_visual_card(store, tank, reef_inputs, rp)
 
-            k1,k2,k3=st.columns(3)
-            with k1: st.markdown(kpi("KH – consumo observado", f"{kh_cons_obs:.2f} °dKH/dia"), unsafe_allow_html=True)
-            with k2: st.markdown(kpi("Ca – consumo observado", f"{ca_cons_obs:.2f} ppm/dia"), unsafe_allow_html=True)
-            with k3: st.markdown(kpi("Mg – consumo observado", f"{mg_cons_obs:.2f} ppm/dia"), unsafe_allow_html=True)
-            st.caption("Com ‘Compactar por dia’, o ponto é o **último registro** de cada dia (resample D → last).")
-        else:
-            st.info("Seu histórico ainda está vazio. Adicione linhas no card abaixo e o gráfico aparece aqui.")
-    else:
-        st.markdown("### Projeção por data (KH, Ca, Mg)")
-        default_start=dt.date.today()
-        if "reef_history" in st.session_state and not st.session_state.reef_history.empty:
-            try:
-                last_ts=pd.to_datetime(st.session_state.reef_history["timestamp"], errors="coerce").dropna()
-                if not last_ts.empty: default_start=last_ts.max().date()
-            except Exception: pass
-        start=st.date_input("Iniciar projeção em", value=default_start)
-        days=st.slider("Dias para projetar", min_value=7, max_value=30, value=14, step=1)
+    # Histórico Reef (upload/append + guard)
+    reef_history_card(store, tank, {
+        "volume_L":vol,"KH_atual":round(kh_now,2),"Ca_atual":round(ca_now,2),"Mg_atual":round(mg_now,2),
+        "KH_ideal":round(kh_target,2),"Ca_ideal":round(ca_target,2),"Mg_ideal":round(mg_target,2),
+        "KH_cons":round(kh_cons,2),"Ca_cons":round(ca_cons,2),"Mg_cons":round(mg_cons,2),
+        "dose_pair_mL":round(ml_pair,2),"KH_gain_dia":round(kh_gain,2),"Ca_gain_dia":round(ca_gain,2),
+        "KH_liq_dia":round(kh_net,2),"Ca_liq_dia":round(ca_net,2)})
 
-        dates=pd.date_range(start, periods=days+1, freq="D")
-        kh_list,ca_list,mg_list=[],[],[]
-        kh_val,ca_val,mg_val=kh_now,ca_now,mg_now
-        kh_list.append(kh_val); ca_list.append(ca_val); mg_list.append(mg_val)
-        kh_gain=max(0.0, kh_gain); ca_gain=max(0.0, ca_gain)
-        for _ in range(days):
-            kh_inc=min(kh_gain-kh_cons, max_kh_raise)
-            ca_inc=ca_gain-ca_cons
-            mg_inc=-mg_cons
-            kh_val=min(kh_target, kh_val+max(0.0, kh_inc))
-            ca_val=min(ca_target, ca_val+ca_inc)
-            mg_val=max(0.0, mg_val+mg_inc)
-            kh_list.append(kh_val); ca_list.append(ca_val); mg_list.append(mg_val)
-
-        df_proj=pd.DataFrame({"Data":dates,"KH (°dKH)":kh_list,"Ca (ppm)":ca_list,"Mg (ppm)":mg_list})
-        long=df_proj.melt(id_vars=["Data"], var_name="Parametro", value_name="Valor")
-        chart=(alt.Chart(long).mark_line(interpolate='monotone', strokeWidth=2.5)
-               .encode(x=alt.X('Data:T', axis=alt.Axis(title='Data', format='%d/%m', labelAngle=-20)),
-                       y='Valor:Q', color='Parametro:N',
-                       tooltip=[alt.Tooltip('Data:T', title='Data', format='%d/%m/%Y'),
-                                alt.Tooltip('Parametro:N'), alt.Tooltip('Valor:Q', format='.2f')])
-               .properties(height=260))
-        st.altair_chart(chart, use_container_width=True)
-        st.caption("Projeção: dose pareada diária constante; Mg cai apenas pelo consumo.")
+    live_ingest_card(store, tank)
 
-    st.markdown('</div>', unsafe_allow_html=True)
+    fleet_card(store, {k:reef_inputs[k] for k in ("ca_ppm_per_ml_per_25L","alk_meq_per_ml_per_25L","max_ml_per_25L_day","max_kh_raise_net")},
+               {"volume_L":vol,"kh_target":kh_target,"ca_target":ca_target,"mg_target":mg_target})
 
-    # Histórico Reef (upload/append + guard)
-    st.markdown('<div class="card">', unsafe_allow_html=True)
-    st.markdown("## Histórico Reef (CSV / Excel / Numbers)")
-    if "reef_history" not in st.session_state:
-        st.session_state.reef_history = pd.DataFrame(columns=[
-            "timestamp","volume_L","KH_atual","Ca_atual","Mg_atual",
-            "KH_ideal","Ca_ideal","Mg_ideal","KH_cons","Ca_cons","Mg_cons",
-            "dose_pair_mL","KH_gain_dia","Ca_gain_dia","KH_liq_dia","Ca_liq_dia","obs"
-        ])
-    up=st.file_uploader("Carregar arquivo", type=["csv","xlsx","xls","numbers"], key="reef_uploader")
-    if up is not None:
-        sig=(up.name, getattr(up,"size",None))
-        if st.session_state.get("reef_loaded_sig")!=sig:
-            df_loaded=load_history_any(up)
-            if df_loaded is not None:
-                st.session_state.reef_history=df_loaded; st.session_state.reef_loaded_sig=sig
-                st.success("Histórico carregado com sucesso.")
-    obs=st.text_input("Observações (opcional)")
-    if st.button("➕ Adicionar linha desta sessão"):
-        row={"timestamp":dt.datetime.now().isoformat(timespec="seconds"),
-             "volume_L":vol,"KH_atual":round(kh_now,2),"Ca_atual":round(ca_now,2),"Mg_atual":round(mg_now,2),
-             "KH_ideal":round(kh_target,2),"Ca_ideal":round(ca_target,2),"Mg_ideal":round(mg_target,2),
-             "KH_cons":round(kh_cons,2),"Ca_cons":round(ca_cons,2),"Mg_cons":round(mg_cons,2),
-             "dose_pair_mL":round(ml_pair,2),"KH_gain_dia":round(kh_gain,2),"Ca_gain_dia":round(ca_gain,2),
-             "KH_liq_dia":round(kh_net,2),"Ca_liq_dia":round(ca_net,2),"obs":obs or ""}
-        st.session_state.reef_history = pd.concat([st.session_state.reef_history, pd.DataFrame([row])], ignore_index=True)
-        st.success("Linha adicionada ao histórico local.")
-
-    st.dataframe(st.session_state.reef_history, use_container_width=True)
-    st.download_button("⬇️ Baixar histórico (CSV)",
-                       data=st.session_state.reef_history.to_csv(index=False).encode(),
-                       file_name="reef_history.csv", mime="text/csv")
-    st.caption("Dica: faça upload deste mesmo arquivo na próxima sessão para continuar seu log.")
-    st.markdown('</div>', unsafe_allow_html=True)
+    catalog_card(cat, vol, {"KH":rp["dKH_needed"],"Ca":ca_target-ca_now}, catalog.MODE_SLOTS["reef"])
 
     # Faixas Reef
-    reef_df=pd.DataFrame({
-        "Parâmetro":["KH (°dKH)","Ca (ppm)","Mg (ppm)"],
-        "Atual":[round(kh_now,2),round(ca_now,2),round(mg_now,2)],
-        "Faixa":["8–12","380–450","1250–1350"],
-        "min":[8.0,380.0,1250.0],"max":[12.0,450.0,1350.0],
-    })
-    show=reef_df[["Parâmetro","Atual","Faixa"]].copy()
-    def _style(df_show,limits=reef_df[["min","max"]]):
-        s=pd.DataFrame('', index=df_show.index, columns=df_show.columns)
-        for i in df_show.index:
-            mn,mx=limits.loc[i,"min"],limits.loc[i,"max"]; val=df_show.loc[i,"Atual"]
-            s.at[i,"Atual"]=('background-color:#065f46; color:#ecfeff; font-weight:600;'
-                             if mn<=val<=mx else 'background-color:#7f1d1d; color:#fee2e2; font-weight:600;')
-        return s
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("## Faixas recomendadas (Reef)")
-    st.markdown(show.style.apply(_style, axis=None).to_html(), unsafe_allow_html=True)
-    st.caption("Padrão: KH 8–12 • Ca 380–450 ppm • Mg 1250–1350 ppm.")
+    st.markdown(reef_ranges_html(ranges.RULES.version,kh_now,ca_now,mg_now), unsafe_allow_html=True)
+    st.caption("Padrão: "+" • ".join(f"{p} {ranges.RULES.range_text('Reef',p)}{' ppm' if p!='KH' else ''}" for p in ("KH","Ca","Mg"))+
+               ". Âmbar: até 10% da largura da faixa fora dela.")
     st.markdown('<div class="muted">Versão 2.12 • Histórico diário por resample • Consumo observado consistente • UI refinada</div>', unsafe_allow_html=True)
+
+# -------- Desempenho (fim do rerun: fecha a medição e mostra p50/p95 por seção) --------
+with st.sidebar:
+    st.markdown("---")
+    st.toggle("⏱️ Medir desempenho", key="profile_on", value=os.environ.get("DOSER_PROFILE")=="1",
+              help="Mede cada seção do app por rerun; grava uma linha JSON por rerun no log.")
+if profiling_on():
+    prof=get_profiler(); prof.end(mode=mode)
+    with st.sidebar.expander("⏱️ Desempenho por seção", expanded=True):
+        st.caption(f"{prof.runs} reruns medidos neste processo • últimos {prof.window} por seção • log: `{prof.log_path}`")
+        rows=prof.summary()
+        if rows: st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+        total=prof.histogram("[script] total")
+        if total is not None: st.bar_chart(total, x="ms", y="reruns", height=140)
+        if st.button("Zerar medições"): prof.reset(); st.rerun()
@@ -0,0 +1,29 @@
+# tests/test_cli.py — CLI em lote: exportação do histórico salvo
+import subprocess, sys
+from pathlib import Path
+import pandas as pd
+import pytest
+from doser.store import HistoryStore
+
+ROOT=Path(__file__).resolve().parents[1]
+
+@pytest.fixture
+def db(tmp_path):
+    path=tmp_path/"h.sqlite"; s=HistoryStore(path)
+    s.import_frame(pd.DataFrame({"timestamp":pd.date_range("2024-01-01",periods=3,freq="D"),"KH_atual":[8.0,8.1,8.2]}))
+    s.close()
+    return path
+
+def _doser(*args):
+    return subprocess.run([sys.executable,"-m","doser",*args],cwd=ROOT,capture_output=True,text=True,timeout=120)
+
+@pytest.mark.parametrize("out",[[],["-o","-"]])
+def test_export_to_stdout_is_csv(db, out):
+    r=_doser("export","--db",str(db),*out)
+    assert r.returncode==0, r.stderr
+    lines=r.stdout.splitlines()
+    assert lines[0].startswith("timestamp,") and len(lines)==4 and "3 leituras exportadas" in r.stderr
+
+def test_export_unknown_extension(db, tmp_path):
+    r=_doser("export","--db",str(db),"-o",str(tmp_path/"h.txt"))
+    assert r.returncode!=0 and "Extensão não suportada" in r.stderr
@@ -0,0 +1,19 @@
+# tests/test_consumption.py — consumo observado com parâmetros sem leitura
+import pandas as pd
+from doser.consumption import ConsumptionEstimator
+from doser.store import HistoryStore
+
+def test_empty_estimator():
+    est=ConsumptionEstimator(30,3.0)
+    assert est.consumption()==0.0 and est.theil_sen()==0.0
+    assert ConsumptionEstimator(None).theil_sen()==0.0
+
+def test_store_with_only_kh(tmp_path):
+    s=HistoryStore(tmp_path/"h.sqlite")
+    try:
+        s.import_frame(pd.DataFrame({"timestamp":pd.date_range("2024-01-01",periods=10,freq="D"),
+                                     "KH_atual":[9.0-0.2*i for i in range(10)]}))
+        med=s.consumption(method="median"); ts=s.consumption(method="theil-sen")
+        assert med["KH_atual"]==ts["KH_atual"]==0.2
+        assert med["Ca_atual"]==ts["Ca_atual"]==ts["Mg_atual"]==0.0
+    finally: s.close()
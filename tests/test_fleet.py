@@ -0,0 +1,34 @@
+# tests/test_fleet.py — frota: pasta do servidor restrita e falhas do pool de leitura
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from doser import fleet, history
+
+CSV=b"timestamp,KH_atual\n2024-01-01 10:00,8.0\n2024-01-02 10:00,8.1\n"
+
+@pytest.fixture
+def tree(tmp_path):
+    root=tmp_path/"logs"; (root/"sala").mkdir(parents=True); (tmp_path/"fora").mkdir()
+    (root/"sala"/"a.csv").write_bytes(CSV); (tmp_path/"fora"/"segredo.csv").write_bytes(CSV)
+    (root/"sala"/"link.csv").symlink_to(tmp_path/"fora"/"segredo.csv")
+    return root
+
+def test_folder_stays_inside_root(tree):
+    assert [n for _,n,_ in fleet.sources_from_folder("sala",root=tree)]==["a.csv"]  # o link para fora é ignorado
+    assert [n for _,n,_ in fleet.sources_from_folder(".",root=tree)]==["sala/a.csv"]
+    for bad in ("..","../fora","sala/../../fora",str(tree.parent/"fora")):
+        with pytest.raises(history.HistoryLoadError,match="fora de"): fleet.sources_from_folder(bad,root=tree)
+
+class _BrokenPool:
+    # como um ProcessPoolExecutor cujo worker morreu no meio da leitura
+    def __init__(self): self.down=False
+    def submit(self, fn, job):
+        f=Future(); f.set_exception(BrokenProcessPool("worker morreu")); return f
+    def shutdown(self, wait=True): self.down=True
+
+def test_broken_pool_is_a_per_file_error(monkeypatch):
+    pool=_BrokenPool(); monkeypatch.setattr(fleet,"_get_pool",lambda workers: pool); monkeypatch.setattr(fleet,"PARALLEL_MIN_BYTES",0)
+    src=[(f"t{i}",f"t{i}.csv",CSV+b"2024-01-0%d 10:00,8.2\n"%(i+3)) for i in range(3)]
+    out=fleet.read_many(src,workers=2)
+    assert [o["df"] for o in out]==[None]*3 and all("interrompida" in o["error"] for o in out)
+    assert pool.down
@@ -0,0 +1,88 @@
+# tests/test_history.py — leitura do histórico: datas (formato, dia primeiro, fuso)
+import time
+import pandas as pd
+import pytest
+from doser import history, ingest
+
+@pytest.fixture
+def berlin(monkeypatch):
+    # fuso com horário de verão: a conversão tem de usar o offset de cada data
+    monkeypatch.setenv("TZ","Europe/Berlin"); time.tzset()
+    yield
+    monkeypatch.undo(); time.tzset()
+
+def _csv(rows)->bytes:
+    return ("timestamp,KH_atual\n"+"".join(f"{r},8.0\n" for r in rows)).encode()
+
+@pytest.mark.parametrize("rows",[
+    ["2024-01-01T10:00:00+00:00","2024-07-01T10:00:00+00:00"],
+    ["2024-01-01T10:00:00Z","2024-07-01T10:00:00Z"],
+    ["2024-01-01T07:00:00-03:00","2024-07-01T12:00:00+02:00"],
+])
+def test_tz_aware_upload_becomes_local_naive(berlin, rows):
+    ts=history.read_history(_csv(rows),"log.csv")["timestamp"]
+    assert ts.dt.tz is None
+    assert ts.tolist()==[pd.Timestamp("2024-01-01 11:00"),pd.Timestamp("2024-07-01 12:00")]
+    assert ts.tolist()==[pd.Timestamp(ingest._timestamp(r)) for r in rows]  # igual à ingestão ao vivo
+
+def test_tz_rows_mixed_with_naive_rows(berlin):
+    rows=[f"2024-01-{d:02d} 10:00" for d in range(1,20)]+["2024-07-01T10:00:00Z"]
+    ts=history.read_history(_csv(rows),"log.csv")["timestamp"]
+    assert ts.iloc[0]==pd.Timestamp("2024-01-01 10:00") and ts.iloc[-1]==pd.Timestamp("2024-07-01 12:00")
+
+def test_store_import_frame_accepts_tz_aware(berlin):
+    from doser.store import HistoryStore
+    st=HistoryStore(":memory:")
+    aware=pd.DataFrame({"timestamp":pd.to_datetime(["2024-01-01T10:00:00Z","2024-07-01T10:00:00Z"]),"KH_atual":[8.0,8.1]})
+    text=pd.DataFrame({"timestamp":["2024-01-02T10:00:00+00:00","bad"],"KH_atual":[7.9,7.8]})
+    assert st.import_frame(aware)==2 and st.import_frame(text)==1
+    st.append_many([{"timestamp":pd.Timestamp("2024-07-01T10:00:00Z"),"KH_atual":9.0}])  # mesma hora local: repetida
+    got=st.read()
+    assert got["timestamp"].tolist()==[pd.Timestamp(t) for t in ("2024-01-01 11:00","2024-01-02 11:00","2024-07-01 12:00")]
+    assert got["KH_atual"].tolist()==pytest.approx([8.0,7.9,8.1])
+
+@pytest.mark.parametrize("fmt",["%d/%m/%Y %H:%M","%d-%m-%Y %H:%M","%d.%m.%Y %H:%M:%S","%d/%m/%Y"])
+def test_parse_ts_day_first(fmt):
+    want=pd.Series(pd.date_range("2024-01-03 08:05",periods=60,freq="37h")).dt.floor("D" if "%H" not in fmt else "s")
+    got=history.parse_ts(want.dt.strftime(fmt))
+    assert history.detect_ts_format(want.dt.strftime(fmt))==fmt
+    assert got.tolist()==want.tolist()  # 03/04 é 3 de abril: dias > 12 na coluna fixam a ordem
+
+def test_parse_ts_day_first_irregular_rows():
+    s=pd.Series([f"{d:02d}/04/2024 10:00" for d in range(1,29)]+[" 3/5/2024 8:05","7/5/2024 9:00:30",None])
+    ts=history.parse_ts(s)
+    assert ts.iloc[:28].tolist()==list(pd.date_range("2024-04-01 10:00",periods=28,freq="D"))
+    assert ts.iloc[28:30].tolist()==[pd.Timestamp("2024-05-03 08:05"),pd.Timestamp("2024-05-07 09:00:30")]
+    assert pd.isna(ts.iloc[30])
+
+def test_parse_ts_naive_rows_are_untouched_by_tz_handling(berlin):
+    s=pd.Series(["2024-07-01 10:00","2024-07-02 10:00:00+02:00","2024-07-03 10:00"])
+    assert history.parse_ts(s).tolist()==[pd.Timestamp(f"2024-07-0{d} 10:00") for d in (1,2,3)]
+
+# -------- .numbers: caminho rápido (estrutura interna) × API pública --------
+def _numbers_file(path):
+    numbers_parser=pytest.importorskip("numbers_parser")
+    import datetime as dt
+    doc=numbers_parser.Document(num_rows=41,num_cols=7)
+    t=doc.sheets[0].tables[0]
+    for j,c in enumerate(("timestamp","volume_L","KH_atual","Ca_atual","Mg_atual","obs","ok")): t.write(0,j,c)
+    for i in range(1,41):
+        t.write(i,0,dt.datetime(2024,1,1,8)+dt.timedelta(days=i,minutes=i))
+        t.write(i,1,300); t.write(i,2,7.0+i/40)
+        if i%4: t.write(i,3,400+i*1.25)  # células vazias no meio
+        t.write(i,4,1300.5-i); t.write(i,5,f"nota {i}" if i%3==0 else ""); t.write(i,6,i%2==0)
+    doc.add_sheet("Notas","Resumo",num_rows=5,num_cols=2)
+    doc.save(path)
+    return path
+
+def test_numbers_fast_reader_matches_public_api(tmp_path):
+    path=str(_numbers_file(tmp_path/"log.numbers"))
+    if not history._numbers_fast_ok(): pytest.skip("numbers-parser fora de NUMBERS_FAST_VERSIONS")
+    fast,public=history._numbers_fast(path),history._numbers_public(path)
+    assert list(fast.columns)==list(public.columns) and fast.shape==public.shape==(40,7)
+    for c in fast.columns:
+        for i,(a,b) in enumerate(zip(fast[c].tolist(),public[c].tolist())):
+            assert history._same_cell(a,b), (c,i,a,b)
+    assert history._numbers_agree(fast,public)
+    bad=public.copy(); bad.iloc[-1,2]=99.0  # só a última linha difere: a conferência tem de pegar
+    assert not history._numbers_agree(fast,bad)
@@ -0,0 +1,60 @@
+# tests/test_ingest.py — normalização de leituras e pasta de entrada da ingestão ao vivo
+import json, os, time, datetime as dt
+import pytest
+from doser import ingest
+from doser.store import HistoryStore
+
+@pytest.mark.parametrize("obj",[
+    [1,2], "texto", {"ts":"2024-01-01T10:00"}, {"ts":"2024-01-01T10:00","obs":"sem medida"},
+    {"ts":"ontem","KH":8.0}, {"ts":1e20,"KH":8.0}, {"ts":-1e20,"KH":8.0}, {"ts":float("inf"),"KH":8.0},
+    {"ts":"2024-01-01T10:00","KH":"abc"},
+])
+def test_normalize_rejects_bad_readings(obj):
+    with pytest.raises(ValueError):
+        ingest.normalize_reading(obj)
+
+@pytest.mark.parametrize("obj",[
+    {"ts":"2024-01-01T10:00","KH":None,"Ca":"","Mg":float("nan")},  # nenhuma medida de fato
+    {"ts":"2024-01-01T10:00","KH":[8.0]}, {"ts":"2024-01-01T10:00","Ca":{"v":420}},
+    {"ts":[2024,1,1],"KH":8.0}, {"ts":"2024-13-01T10:00","KH":8.0},
+])
+def test_normalize_rejects_malformed_values(obj):
+    # o serviço conta ValueError e TypeError como rejeitadas (IngestService._put)
+    with pytest.raises((ValueError,TypeError)):
+        ingest.normalize_reading(obj,now_if_missing=False)
+
+def test_normalize_reading():
+    tank,row=ingest.normalize_reading({"ts":"2024-01-01T10:00:00Z","KH":"8,4","Ca":425,"tank":"t2"})
+    assert tank=="t2" and row["KH_atual"]==8.4 and row["Ca_atual"]==425.0 and row["obs"]==""
+    assert row["timestamp"]==dt.datetime(2024,1,1,10,tzinfo=dt.timezone.utc).astimezone().replace(tzinfo=None)
+    _,row=ingest.normalize_reading({"ts":1704103200000,"KH":8.0})  # epoch em ms
+    assert row["timestamp"]==dt.datetime.fromtimestamp(1704103200)
+
+def test_normalize_reading_missing_obs():
+    for obs in (None,float("nan"),"  "):
+        assert ingest.normalize_reading({"ts":"2024-01-01T10:00","KH":8.0,"obs":obs})[1]["obs"]==""
+    line=ingest.normalize_reading(json.loads('{"ts":"2024-01-01T10:00","KH":8.0,"obs":NaN}'))[1]
+    assert line["obs"]==""
+
+def test_missing_timestamp_only_defaults_to_now_live():
+    _,row=ingest.normalize_reading({"KH":8.0})
+    assert abs((row["timestamp"]-dt.datetime.now()).total_seconds())<5
+    with pytest.raises(ValueError):
+        ingest.normalize_reading({"KH":8.0},now_if_missing=False)
+
+def test_bad_file_does_not_stop_the_watcher(tmp_path):
+    store=HistoryStore(tmp_path/"h.sqlite"); drop=tmp_path/"entrada"; drop.mkdir()
+    (drop/"a.jsonl").write_text(json.dumps({"ts":1e20,"KH":8.0})+"\n"+json.dumps({"ts":"2024-01-01T10:00","KH":8.1})+"\n")
+    (drop/"b.json").write_text(json.dumps([{"ts":"2024-01-02T10:00","KH":8.2}]))
+    old=time.time()-10
+    for p in drop.iterdir(): os.utime(p,(old,old))
+    svc=ingest.IngestService(store,drop_dir=drop,poll_s=0.05,flush_ms=10)
+    svc.start()
+    try:
+        for _ in range(200):
+            if svc.stats()["gravadas"]>=2: break
+            time.sleep(0.02)
+        s=svc.stats()
+    finally: svc.stop(); store.close()
+    assert s["gravadas"]==2 and s["rejeitadas"]==1 and s["arquivos"]==2
+    assert sorted(p.name for p in (drop/"processados").iterdir())==["a.jsonl","b.json"]
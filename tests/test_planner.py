@@ -0,0 +1,45 @@
+# tests/test_planner.py — plano multi-dia: limites de dose, de alta de KH e tetos
+import numpy as np
+import pandas as pd
+import pytest
+from doser.engine import REEF_RANGES, dkh_from_meq
+from doser.planner import plan_doses
+
+EPS=1e-9
+
+def _tanks(n:int=200, seed:int=0)->pd.DataFrame:
+    rng=np.random.default_rng(seed)
+    return pd.DataFrame({"volume_L":rng.uniform(20,800,n),
+                         "kh_now":rng.uniform(5,13,n),"ca_now":rng.uniform(340,500,n),"mg_now":rng.uniform(1100,1450,n),
+                         "kh_target":rng.uniform(7,11,n),"ca_target":rng.uniform(390,460,n),"mg_target":1300.0,
+                         "kh_cons":rng.uniform(0,1.2,n),"ca_cons":rng.uniform(0,12,n),"mg_cons":rng.uniform(0,8,n),
+                         "ca_ppm_per_ml_per_25L":rng.uniform(2,8,n),"alk_meq_per_ml_per_25L":rng.uniform(0.1,0.3,n),
+                         "max_ml_per_25L_day":rng.uniform(0.5,6,n),"max_kh_raise_net":rng.uniform(0.2,1.5,n)})
+
+@pytest.mark.parametrize("mode",["paired","separate"])
+def test_plan_respects_caps(mode):
+    t=_tanks(); p=plan_doses(t,days=30,mode=mode)
+    col=lambda c: t[c].to_numpy()[:,None]
+    max_ml=col("max_ml_per_25L_day")*col("volume_L")/25.0
+    for d in (p["dose_f1"],p["dose_f2"]):
+        assert d.shape==(len(t),30)
+        assert (d>=-EPS).all() and (d<=max_ml+EPS).all()  # nunca negativa nem acima do máximo por dia
+    if mode=="paired": np.testing.assert_array_equal(p["dose_f1"],p["dose_f2"])
+    assert (np.diff(p["KH"],axis=1)<=col("max_kh_raise_net")+EPS).all()  # alta líquida de KH por dia
+    paired=mode=="paired"
+    kh_ceil=np.maximum(col("kh_target"),REEF_RANGES["KH"][1]) if paired else col("kh_target")
+    ca_ceil=np.maximum(col("ca_target"),REEF_RANGES["Ca"][1]) if paired else col("ca_target")
+    # com dose o valor não passa do teto; acima dele já no início, só cai com o consumo
+    assert (p["KH"][:,1:]<=np.maximum(kh_ceil,col("kh_now"))+EPS).all()
+    assert (p["Ca"][:,1:]<=np.maximum(ca_ceil,col("ca_now"))+EPS).all()
+    # trajetórias coerentes com as doses: KH_t = KH_0 + Σ dose·kh/mL − t·consumo
+    kh_per_ml=dkh_from_meq(col("alk_meq_per_ml_per_25L"))*25.0/col("volume_L")
+    want=col("kh_now")+np.concatenate([np.zeros((len(t),1)),np.cumsum(p["dose_f2"],axis=1)],axis=1)*kh_per_ml-np.arange(31)*col("kh_cons")
+    np.testing.assert_allclose(p["KH"],want,atol=1e-9)
+
+def test_plan_reaches_target_when_caps_allow():
+    t=pd.DataFrame({"volume_L":[100.0],"kh_now":[7.0],"kh_target":[9.0],"kh_cons":[0.3],"max_kh_raise_net":[0.5],
+                    "max_ml_per_25L_day":[20.0]})
+    p=plan_doses(t,days=10,mode="separate")
+    assert p["days_kh"][0]==4  # +2 dKH a no máximo +0,5 por dia
+    assert abs(p["KH"][0,-1]-9.0)<=0.01
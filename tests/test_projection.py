@@ -0,0 +1,37 @@
+# tests/test_projection.py — projeção em forma fechada × o laço diário original do card
+import numpy as np
+import pytest
+from doser import projection
+
+def _loop(kh_now, ca_now, mg_now, kh_gain, ca_gain, kh_cons, ca_cons, mg_cons, kh_target, ca_target, max_kh_raise, days):
+    # passo diário do card "Projeção (simulada)" antes da forma fechada
+    kh_list,ca_list,mg_list=[kh_now],[ca_now],[mg_now]
+    kh_val,ca_val,mg_val=kh_now,ca_now,mg_now
+    kh_gain=max(0.0,kh_gain); ca_gain=max(0.0,ca_gain)
+    for _ in range(days):
+        kh_val=min(kh_target,kh_val+max(0.0,min(kh_gain-kh_cons,max_kh_raise)))
+        ca_val=min(ca_target,ca_val+ca_gain-ca_cons)
+        mg_val=max(0.0,mg_val-mg_cons)
+        kh_list.append(kh_val); ca_list.append(ca_val); mg_list.append(mg_val)
+    return {"KH":kh_list,"Ca":ca_list,"Mg":mg_list}
+
+def _cases(n:int, seed:int=0)->dict:
+    rng=np.random.default_rng(seed)
+    return {"kh_now":rng.uniform(5,12,n),"ca_now":rng.uniform(350,480,n),"mg_now":rng.uniform(0,1400,n),
+            "kh_gain":rng.uniform(-0.5,2.5,n),"ca_gain":rng.uniform(-5,20,n),
+            "kh_cons":rng.uniform(-0.2,1.5,n),"ca_cons":rng.uniform(-2,15,n),"mg_cons":rng.uniform(0,60,n),
+            "kh_target":rng.uniform(6,11,n),"ca_target":rng.uniform(380,460,n),"max_kh_raise":rng.uniform(0,1.5,n)}
+
+@pytest.mark.parametrize("days",[1,14,30])
+def test_project_matches_daily_loop(days):
+    c=_cases(300)
+    got=projection.project(**c,days=days)  # todos os tanques de uma vez
+    for i in range(300):
+        want=_loop(**{k:float(v[i]) for k,v in c.items()},days=days)
+        for p in ("KH","Ca","Mg"): np.testing.assert_allclose(got[p][i],want[p],rtol=0,atol=1e-9,err_msg=f"{p} caso {i}")
+
+def test_project_scalar_inputs():
+    c={k:float(v[0]) for k,v in _cases(1,seed=5).items()}
+    got=projection.project(**c,days=10); want=_loop(**c,days=10)
+    for p in ("KH","Ca","Mg"):
+        assert got[p].shape==(11,); np.testing.assert_allclose(got[p],want[p],atol=1e-9)
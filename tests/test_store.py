@@ -0,0 +1,66 @@
+# tests/test_store.py — HistoryStore (SQLite): gravação, agregados e consumo
+import numpy as np
+import pandas as pd
+import pytest
+from doser.store import HistoryStore
+
+@pytest.fixture
+def store():
+    return HistoryStore(":memory:")
+
+def test_missing_obs_is_not_stored_as_text(store):
+    t=pd.Timestamp("2024-01-01")
+    store.append_many([{"timestamp":t+pd.Timedelta(hours=h),"KH_atual":8.0,"obs":v}
+                       for h,v in enumerate([np.nan,None,"  ","troca de água "])])
+    store.import_frame(pd.DataFrame({"timestamp":[t+pd.Timedelta(days=1),t+pd.Timedelta(days=2)],
+                                     "KH_atual":[8.0,8.1],"obs":[np.nan,"ok"]}))
+    obs=store.read()["obs"]
+    assert obs.isna().tolist()==[True,True,True,False,True,False]
+    assert obs.dropna().tolist()==["troca de água","ok"]
+
+def _readings(n:int=600, seed:int=1)->pd.DataFrame:
+    # leituras irregulares (várias por dia, dias sem leitura), com falhas por parâmetro
+    rng=np.random.default_rng(seed)
+    ts=pd.Timestamp("2024-01-29")+pd.to_timedelta(np.sort(rng.choice(150*24*60,n,replace=False)),unit="min")
+    df=pd.DataFrame({"timestamp":ts.floor("s"),
+                     "KH_atual":(9.0-np.arange(n)*0.004+rng.normal(0,0.1,n)).round(2),
+                     "Ca_atual":(430-np.arange(n)*0.03+rng.normal(0,2,n)).round(2),
+                     "Mg_atual":(1300-np.arange(n)*0.02+rng.normal(0,5,n)).round(2)})
+    for c,frac in (("Ca_atual",0.2),("Mg_atual",0.5)): df.loc[rng.random(n)<frac,c]=np.nan
+    return df
+
+RESAMPLE={"D":dict(rule="D"),"W":dict(rule="W-MON",label="left",closed="left"),"M":dict(rule="MS")}
+
+@pytest.mark.parametrize("res",["D","W","M"])
+def test_rollups_match_pandas_resample(store, res):
+    df=_readings()
+    store.import_frame(df.iloc[:400])  # lote grande: agregação em pandas
+    for i in range(400,len(df),7):     # lotes pequenos (como a ingestão ao vivo): agregação em Python
+        store.append_many(df.iloc[i:i+7].to_dict("records"))
+    r=df.set_index("timestamp").resample(**RESAMPLE[res]); n=r.count()
+    for stat,want in (("last",r.last()),("mean",r.mean()),("min",r.min()),("max",r.max()),("n",n)):
+        got=store.rollup_wide(res=res,stat=stat)
+        for c in got.columns:
+            w=want[c][n[c]>0]; g=got[c].dropna()  # períodos sem leitura do parâmetro não têm agregado
+            assert g.index.tolist()==w.index.tolist(), (res,stat,c)
+            np.testing.assert_allclose(g.to_numpy(float),w.to_numpy(float),rtol=1e-9,err_msg=f"{res} {stat} {c}")
+
+@pytest.mark.parametrize("method",["median","theil-sen"])
+def test_incremental_consumption_matches_full_recompute(tmp_path, method):
+    from doser import consumption as cons
+    df=_readings(seed=2); late=df.sample(frac=0.1,random_state=3)  # parte chega depois, fora de ordem
+    inc=HistoryStore(tmp_path/"inc.sqlite")
+    for day,g in df.drop(late.index).groupby(df["timestamp"].dt.floor("D")): inc.append_many(g.to_dict("records"))
+    inc.import_frame(late)
+    full=HistoryStore(tmp_path/"full.sqlite"); full.import_frame(df)
+    daily=df.set_index("timestamp").resample("D").last()
+    for w in cons.CONSUMPTION_WINDOWS:
+        want={}
+        for c in ("KH_atual","Ca_atual","Mg_atual"):
+            s=daily[c].dropna(); days=(s.index-pd.Timestamp(0)).days
+            e=cons.ConsumptionEstimator.from_points(days,s.to_numpy(),w,cons.CLAMPS.get(c))
+            want[c]=e.theil_sen() if method=="theil-sen" else e.consumption()
+        assert inc.consumption(window=w,method=method)==full.consumption(window=w,method=method)==want, w
+    inc.rebuild_rollups()
+    assert inc.consumption(window=30,method=method)==full.consumption(window=30,method=method)
+    inc.close(); full.close()